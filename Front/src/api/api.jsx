@@ -181,6 +181,39 @@ export const predictPortfolioEarnings = async (portfolioId, predictionData) => {
   }
 };
 
+// ==================== TRAINING JOBS ====================
+
+export const getJob = async (jobId) => {
+  try {
+    const response = await axios.get(`${API_BASE}/jobs/${jobId}`);
+    return response.data;
+  } catch (err) {
+    console.error("Get job error:", err);
+    return { success: false, error: err.response?.data?.error || err.message };
+  }
+};
+
+// Training endpoints return a job id; poll it until the job finishes
+const waitForJob = async (submitted, intervalMs = 2000) => {
+  if (!submitted.success || !submitted.job_id) {
+    return submitted;
+  }
+  for (;;) {
+    const result = await getJob(submitted.job_id);
+    if (!result.success) {
+      return result;
+    }
+    const { status, error } = result.job;
+    if (status === "succeeded") {
+      return { success: true, job: result.job };
+    }
+    if (status === "failed") {
+      return { success: false, error: error || "Training failed", job: result.job };
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 // ==================== EXISTING API ENDPOINTS ====================
 
 export const hello = async () => {
@@ -190,13 +223,13 @@ export const hello = async () => {
 
 export const trainLSTM = async (params = {}) => {
   try {
-    const response = await axios.post(`${API_BASE}/lstm/train`, {
+    const submitted = await axios.post(`${API_BASE}/lstm/train`, {
       ticker: params.ticker || "^GSPC",
       start: params.start || "2010-01-01",
       end: params.end || "2025-05-22",
       sequence_length: params.sequence_length || 60,
     });
-    return response.data;
+    return await waitForJob(submitted.data);
   } catch (err) {
     console.error("Train LSTM error:", err);
     return { success: false, error: err.response?.data?.error || err.message };
@@ -231,13 +264,13 @@ export const getLSTMModels = async () => {
 
 export const trainARIMA = async (params = {}) => {
   try {
-    const response = await axios.post(`${API_BASE}/arima/train`, {
+    const submitted = await axios.post(`${API_BASE}/arima/train`, {
       ticker: params.ticker || "^GSPC",
       start: params.start || "2020-01-01",
       end: params.end || "2025-04-08",
       exog_tickers: params.exog_tickers || ["GLD", "QQQ", "^TNX"],
     });
-    return response.data;
+    return await waitForJob(submitted.data);
   } catch (err) {
     console.error("Train ARIMA error:", err);
     return { success: false, error: err.response?.data?.error || err.message };
@@ -278,12 +311,12 @@ export const getARIMAModels = async () => {
 
 export const trainProphet = async (params = {}) => {
   try {
-    const response = await axios.post(`${API_BASE}/prophet/train`, {
+    const submitted = await axios.post(`${API_BASE}/prophet/train`, {
       ticker: params.ticker || "^GSPC",
       start: params.start || "2015-01-01",
       end: params.end || "2025-05-22",
     });
-    return response.data;
+    return await waitForJob(submitted.data);
   } catch (err) {
     console.error("Train Prophet error:", err);
     return { success: false, error: err.response?.data?.error || err.message };
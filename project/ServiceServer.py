@@ -1,17 +1,37 @@
-from flask import Flask, request, jsonify
+import time
+_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from datetime import timedelta
 import os
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import selectinload
 
 # Import models and database
-from models import db, bcrypt, User, Portfolio, PortfolioItem
-
-# Import existing services
-from Services.lstm_model_service import train_model, predict_next_days
-from Services.arima_model_service import train_model as train_arima, predict_next_days as predict_arima
-from Services.prophet_model_service import train_model as train_prophet, predict_next_days as predict_prophet
+from models import db, bcrypt, User, Portfolio, PortfolioItem, TrainingJob
+
+# Model services load their ML libraries on first use (see service_loader)
+from Services.service_loader import lazy
+from Services import service_loader, model_workers
+predict_next_days, predict_arima, predict_prophet = (lazy(algorithm, 'predict_next_days') for algorithm in ('lstm', 'arima', 'prophet'))
+# Training runs on the job queue in this process, never on a model worker: a fit
+# would block that worker's predictions and may start process pools of its own
+train_model, update_lstm = (lazy('lstm', name, routed=False) for name in ('train_model', 'update_model'))
+train_arima, update_arima = (lazy('arima', name, routed=False) for name in ('train_model', 'update_model'))
+train_prophet, update_prophet = (lazy('prophet', name, routed=False) for name in ('train_model', 'update_model'))
 from Services.portfolio_prediction_service import predict_portfolio_earnings
+from Services.model_registry import registry
+from Services.job_queue import jobs
+from Services import batch_training
+from Services import backtest
+from Services import instrumentation
+from Services import response_cache
+from Services import forecast_cache
+from Services import portfolio_import
+from Services import scenario_engine
+from Services.model_catalog import catalog
 
 app = Flask(__name__)
 CORS(app)
@@ -24,6 +44,7 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
 
 # Initialize extensions
 db.init_app(app)
+instrumentation.init_app(app)
 bcrypt.init_app(app)
 jwt = JWTManager(app)
 
@@ -51,6 +72,54 @@ def revoked_token_callback(jwt_header, jwt_payload):
 # Create tables
 with app.app_context():
     db.create_all()
+    # create_all skips indexes added to tables that already exist
+    for table in (Portfolio.__table__, PortfolioItem.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+# GET /portfolios page size cap
+MAX_PORTFOLIO_PAGE = 200
+
+# Index the trained models once; training code keeps it current
+catalog.build()
+
+# Background training jobs
+jobs.init_app(app)
+jobs.max_workers = int(os.environ.get('TRAINING_WORKERS', 2))
+
+def materializing(algorithm, fn):
+    """Wrap a train/update function so a successful run refreshes its stored forecast."""
+    def runner(ticker, progress, **params):
+        success = fn(ticker=ticker, progress=progress, **params)
+        if success:
+            progress({'phase': 'materialize'})
+            forecast_cache.materialize(algorithm, ticker)
+        return success
+    return runner
+
+jobs.register('lstm', materializing('lstm', train_model))
+jobs.register('arima', materializing('arima', train_arima))
+jobs.register('prophet', materializing('prophet', train_prophet))
+jobs.register('lstm_update', materializing('lstm', update_lstm))
+jobs.register('arima_update', materializing('arima', update_arima))
+jobs.register('prophet_update', materializing('prophet', update_prophet))
+
+def run_batch_job(ticker, progress, tickers, algorithms, params=None, concurrency=None):
+    """Job runner for /batch/train; *ticker* is only the job label."""
+    report = batch_training.run_batch(tickers, algorithms, params, concurrency, progress=progress)
+    return {key: report[key] for key in ('report_path', 'seconds', 'tasks', 'algorithms', 'failures')}
+
+jobs.register('batch', run_batch_job)
+
+def run_backtest_job(ticker, progress, algorithms, tickers=None, horizon=backtest.DEFAULT_HORIZON,
+                     folds=backtest.DEFAULT_FOLDS, chunks=None, refit_every=0, concurrency=None):
+    """Job runner for /backtest; *ticker* is only the job label."""
+    return backtest.run_backtest(algorithms, tickers, horizon, folds, chunks, refit_every,
+                                 concurrency, progress=progress)
+
+jobs.register('backtest', run_backtest_job)
+
+service_loader.record('app', time.perf_counter() - _started)
 
 # ==================== AUTHENTICATION ====================
 
@@ -140,11 +209,47 @@ def get_profile():
 def get_portfolios():
     try:
         user_id = int(get_jwt_identity())
-        portfolios = Portfolio.query.filter_by(user_id=user_id).all()
-        
+        fields = request.args.get('fields', 'full')
+        if fields not in ('summary', 'full'):
+            return jsonify({'success': False, 'error': "fields must be 'summary' or 'full'"})
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+
+        # Keyset pagination on id: ?limit=N, then ?cursor=<next_cursor> for the next page
+        query = Portfolio.query.filter_by(user_id=user_id).order_by(Portfolio.id)
+        if cursor is not None:
+            query = query.filter(Portfolio.id > cursor)
+        if fields == 'full':
+            query = query.options(selectinload(Portfolio.items))  # all items in one query
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PORTFOLIO_PAGE))
+            query = query.limit(limit + 1)
+        portfolios = query.all()
+
+        next_cursor = None
+        if limit is not None and len(portfolios) > limit:
+            portfolios = portfolios[:limit]
+            next_cursor = portfolios[-1].id
+
+        data = [portfolio.to_dict(include_items=fields == 'full') for portfolio in portfolios]
+        if fields == 'summary' and portfolios:
+            rows = db.session.query(
+                PortfolioItem.portfolio_id,
+                func.count(PortfolioItem.id),
+                func.sum(PortfolioItem.quantity * PortfolioItem.purchase_price)
+            ).filter(
+                PortfolioItem.portfolio_id.in_([portfolio.id for portfolio in portfolios])
+            ).group_by(PortfolioItem.portfolio_id)
+            totals = {portfolio_id: (count, cost) for portfolio_id, count, cost in rows}
+            for entry in data:
+                count, cost = totals.get(entry['id'], (0, 0.0))
+                entry['item_count'] = count
+                entry['total_cost'] = cost or 0.0
+
         return jsonify({
             'success': True,
-            'portfolios': [portfolio.to_dict() for portfolio in portfolios]
+            'portfolios': data,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
@@ -259,6 +364,64 @@ def update_portfolio_item(portfolio_id, item_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/portfolios/<int:portfolio_id>/items/bulk', methods=['POST'])
+@jwt_required()
+def bulk_portfolio_items(portfolio_id):
+    """
+    Add and update many items at once: a JSON array (or {'items': [...]}),
+    a CSV upload in the 'file' form field, or a text/csv body. Rows with an
+    id update that item, the others are added. Invalid rows are reported
+    in 'errors' by 0-based row number; the valid rows are written in one
+    transaction.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+
+        # Verify portfolio belongs to user
+        portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).first()
+        if not portfolio:
+            return jsonify({'success': False, 'error': 'Portfolio not found'})
+
+        if 'file' in request.files:
+            frame = portfolio_import.read_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            frame = portfolio_import.read_csv(request.get_data(as_text=True))
+        else:
+            frame = portfolio_import.read_json(request.get_json(silent=True))
+        inserts, updates, errors = portfolio_import.validate(frame)
+
+        table = PortfolioItem.__table__
+        existing = {}
+        if updates:
+            rows = db.session.execute(select(table).where(table.c.portfolio_id == portfolio_id))
+            existing = {row['id']: row for row in rows.mappings()}
+        changes, updated, missing = portfolio_import.update_params(updates, existing)
+        errors.extend(missing)
+
+        created = []
+        if inserts:
+            # executemany; RETURNING gives the new ids in parameter order
+            new_ids = db.session.scalars(
+                table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                portfolio_import.insert_params(portfolio_id, inserts)
+            ).all()
+            created = [{'row': fields['row'], 'item_id': item_id} for fields, item_id in zip(inserts, new_ids)]
+        if changes:
+            # executemany; the SET clause comes from the parameter keys
+            db.session.execute(table.update().where(table.c.id == bindparam('item_id')), changes)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'created': created,
+            'updated': updated,
+            'errors': sorted(errors, key=lambda error: error['row'])
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/portfolios/<int:portfolio_id>/items/<int:item_id>', methods=['DELETE'])
 @jwt_required()
 def delete_portfolio_item(portfolio_id, item_id):
@@ -300,6 +463,13 @@ def predict_portfolio_earnings_route(portfolio_id):
         # Get prediction parameters
         method = data.get('method', 'average')  # 'lstm', 'arima', 'prophet', or 'average'
         days = int(data.get('days', 30))  # Number of days to predict
+        timeout = data.get('timeout', os.environ.get('PREDICT_TIMEOUT'))  # Seconds; partial results after that
+        timeout = float(timeout) if timeout is not None else None
+        scenarios = int(data.get('scenarios', 0))  # Monte Carlo paths for the risk section; 0 = off
+        if scenarios < 0:
+            return jsonify({'success': False, 'error': 'scenarios must not be negative'}), 400
+        scenarios = min(scenarios, scenario_engine.MAX_PATHS)
+        path_metrics = bool(data.get('path_metrics', False))
         
         # Validate method
         if method not in ['lstm', 'arima', 'prophet', 'average']:
@@ -313,7 +483,8 @@ def predict_portfolio_earnings_route(portfolio_id):
         portfolio_items = [item.to_dict() for item in portfolio.items]
         
         # Get predictions
-        result = predict_portfolio_earnings(portfolio_items, method, days)
+        result = predict_portfolio_earnings(portfolio_items, method, days, timeout=timeout,
+                                            scenarios=scenarios, path_metrics=path_metrics)
         
         return jsonify(result)
         
@@ -332,12 +503,156 @@ def test_auth():
         print(f"Test Auth Error: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+# ==================== INCREMENTAL MODEL REFRESH ====================
+
+@app.route('/<algorithm>/update', methods=['POST'])
+@jwt_required()
+def update_model_route(algorithm):
+    try:
+        if algorithm not in ['lstm', 'arima', 'prophet']:
+            return jsonify({'success': False, 'error': 'Invalid algorithm. Use: lstm, arima, or prophet'})
+        data = request.get_json() or {}
+        ticker = data.get('ticker', '^GSPC')
+        params = {'end': data.get('end')}
+        if algorithm == 'lstm' and 'epochs' in data:
+            params['epochs'] = int(data['epochs'])
+
+        job = jobs.submit(f'{algorithm}_update', ticker, params)
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/batch/train', methods=['POST'])
+@jwt_required()
+def batch_train_route():
+    """
+    Train a list of tickers with several algorithms as one background job.
+    Body: {"tickers": [...], "algorithms": [...], "params": {algorithm: {...}},
+    "concurrency": {algorithm: n}}. Poll /jobs/<id>; the finished job holds the report summary.
+    """
+    try:
+        data = request.get_json() or {}
+        tickers = data.get('tickers') or []
+        algorithms = data.get('algorithms', ['lstm', 'arima', 'prophet'])
+        if not tickers:
+            return jsonify({'success': False, 'error': 'tickers is required'})
+        invalid = [a for a in algorithms if a not in batch_training.DEFAULT_PARAMS]
+        if invalid:
+            return jsonify({'success': False, 'error': f'Invalid algorithms: {", ".join(invalid)}'})
+
+        job = jobs.submit('batch', f'batch:{len(tickers)}', {
+            'tickers': tickers, 'algorithms': algorithms,
+            'params': data.get('params'), 'concurrency': data.get('concurrency')})
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/backtest', methods=['POST'])
+@jwt_required()
+def backtest_route():
+    """
+    Walk-forward backtest of trained models as one background job.
+    Body: {"algorithms": [...], "tickers": [...] (default: all trained), "horizon": 20,
+    "folds": 20, "chunks": {algorithm: n}, "refit_every": 0, "concurrency": {algorithm: n}}.
+    Poll /jobs/<id>; the finished job holds the summary and the path of the per-horizon table.
+    """
+    try:
+        data = request.get_json() or {}
+        algorithms = data.get('algorithms', ['lstm', 'arima', 'prophet'])
+        invalid = [a for a in algorithms if a not in backtest.WALKERS]
+        if invalid:
+            return jsonify({'success': False, 'error': f'Invalid algorithms: {", ".join(invalid)}'})
+
+        tickers = data.get('tickers') or None
+        job = jobs.submit('backtest', f'backtest:{len(tickers) if tickers else "all"}', {
+            'algorithms': algorithms, 'tickers': tickers,
+            'horizon': int(data.get('horizon', backtest.DEFAULT_HORIZON)),
+            'folds': int(data.get('folds', backtest.DEFAULT_FOLDS)),
+            'chunks': data.get('chunks'), 'refit_every': int(data.get('refit_every', 0)),
+            'concurrency': data.get('concurrency')})
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 # ==================== EXISTING API ENDPOINTS (Updated with Authentication) ====================
 
+# ==================== TRAINING JOBS ====================
+
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    try:
+        job = db.session.get(TrainingJob, job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'})
+        return jsonify({'success': True, 'job': job.to_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/jobs', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    try:
+        query = TrainingJob.query
+        if request.args.get('status'):
+            query = query.filter_by(status=request.args['status'])
+        recent = query.order_by(TrainingJob.id.desc()).limit(int(request.args.get('limit', 50))).all()
+        return jsonify({'success': True, 'jobs': [job.to_dict() for job in recent]})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/hello')
 def hello():
     return jsonify({'success': True, 'message': 'Hello World!'})
 
+@app.route('/models', methods=['GET'])
+@jwt_required()
+def list_all_models():
+    try:
+        algorithm = request.args.get('algorithm')
+
+        def listing():
+            models = {}
+            for entry in catalog.entries(algorithm):
+                models.setdefault(entry['algorithm'], []).append(entry)
+            return {'success': True, 'generation': catalog.generation, 'models': models}
+
+        return response_cache.respond(('models', algorithm), response_cache.listing_validator(algorithm),
+                                      listing)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/registry/stats', methods=['GET'])
+@jwt_required()
+def registry_stats():
+    try:
+        return jsonify({'success': True, 'stats': registry.stats(),
+                        'response_cache': response_cache.cache.stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/workers', methods=['GET'])
+@jwt_required()
+def workers_status():
+    """Per-worker queue depth and latency; ?detail=1 also asks each worker for its registry."""
+    try:
+        detail = request.args.get('detail', '0') in ('1', 'true')
+        return jsonify({'success': True, **model_workers.stats(detail)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request and model-stage latency histograms (this process and the model workers), Prometheus text format."""
+    histograms = instrumentation.merge(instrumentation.snapshot(), *model_workers.metric_snapshots())
+    return Response(instrumentation.render(histograms), mimetype='text/plain; version=0.0.4')
+
+@app.route('/services', methods=['GET'])
+@jwt_required()
+def services_status():
+    """Which model services are imported, and how long start-up and each import took."""
+    return jsonify({'success': True, **service_loader.report()})
+
 # -------------------- LSTM --------------------
 @app.route('/lstm/train', methods=['POST'])
 @jwt_required()
@@ -350,8 +665,8 @@ def train_lstm():
         end = data.get('end', '2025-05-22')
         sequence_length = data.get('sequence_length', 60)
 
-        success = train_model(ticker=ticker, start=start, end=end, sequence_length=sequence_length)
-        return jsonify({'success': success})
+        job = jobs.submit('lstm', ticker, {'start': start, 'end': end, 'sequence_length': sequence_length})
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -364,19 +679,22 @@ def predict_lstm():
         days = int(request.args.get('days', 20))
         sequence_length = int(request.args.get('sequence_length', 60))
 
-        forecast = predict_next_days(ticker=ticker, days=days, sequence_length=sequence_length)
-        return jsonify({'success': True, 'data': forecast})
+        return response_cache.respond(
+            ('lstm/predict', ticker, days, sequence_length), response_cache.model_validator('lstm', ticker),
+            lambda: {'success': True, 'data': (
+                forecast_cache.get('lstm', ticker, days, sequence_length=sequence_length)
+                or predict_next_days(ticker=ticker, days=days, sequence_length=sequence_length))})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/lstm/models', methods=['GET'])
 @jwt_required()
 def list_lstm_models():
-    from Services.lstm_model_service import list_trained_models
     try:
         user_id = int(get_jwt_identity())
         print(f"LSTM Models - User ID from JWT: {user_id}")
-        return jsonify({'success': True, 'tickers': list_trained_models()})
+        return response_cache.respond(('lstm/models',), response_cache.listing_validator('lstm'),
+                                      lambda: {'success': True, 'tickers': catalog.tickers('lstm')})
     except Exception as e:
         print(f"LSTM Models Error: {e}")
         return jsonify({'success': False, 'error': str(e)})
@@ -392,19 +710,24 @@ def train_arima_route():
         start = data.get('start', '2020-01-01')
         end = data.get('end', '2025-04-08')
         exog_tickers = data.get('exog_tickers', ['GLD', 'QQQ', '^TNX'])
-
-        success = train_arima(ticker=ticker, start=start, end=end, exog_tickers=exog_tickers)
-        return jsonify({'success': success})
+        workers = int(data.get('workers', 1))
+        candidate_timeout = data.get('candidate_timeout')
+        if candidate_timeout is not None:
+            candidate_timeout = float(candidate_timeout)
+
+        job = jobs.submit('arima', ticker, {'start': start, 'end': end, 'exog_tickers': exog_tickers,
+                                            'workers': workers, 'candidate_timeout': candidate_timeout})
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/arima/models', methods=['GET'])
 @jwt_required()
 def list_arima_models_route():
-    from Services.arima_model_service import list_trained_models
     try:
         user_id = int(get_jwt_identity())  # Convert to int
-        return jsonify({'success': True, 'tickers': list_trained_models()})
+        return response_cache.respond(('arima/models',), response_cache.listing_validator('arima'),
+                                      lambda: {'success': True, 'tickers': catalog.tickers('arima')})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -415,8 +738,10 @@ def predict_arima_route():
         user_id = int(get_jwt_identity())  # Convert to int
         ticker = request.args.get('ticker', '^GSPC')
         days = int(request.args.get('days', 10))
-        forecast = predict_arima(ticker=ticker, days=days)
-        return jsonify({'success': True, 'data': forecast})
+        return response_cache.respond(
+            ('arima/predict', ticker, days), response_cache.model_validator('arima', ticker),
+            lambda: {'success': True, 'data': (forecast_cache.get('arima', ticker, days)
+                                               or predict_arima(ticker=ticker, days=days))})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -431,8 +756,8 @@ def train_prophet_route():
         start = data.get('start', '2015-01-01')
         end = data.get('end', '2025-05-22')
 
-        success = train_prophet(ticker=ticker, start=start, end=end)
-        return jsonify({'success': success})
+        job = jobs.submit('prophet', ticker, {'start': start, 'end': end})
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -443,20 +768,55 @@ def predict_prophet_route():
         user_id = int(get_jwt_identity())  # Convert to int
         ticker = request.args.get('ticker', '^GSPC')
         days = int(request.args.get('days', 10))
-        forecast = predict_prophet(ticker=ticker, days=days)
-        return jsonify({'success': True, 'data': forecast})
+        # interval=sample|analytic|none and uncertainty_samples bypass the stored forecast
+        options = {}
+        if 'interval' in request.args:
+            options['interval'] = request.args['interval']
+        if 'uncertainty_samples' in request.args:
+            options['uncertainty_samples'] = int(request.args['uncertainty_samples'])
+        return response_cache.respond(
+            ('prophet/predict', ticker, days, tuple(sorted(options.items()))),
+            response_cache.model_validator('prophet', ticker),
+            lambda: {'success': True, 'data': ((not options and forecast_cache.get('prophet', ticker, days))
+                                               or predict_prophet(ticker=ticker, days=days, **options))})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/prophet/models', methods=['GET'])
 @jwt_required()
 def list_prophet_models_route():
-    from Services.prophet_model_service import list_trained_models
     try:
         user_id = int(get_jwt_identity())  # Convert to int
-        return jsonify({'success': True, 'tickers': list_trained_models()})
+        return response_cache.respond(('prophet/models',), response_cache.listing_validator('prophet'),
+                                      lambda: {'success': True, 'tickers': catalog.tickers('prophet')})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def start_background(port):
+    """Jobs, forecast refresh, catalog watcher and optional prewarm for the serving process."""
+    service_loader.print_report()
+    jobs.start()
+    refresh_seconds = float(os.environ.get('FORECAST_REFRESH_SECONDS', 3600))
+    if refresh_seconds > 0:  # 0 disables it, e.g. on CRUD-only replicas
+        forecast_cache.start_scheduler(refresh_seconds)
+    catalog.start_watcher(float(os.environ.get('MODEL_CATALOG_POLL_SECONDS', 60)))
+    # Comma-separated algorithms to import in the background once the port is bound
+    prewarm = [a.strip() for a in os.environ.get('PREWARM_SERVICES', '').split(',') if a.strip()]
+    if prewarm and not service_loader.is_routed():
+        service_loader.prewarm(prewarm, port=port)
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5555)
\ No newline at end of file
+    import sys
+    port = int(os.environ.get('PORT', 5555))
+    if '--production' in sys.argv or os.environ.get('SERVE_MODE') == 'production':
+        # Predictions run in MODEL_WORKERS processes, each owning a shard of
+        # (algorithm, ticker); this process serves HTTP and runs training jobs
+        model_workers.start(int(os.environ.get('MODEL_WORKERS', os.cpu_count() or 1)))
+        start_background(port)
+        app.run(host=os.environ.get('HOST', '127.0.0.1'), port=port,
+                debug=False, threaded=True, use_reloader=False)
+    else:
+        # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_background(port)
+        app.run(debug=True, port=port)
\ No newline at end of file
@@ -3,44 +3,55 @@
 import os
 import time
 import json
-import requests
 import pickle
+import multiprocessing
+import multiprocessing.connection
 from itertools import product
 
 import numpy as np
 import pandas as pd
-import yfinance as yf
-import pandas_datareader.data as web  # fallback source
 from sklearn.metrics import mean_squared_error
-from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+from Services.model_registry import registry
+from Services import forecast_cache
+from Services.model_catalog import catalog
+from Services.market_data import store as price_store
+from Services import artifacts, arima_runtime
+from Services.instrumentation import span, timed
+
+# statsmodels is imported where models are fitted or legacy pickles are read;
+# forecasting a slim model (state arrays in its artifact) is plain NumPy.
 
 # ------------------------------------------------------------------
-# 1. Safe download helper (yfinance → stooq fallback)
+# 1. Download helper (shared on-disk price store)
 # ------------------------------------------------------------------
 def fetch_close(ticker: str, start: str, end: str) -> pd.DataFrame:
     """Return a DataFrame with a single 'Close' column for *ticker*."""
-    for wait in (1, 2, 3):  # three yfinance tries
-        try:
-            df = yf.download(
-                ticker,
-                start=start,
-                end=end,
-                auto_adjust=False,
-                progress=False,
-                threads=False,
-                repair=True
-            )
-            if not df.empty:
-                return df[['Close']]
-        except (json.JSONDecodeError, requests.exceptions.RequestException):
-            time.sleep(wait)
+    return price_store.get_close(ticker, start, end)
 
-    # fallback to stooq (works for most major symbols)
-    try:
-        alt = web.DataReader(ticker.lstrip('^'), 'stooq', start, end)
-        return alt[::-1][['Close']]
-    except Exception as e:
-        raise RuntimeError(f"cannot retrieve data for {ticker}") from e
+
+@timed('fetch', 'arima')
+def load_frame(ticker: str, exog_tickers: list, start: str, end: str) -> pd.DataFrame:
+    """
+    Target ('y') and exogenous closes aligned on a forward-filled business-day
+    index named 'ds'.
+    """
+    # Download whatever is missing for all series at once, then read them
+    failed = price_store.ensure_many([ticker, *exog_tickers], start, end)
+    if failed:
+        raise RuntimeError(f"cannot retrieve data for {', '.join(failed)}") from next(iter(failed.values()))
+    data = fetch_close(ticker, start, end).rename(columns={'Close': 'y'})
+    exo_list = []
+    for t in exog_tickers:
+        df_exo = fetch_close(t, start, end).rename(columns={'Close': t})
+        exo_list.append(df_exo)
+        df_exo.index.name = 'ds'
+
+    exog_data = pd.concat(exo_list, axis=1).ffill()
+    df = pd.concat([data, exog_data], axis=1).dropna()
+    df = df.asfreq('B').ffill()
+    df.index.name = 'ds'
+    return df
 
 
 # ------------------------------------------------------------------
@@ -51,19 +62,185 @@ MODEL_PATH    = os.path.join(BASE_DIR, 'arima_model.pkl')
 EXOG_PATH     = os.path.join(BASE_DIR, 'arima_exog.pkl')
 PARAMS_PATH   = os.path.join(BASE_DIR, 'arima_params.json')
 MODELS_DIR    = "models/arima_models"
-FORECAST_PATH = os.path.join(MODELS_DIR, 'forecast.json')
+
+LEGACY_FILES  = ('arima_model.pkl', 'arima_exog.pkl', 'arima_params.json', 'data.csv')
+PICKLE_FILES  = ('arima_model.pkl', 'arima_exog.pkl')
+
+# 'pickle' serves the pickled statsmodels results even where a slim state exists
+ARIMA_RUNTIME = os.environ.get('ARIMA_RUNTIME', 'state_space')
+# Slim models are stored without the pickled results; ARIMA_KEEP_PICKLES=1
+# keeps them too (so ARIMA_RUNTIME=pickle works without retraining)
+KEEP_PICKLES  = os.environ.get('ARIMA_KEEP_PICKLES', '0') == '1'
+
+
+def _write_artifact(stock_dir: str, ticker: str, X: pd.DataFrame, params: dict, state: dict = None):
+    """
+    Artifact with what a forecast needs: the last exogenous row, the params
+    and, for slim models, the state-space arrays (see arima_runtime). A slim
+    model's pickled results are removed unless ARIMA_KEEP_PICKLES=1.
+    """
+    arrays = {'exog_last': X.iloc[-1:].to_numpy(dtype=np.float64),
+              'exog_last_date': X.index[-1:].values.astype('datetime64[D]')}
+    if state is not None:
+        arrays.update(state)
+    artifacts.write(stock_dir, 'arima', ticker, arrays,
+                    meta={'params': params, 'runtime': 'state_space' if state is not None else 'pickle'},
+                    window={'start': params.get('start'), 'end': params.get('end')})
+    if state is not None and not KEEP_PICKLES:
+        for name in PICKLE_FILES:
+            path = os.path.join(stock_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
 
 # ------------------------------------------------------------------
-# 3. Train function
+# 3. Grid search helpers
+# ------------------------------------------------------------------
+def _report(progress, **info):
+    if progress is not None:
+        progress(info)
+
+
+PRUNE_FRACTION = 0.2  # share of the test window scored before the bound check
+
+
+def _evaluate_candidate(train_y, train_X, test_y, test_X, params, m, bound=np.inf):
+    """
+    Fit one SARIMAX candidate and return its test MSE, or None when it fails
+    or provably cannot beat *bound* (the best MSE known when it was queued).
+    The partial squared error over the first part of the test window is a
+    lower bound on the full one, so pruning never changes the winner.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    p, d, q, P, D, Q = params
+    try:
+        mdl = SARIMAX(
+            train_y,
+            exog=train_X,
+            order=(p, d, q),
+            seasonal_order=(P, D, Q, m),
+            enforce_stationarity=False,
+            enforce_invertibility=False
+        ).fit(disp=False, maxiter=200)
+
+        n = len(test_y)
+        k = max(1, int(n * PRUNE_FRACTION))
+        if np.isfinite(bound) and k < n:
+            head = mdl.predict(
+                start=test_y.index[0],
+                end=test_y.index[k - 1],
+                exog=test_X[:k]
+            )
+            partial_sse = float(np.sum((np.ravel(test_y[:k]) - np.ravel(head)) ** 2))
+            if partial_sse / n > bound * (1 + 1e-9):
+                return None
+
+        pred = mdl.predict(
+            start=test_y.index[0],
+            end=test_y.index[-1],
+            exog=test_X
+        )
+        return mean_squared_error(test_y, pred)
+    except Exception:
+        return None
+
+
+def _candidate_main(conn, args):
+    """Process entry point: evaluate one candidate and send 'started', then its MSE."""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX  # noqa: F401 (imported before the clock starts)
+    try:
+        conn.send('started')
+        conn.send(_evaluate_candidate(*args))
+    finally:
+        conn.close()
+
+
+def _grid_search_parallel(candidates, train_y, train_X, test_y, test_X, m,
+                          workers, candidate_timeout, progress=None):
+    """
+    Evaluate *candidates* in separate processes, at most *workers* at a time.
+    A candidate still fitting *candidate_timeout* seconds after it started
+    (process start-up excluded) is killed and treated like a failed fit.
+    Returns {candidate index: mse}.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    scores = {}
+    best = np.inf
+    finished = 0
+    running = {}  # receiving end -> [candidate index, process, fit start or None]
+    queue = list(enumerate(candidates))
+    try:
+        while queue or running:
+            while queue and len(running) < workers:
+                idx, params = queue.pop(0)
+                receiver, sender = ctx.Pipe(duplex=False)
+                process = ctx.Process(target=_candidate_main, daemon=True,
+                                      args=(sender, (train_y, train_X, test_y, test_X, params, m, best)))
+                process.start()
+                sender.close()
+                running[receiver] = [idx, process, None]
+
+            timeout = None
+            started = [entry[2] for entry in running.values() if entry[2] is not None]
+            if candidate_timeout is not None and started:
+                timeout = max(0.0, min(started) + candidate_timeout - time.monotonic())
+            ready = multiprocessing.connection.wait(list(running), timeout=timeout)
+
+            now = time.monotonic()
+            for receiver in list(running):
+                entry = running[receiver]
+                idx, process, began = entry
+                if receiver in ready:
+                    try:
+                        message = receiver.recv()
+                    except EOFError:
+                        message = None  # the process died
+                    if message == 'started':
+                        entry[2] = time.monotonic()
+                        continue
+                    mse = message
+                elif candidate_timeout is not None and began is not None and now - began >= candidate_timeout:
+                    process.kill()
+                    mse = None
+                else:
+                    continue
+
+                del running[receiver]
+                receiver.close()
+                process.join()
+                if mse is not None:
+                    scores[idx] = mse
+                    best = min(best, mse)
+                finished += 1
+                _report(progress, phase='grid_search', candidate=finished,
+                        candidates=len(candidates))
+    finally:
+        for receiver, (_, process, _) in running.items():
+            process.kill()
+            process.join()
+            receiver.close()
+    return scores
+
+
+# ------------------------------------------------------------------
+# 4. Train function
 # ------------------------------------------------------------------
 def train_model(ticker: str = '^GSPC',
                 start: str = '2020-01-01',
                 end: str = '2025-04-08',
-                exog_tickers: list = None) -> bool:
+                exog_tickers: list = None,
+                workers: int = 1,
+                candidate_timeout: float = None,
+                progress=None) -> bool:
     """
     Downloads data for *ticker* and *exog_tickers*, performs grid search over SARIMAX
     orders, fits the best model on the full sample, and saves both the model and
     latest exogenous DataFrame to disk.
+    With *workers* > 1 (or a *candidate_timeout* in seconds) the grid search runs
+    candidates in separate processes; without timeouts the selected orders match
+    the serial search.
+    *progress*, if given, is called with a dict per phase / grid candidate.
     Returns True on success, raises on failure.
     """
 
@@ -79,17 +256,8 @@ def train_model(ticker: str = '^GSPC',
         exog_tickers = ['GLD', 'QQQ', '^TNX']
 
     # 1. Download & merge
-    data = fetch_close(ticker, start, end).rename(columns={'Close': 'y'})
-    exo_list = []
-    for t in exog_tickers:
-        df_exo = fetch_close(t, start, end).rename(columns={'Close': t})
-        exo_list.append(df_exo)
-        df_exo.index.name = 'ds'
-
-    exog_data = pd.concat(exo_list, axis=1).ffill()
-    df = pd.concat([data, exog_data], axis=1).dropna()
-    df = df.asfreq('B').ffill()
-    df.index.name = 'ds'
+    _report(progress, phase='download')
+    df = load_frame(ticker, exog_tickers, start, end)
     y = df['y']
     X = df[exog_tickers]
 
@@ -103,80 +271,142 @@ def train_model(ticker: str = '^GSPC',
     P_range = D_range = Q_range = range(0, 1)
     m = 7  # weekly seasonality
 
-    best_mse = np.inf
+    candidates = list(product(p_range, d_range, q_range,
+                              P_range, D_range, Q_range))
+
+    with span('grid_search', 'arima', ticker):
+        if workers > 1 or candidate_timeout is not None:
+            scores = _grid_search_parallel(candidates, train_y, train_X, test_y,
+                                           test_X, m, workers, candidate_timeout,
+                                           progress)
+        else:
+            scores = {}
+            best = np.inf
+            for idx, params in enumerate(candidates):
+                _report(progress, phase='grid_search', candidate=idx + 1,
+                        candidates=len(candidates))
+                mse = _evaluate_candidate(train_y, train_X, test_y, test_X,
+                                          params, m, best)
+                if mse is not None:
+                    scores[idx] = mse
+                    best = min(best, mse)
+
+    # Lowest MSE wins; ties go to the earliest candidate, as in the serial loop
     best_params = None
-
-    for p, d, q, P, D, Q in product(p_range, d_range, q_range,
-                                      P_range, D_range, Q_range):
-        try:
-            mdl = SARIMAX(
-                train_y,
-                exog=train_X,
-                order=(p, d, q),
-                seasonal_order=(P, D, Q, m),
-                enforce_stationarity=False,
-                enforce_invertibility=False
-            ).fit(disp=False, maxiter=200)
-
-            pred = mdl.predict(
-                start=test_y.index[0],
-                end=test_y.index[-1],
-                exog=test_X
-            )
-            mse = mean_squared_error(test_y, pred)
-            if mse < best_mse:
-                best_mse, best_params = mse, (p, d, q, P, D, Q)
-        except Exception:
-            continue
+    ranked = [(mse, idx) for idx, mse in scores.items() if not np.isnan(mse)]
+    if ranked:
+        best_params = candidates[min(ranked)[1]]
 
     if best_params is None:
         raise RuntimeError("all SARIMAX candidates failed")
 
     # 4. Save best_params to JSON
+    saved_params = {
+        'ticker': ticker,
+        'start': start,
+        'end': end,
+        'exog_tickers': exog_tickers,
+        'best_params': {
+            'order': best_params[:3],
+            'seasonal_order': best_params[3:] + (m,)
+        }
+    }
     with open(PARAMS_PATH, 'w') as f:
-        json.dump({
-            'ticker': ticker,
-            'start': start,
-            'end': end,
-            'exog_tickers': exog_tickers,
-            'best_params': {
-                'order': best_params[:3],
-                'seasonal_order': best_params[3:] + (m,)
-            }
-        }, f)
+        json.dump(saved_params, f)
 
     p, d, q, P, D, Q = best_params
 
     # 5. Refit best model on full sample
-    final_model = SARIMAX(
-        y,
-        exog=X,
-        order=(p, d, q),
-        seasonal_order=(P, D, Q, m),
-        enforce_stationarity=False,
-        enforce_invertibility=False
-    ).fit(disp=False)
-
-    # 6. Persist the fitted model and exogenous DataFrame
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(final_model, f)
-    X.to_pickle(EXOG_PATH)
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    _report(progress, phase='fit')
+    with span('fit', 'arima', ticker):
+        final_model = SARIMAX(
+            y,
+            exog=X,
+            order=(p, d, q),
+            seasonal_order=(P, D, Q, m),
+            enforce_stationarity=False,
+            enforce_invertibility=False
+        ).fit(disp=False)
+
+    # 6. Persist parameters and forecast state (and, unless only the slim
+    #    state is kept, the fitted model and exogenous DataFrame)
+    _report(progress, phase='save')
     df.to_csv(DATA_PATH, index=True)
+    state = arima_runtime.from_results(final_model)
+    if state is None or KEEP_PICKLES:
+        with open(MODEL_PATH, 'wb') as f:
+            pickle.dump(final_model, f)
+        X.to_pickle(EXOG_PATH)
+    _write_artifact(stock_dir, ticker, X, json.loads(json.dumps(saved_params)), state)
+
+    catalog.refresh('arima', ticker)
+    return True
+
+
+def update_model(ticker: str = '^GSPC', end: str = None, progress=None) -> bool:
+    """
+    Extend the saved model with the business days after its last observation
+    up to *end* (default: today), keeping the fitted parameters: pickled
+    results are appended to (and the slim state taken from them where
+    possible); models stored only in the slim format run the Kalman filter
+    over the new rows. The new rows are appended to data.csv.
+    Returns True on success (also when there is nothing new).
+    """
+    stock_dir   = os.path.join(MODELS_DIR, ticker.replace('^','').replace('/','_'))
+    PARAMS_PATH = os.path.join(stock_dir, 'arima_params.json')
+    DATA_PATH   = os.path.join(stock_dir, 'data.csv')
 
-    
+    # The pickles, when kept, are updated too so they stay a valid fallback
+    keep = KEEP_PICKLES and os.path.exists(os.path.join(stock_dir, 'arima_model.pkl'))
+    model, exog, params, _ = load_state(ticker, full=keep)
+    exog_tickers = params['exog_tickers']
+    end = end or (pd.Timestamp.today().normalize() + pd.Timedelta(days=1)).date().isoformat()
+    last = exog.index[-1]
+
+    # A short overlap lets the forward fill see the last known values
+    _report(progress, phase='download')
+    lookback = (last - pd.Timedelta(days=14)).date().isoformat()
+    df = load_frame(ticker, exog_tickers, lookback, end)
+    new = df[df.index > last]
+    if new.empty:
+        return True
+
+    _report(progress, phase='fit')
+    with span('fit', 'arima', ticker):
+        if isinstance(model, arima_runtime.StateSpaceForecaster):
+            state = model.append(new['y'], new[exog_tickers]).to_arrays()
+        else:
+            model = model.append(new['y'], exog=new[exog_tickers], refit=False)
+            state = arima_runtime.from_results(model)
+
+    _report(progress, phase='save')
+    if not isinstance(model, arima_runtime.StateSpaceForecaster) and (state is None or KEEP_PICKLES):
+        with open(os.path.join(stock_dir, 'arima_model.pkl'), 'wb') as f:
+            pickle.dump(model, f)
+        pd.concat([exog, new[exog_tickers]]).to_pickle(os.path.join(stock_dir, 'arima_exog.pkl'))
+    new[['y'] + exog_tickers].to_csv(DATA_PATH, mode='a', header=False)
+    params['end'] = end
+    with open(PARAMS_PATH, 'w') as f:
+        json.dump(params, f)
+    _write_artifact(stock_dir, ticker, new[exog_tickers], params, state)
+    catalog.refresh('arima', ticker)
     return True
 
 
 # ------------------------------------------------------------------
-# 4. Predict function
+# 5. Predict function
 # ------------------------------------------------------------------
 def predict_next_days(ticker: str = '^GSPC', days: int = 10) -> dict:
     """
     Forecast the next *days* business days using the trained SARIMAX and exogenous series.
     Returns a dict with 'dates', 'forecast_mean', 'forecast_ci_lower', and 'forecast_ci_upper'.
     """
-    # Load all saved state from ticker directory
-    model, exog, params, df = load_state(ticker)
+    # Load all saved state from ticker directory (cached across calls)
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace('^','').replace('/','_'))
+    model, exog, params, df = registry.get('arima', ticker, stock_dir,
+                                           lambda: load_state(ticker))
 
     # Build future exogenous by repeating the last row
     last_row = exog.iloc[-1].values.reshape(1, -1)
@@ -191,9 +421,15 @@ def predict_next_days(ticker: str = '^GSPC', days: int = 10) -> dict:
     )
 
     # Generate forecast
-    forecast = model.get_forecast(steps=days, exog=future_exog)
-    mean = forecast.predicted_mean
-    ci   = forecast.conf_int(alpha=0.05)
+    with span('forecast', 'arima', ticker):
+        if isinstance(model, arima_runtime.StateSpaceForecaster):
+            mean, lower, upper = model.forecast(days, future_exog.to_numpy(), alpha=0.05)
+            mean = pd.Series(mean, index=future_exog.index)
+            ci   = pd.DataFrame({'lower y': lower, 'upper y': upper}, index=future_exog.index)
+        else:
+            forecast = model.get_forecast(steps=days, exog=future_exog)
+            mean = forecast.predicted_mean
+            ci   = forecast.conf_int(alpha=0.05)
 
     return {
         'dates':             mean.index.strftime('%Y-%m-%d').tolist(),
@@ -202,9 +438,13 @@ def predict_next_days(ticker: str = '^GSPC', days: int = 10) -> dict:
         'forecast_ci_upper': ci.iloc[:, 1].tolist()
     }
 
-def load_state(ticker: str):
+@timed('load_state', 'arima')
+def load_state(ticker: str, full: bool = False):
     """
     Load model, exogenous DataFrame, params JSON & full history for *ticker*.
+    With a current artifact (and not *full*) the exogenous frame is only its
+    last row, params come from the manifest, the history is not read (None)
+    and slim models come back as a StateSpaceForecaster.
     """
     stock_dir   = os.path.join(MODELS_DIR, ticker.replace('^','').replace('/','_'))
     MODEL_PATH  = os.path.join(stock_dir, 'arima_model.pkl')
@@ -212,21 +452,31 @@ def load_state(ticker: str):
     PARAMS_PATH = os.path.join(stock_dir, 'arima_params.json')
     DATA_PATH   = os.path.join(stock_dir, 'data.csv')
 
+    if not full and artifacts.is_current(stock_dir, sources=LEGACY_FILES):
+        manifest, arrays = artifacts.load(stock_dir)
+        params = manifest['meta']['params']
+        exog = pd.DataFrame(arrays['exog_last'], columns=params['exog_tickers'],
+                            index=pd.DatetimeIndex(arrays['exog_last_date']))
+        if manifest['meta'].get('runtime') == 'state_space' and (
+                ARIMA_RUNTIME != 'pickle' or not os.path.exists(MODEL_PATH)):
+            return arima_runtime.StateSpaceForecaster(arrays), exog, params, None
+        return pickle.load(open(MODEL_PATH, 'rb')), exog, params, None
+
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"no ARIMA model state in {stock_dir}")
     model  = pickle.load(open(MODEL_PATH, 'rb'))
     exog   = pd.read_pickle(EXOG_PATH)
     params = json.load(open(PARAMS_PATH))
     df     = pd.read_csv(DATA_PATH, index_col=0, parse_dates=True)
     return model, exog, params, df
 
-def get_cached_forecast() -> dict | None:
-    """If you ever write out a forecast.json, load & return it here."""
-    if os.path.exists(FORECAST_PATH):
-        return pd.read_json(FORECAST_PATH).to_dict(orient='list')
-    return None
+def get_cached_forecast(ticker: str = '^GSPC', days: int = 10) -> dict | None:
+    """Materialized forecast sliced to *days*, or None if missing or stale."""
+    return forecast_cache.get('arima', ticker, days)
 
 def list_trained_models() -> list[str]:
-    """Returns all tickers for which a model folder exists."""
-    return [
-        name for name in os.listdir(MODELS_DIR)
-        if os.path.isdir(os.path.join(MODELS_DIR, name))
-    ]
\ No newline at end of file
+    """Returns all tickers with a complete model (from the model catalog)."""
+    return catalog.tickers('arima')
+
+
+forecast_cache.register('arima', MODELS_DIR, predict_next_days)
@@ -0,0 +1,105 @@
+# Services/arima_runtime.py
+
+from statistics import NormalDist
+
+import numpy as np
+
+# Artifact arrays of a slim SARIMAX model
+STATE_ARRAYS = ('params', 'design', 'transition', 'state_intercept', 'state_noise',
+                'obs_cov', 'exog_coef', 'state_mean', 'state_cov')
+
+
+# ------------------------------------------------------------------
+# 1. Export (needs statsmodels, runs after fitting)
+# ------------------------------------------------------------------
+def from_results(results) -> dict | None:
+    """
+    The parts of fitted SARIMAXResults a forecast needs: the parameter vector,
+    the time-invariant state-space matrices, the exogenous coefficients and
+    the predicted state mean/covariance for the first period after the sample.
+    Sizes depend on the model order only. Returns None for models this
+    forecaster does not cover (time trend, time-varying matrices, state
+    regression).
+    """
+    model = results.model
+    if getattr(model, 'k_trend', 0) or not getattr(model, 'mle_regression', True):
+        return None
+    model.update(results.params)
+    ssm = model.ssm
+    matrices = {name: np.asarray(ssm[name]) for name in
+                ('design', 'transition', 'state_intercept', 'selection', 'state_cov', 'obs_cov')}
+    if any(m.ndim == 3 or (name == 'state_intercept' and m.ndim == 2 and m.shape[1] > 1)
+           for name, m in matrices.items()):
+        return None
+
+    params = np.asarray(results.params, dtype=np.float64)
+    selection = matrices['selection']
+    return {
+        'params': params,
+        'design': matrices['design'],
+        'transition': matrices['transition'],
+        'state_intercept': matrices['state_intercept'].reshape(-1),
+        'state_noise': selection @ matrices['state_cov'] @ selection.T,
+        'obs_cov': matrices['obs_cov'],
+        'exog_coef': params[:model.k_exog],
+        'state_mean': np.asarray(results.predicted_state)[:, -1],
+        'state_cov': np.asarray(results.predicted_state_cov)[:, :, -1],
+    }
+
+
+# ------------------------------------------------------------------
+# 2. Forecaster
+# ------------------------------------------------------------------
+class StateSpaceForecaster:
+    """
+    Kalman forecasts and updates for a linear Gaussian state-space model
+    y_t = Z a_t + x_t'beta + eps_t,  a_{t+1} = T a_t + c + R eta_t,
+    starting from the predicted state (a, P) of the next period.
+    """
+
+    def __init__(self, arrays: dict):
+        self.Z = np.asarray(arrays['design'], dtype=np.float64)
+        self.T = np.asarray(arrays['transition'], dtype=np.float64)
+        self.c = np.asarray(arrays['state_intercept'], dtype=np.float64)
+        self.RQR = np.asarray(arrays['state_noise'], dtype=np.float64)
+        self.H = np.asarray(arrays['obs_cov'], dtype=np.float64)
+        self.beta = np.asarray(arrays['exog_coef'], dtype=np.float64)
+        self.params = np.asarray(arrays['params'], dtype=np.float64)
+        self.a = np.array(arrays['state_mean'], dtype=np.float64)
+        self.P = np.array(arrays['state_cov'], dtype=np.float64)
+
+    def to_arrays(self) -> dict:
+        return {'params': self.params, 'design': self.Z, 'transition': self.T,
+                'state_intercept': self.c, 'state_noise': self.RQR, 'obs_cov': self.H,
+                'exog_coef': self.beta, 'state_mean': self.a, 'state_cov': self.P}
+
+    def forecast(self, steps: int, exog, alpha: float = 0.05) -> tuple:
+        """(mean, lower, upper) for the next *steps* periods given their exog rows."""
+        exog = np.asarray(exog, dtype=np.float64).reshape(steps, -1)
+        intercept = exog @ self.beta if self.beta.size else np.zeros(steps)
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        a, P = self.a, self.P
+        mean, var = np.empty(steps), np.empty(steps)
+        for h in range(steps):
+            mean[h] = (self.Z @ a)[0] + intercept[h]
+            var[h] = (self.Z @ P @ self.Z.T + self.H)[0, 0]
+            a = self.T @ a + self.c
+            P = self.T @ P @ self.T.T + self.RQR
+        half = z * np.sqrt(np.maximum(var, 0.0))
+        return mean, mean - half, mean + half
+
+    def append(self, endog, exog) -> 'StateSpaceForecaster':
+        """A forecaster whose state has absorbed the new observations (parameters unchanged)."""
+        endog = np.asarray(endog, dtype=np.float64).reshape(-1)
+        exog = np.asarray(exog, dtype=np.float64).reshape(len(endog), -1)
+        a, P = self.a.copy(), self.P.copy()
+        for y, x in zip(endog, exog):
+            F = (self.Z @ P @ self.Z.T + self.H)[0, 0]
+            v = y - (self.Z @ a)[0] - (x @ self.beta if self.beta.size else 0.0)
+            K = (self.T @ P @ self.Z.T)[:, 0] / F
+            a = self.T @ a + self.c + K * v
+            P = self.T @ P @ self.T.T + self.RQR - np.outer(K, K) * F
+            P = (P + P.T) / 2
+        updated = StateSpaceForecaster(self.to_arrays())
+        updated.a, updated.P = a, P
+        return updated
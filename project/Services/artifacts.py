@@ -0,0 +1,145 @@
+# Services/artifacts.py
+
+import os
+import json
+import time
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+ARRAYS_PREFIX = 'arrays-'  # one directory of .npy files per written version
+
+
+# ------------------------------------------------------------------
+# 1. Write
+# ------------------------------------------------------------------
+def write(stock_dir: str, algorithm: str, ticker: str, arrays: dict, meta: dict = None,
+          window: dict = None) -> dict:
+    """
+    Store a model artifact in *stock_dir*: one .npy file per array (so each can
+    be memory-mapped) in a new arrays-<n> directory, and manifest.json with the
+    format version, training *window* ({start, end}), array index and *meta*.
+    Replacing the manifest switches readers to the new arrays. Files of earlier
+    versions are never overwritten, since a served model may still have them
+    mapped (Windows refuses to replace those). The version just replaced is
+    kept for readers that read the old manifest a moment ago; prune() removes
+    the ones before it.
+    """
+    version = f'{ARRAYS_PREFIX}{time.time_ns()}'
+    os.makedirs(os.path.join(stock_dir, version))
+    previous = read_manifest(stock_dir)
+    index = {}
+    for name, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        filename = f'{version}/{name}.npy'
+        with open(os.path.join(stock_dir, filename), 'wb') as f:
+            np.save(f, value, allow_pickle=False)
+        index[name] = {'file': filename, 'dtype': str(value.dtype), 'shape': list(value.shape)}
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'algorithm': algorithm,
+        'ticker': ticker,
+        'created_at': datetime.utcnow().isoformat(),
+        'training_window': window or {},
+        'arrays': index,
+        'previous': sorted(_versions(previous)),
+        'meta': meta or {},
+    }
+    path = os.path.join(stock_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, default=str)
+    os.replace(path + '.tmp', path)
+    prune(stock_dir)
+    return manifest
+
+
+def _versions(manifest) -> set:
+    """Array directories (or legacy top-level files) *manifest* refers to."""
+    if manifest is None:
+        return set()
+    return {entry['file'].split('/')[0] for entry in manifest['arrays'].values()}
+
+
+def prune(stock_dir: str):
+    """
+    Remove array files and directories that neither the manifest nor the
+    version it replaced refer to. Those that cannot be removed yet (still
+    mapped, on Windows) are left for a later call; the registry calls this
+    when it drops a loaded model.
+    """
+    manifest = read_manifest(stock_dir)
+    if manifest is None:
+        return
+    keep = _versions(manifest) | set(manifest.get('previous', ()))
+    with os.scandir(stock_dir) as it:
+        stale = [entry for entry in it if entry.name not in keep and (
+            entry.name.startswith(ARRAYS_PREFIX) or entry.name.endswith('.npy'))]
+    for entry in stale:
+        try:
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def remove(stock_dir: str):
+    """Delete the manifest and every array version (for models no longer stored as artifacts)."""
+    try:
+        os.remove(os.path.join(stock_dir, MANIFEST_FILE))
+    except FileNotFoundError:
+        pass
+    with os.scandir(stock_dir) as it:
+        stale = [entry for entry in it if entry.name.startswith(ARRAYS_PREFIX)]
+    for entry in stale:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# ------------------------------------------------------------------
+# 2. Read
+# ------------------------------------------------------------------
+def read_manifest(stock_dir: str) -> dict | None:
+    """The manifest, or None when there is none or it has another format version."""
+    path = os.path.join(stock_dir, MANIFEST_FILE)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format_version') == FORMAT_VERSION else None
+
+
+def is_current(stock_dir: str, sources=()) -> bool:
+    """
+    True when a readable manifest exists and is not older than any of the
+    legacy *sources* files (e.g. a model.h5 copied in by hand).
+    """
+    path = os.path.join(stock_dir, MANIFEST_FILE)
+    if read_manifest(stock_dir) is None:
+        return False
+    mtime = os.path.getmtime(path)
+    return all(not os.path.exists(os.path.join(stock_dir, name))
+               or os.path.getmtime(os.path.join(stock_dir, name)) <= mtime
+               for name in sources)
+
+
+def load(stock_dir: str, names=None, mmap: bool = True) -> tuple:
+    """
+    (manifest, {name: array}) for the arrays in *names* (default: all).
+    Arrays are read-only memory maps unless *mmap* is False. Returns
+    (None, {}) when there is no usable manifest.
+    """
+    manifest = read_manifest(stock_dir)
+    if manifest is None:
+        return None, {}
+    index = manifest['arrays']
+    arrays = {}
+    for name in (index if names is None else names):
+        arrays[name] = np.load(os.path.join(stock_dir, index[name]['file']),
+                               mmap_mode='r' if mmap else None, allow_pickle=False)
+    return manifest, arrays
@@ -0,0 +1,377 @@
+# Services/backtest.py
+"""
+Walk-forward (rolling-origin) backtests over the stored model histories.
+
+    python -m Services.backtest --algorithms arima,prophet --tickers AAPL,MSFT
+    python -m Services.backtest --algorithms lstm --horizon 10 --folds 30
+
+Run from the project directory. Without --tickers every complete model of
+each algorithm in the catalog is tested. For each origin the model sees only
+the rows of its data.csv before it and forecasts the next *horizon* rows;
+errors are aggregated per horizon step into a CSV table (MAE, MAPE,
+directional accuracy and the MAE of a last-value forecast as baseline).
+
+How each algorithm is refitted:
+  arima    fitted once at the first origin of a chunk (orders from
+           arima_params.json), then the Kalman state is extended row by row;
+           optionally refitted every --refit-every folds
+  prophet  refitted at every origin, warm-started from the previous fold
+  lstm     the stored model, not refitted; origins lie in the last 10% of
+           the windows, which train_model held out (later update_model
+           fine-tunes may have seen them)
+
+(ticker, chunk) tasks run on a process pool per algorithm; --chunks splits a
+ticker's origins into that many independent runs.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+
+from Services.batch_training import CONCURRENCY, REPORT_DIR
+from Services.model_catalog import ALGORITHMS, catalog, normalize_ticker
+
+DEFAULT_HORIZON = 20
+DEFAULT_FOLDS = 20
+TEST_FRACTION = 0.2  # arima/prophet origins lie in the last 20% of the history
+LSTM_HELD_OUT = 0.1  # matches the 90/10 split in lstm_model_service.train_model
+DEFAULT_CHUNKS = {'lstm': 1, 'arima': 1, 'prophet': 4}
+
+
+# ------------------------------------------------------------------
+# 1. Folds
+# ------------------------------------------------------------------
+def origins(rows: int, first: int, horizon: int, folds: int) -> np.ndarray:
+    """Up to *folds* evenly spaced origins in [first, rows - horizon]; origin o forecasts rows o..o+horizon-1."""
+    last = rows - horizon
+    if last < first or first < 1:
+        return np.array([], dtype=int)
+    return np.unique(np.linspace(first, last, num=min(folds, last - first + 1)).astype(int))
+
+
+def _stock_dir(algorithm: str, ticker: str) -> str:
+    return os.path.join(ALGORITHMS[algorithm]['dir'], normalize_ticker(ticker))
+
+
+def _read_params(algorithm: str, ticker: str) -> dict:
+    path = os.path.join(_stock_dir(algorithm, ticker), ALGORITHMS[algorithm]['params'])
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def history(algorithm: str, ticker: str):
+    """(actual prices of the stored history, first allowed origin)."""
+    path = os.path.join(_stock_dir(algorithm, ticker), 'data.csv')
+    if algorithm == 'arima':
+        df = pd.read_csv(path, index_col=0, parse_dates=True)
+        return df['y'].to_numpy(dtype=float), int(len(df) * (1 - TEST_FRACTION))
+    if algorithm == 'prophet':
+        df = pd.read_csv(path, parse_dates=['ds'])
+        return df['y'].to_numpy(dtype=float), int(len(df) * (1 - TEST_FRACTION))
+
+    from Services import lstm_model_service
+    scaler = lstm_model_service.load_scaler(ticker)  # not the model: only the prices are needed here
+    stored = pd.read_csv(path, index_col=0, parse_dates=True)
+    sequence_length = _read_params('lstm', ticker).get('sequence_length', 60)
+    windows = len(stored) - sequence_length
+    actual = scaler.inverse_transform(stored.to_numpy(dtype=float))[:, 0]
+    return actual, sequence_length + int(windows * (1 - LSTM_HELD_OUT))
+
+
+# ------------------------------------------------------------------
+# 2. Walkers: forecasts (len(origins), horizon) for one ticker
+# ------------------------------------------------------------------
+def _walk_arima(ticker: str, points: np.ndarray, horizon: int, refit_every: int = 0) -> np.ndarray:
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    from Services import arima_runtime
+
+    params = _read_params('arima', ticker)
+    df = pd.read_csv(os.path.join(_stock_dir('arima', ticker), 'data.csv'), index_col=0, parse_dates=True)
+    y = df['y'].to_numpy(dtype=float)
+    X = df[params['exog_tickers']].to_numpy(dtype=float)
+    order = params['best_params']
+
+    forecasts = np.empty((len(points), horizon))
+    model, position = None, 0
+    for fold, origin in enumerate(points):
+        if model is None or (refit_every and fold % refit_every == 0):
+            results = SARIMAX(y[:origin], exog=X[:origin], order=tuple(order['order']),
+                              seasonal_order=tuple(order['seasonal_order']),
+                              enforce_stationarity=False, enforce_invertibility=False).fit(disp=False)
+            state = arima_runtime.from_results(results)
+            model = arima_runtime.StateSpaceForecaster(state) if state is not None else results
+        elif isinstance(model, arima_runtime.StateSpaceForecaster):
+            model = model.append(y[position:origin], X[position:origin])
+        else:
+            model = model.append(y[position:origin], exog=X[position:origin], refit=False)
+        position = origin
+
+        # Future exog repeats the last known row, as in predict_next_days
+        future = np.tile(X[origin - 1], (horizon, 1))
+        if isinstance(model, arima_runtime.StateSpaceForecaster):
+            forecasts[fold] = model.forecast(horizon, future)[0]
+        else:
+            forecasts[fold] = np.asarray(model.forecast(horizon, exog=future))
+    return forecasts
+
+
+def _walk_prophet(ticker: str, points: np.ndarray, horizon: int, refit_every: int = 0) -> np.ndarray:
+    from prophet import Prophet
+    from Services.prophet_model_service import warm_start_params
+
+    params = _read_params('prophet', ticker)
+    df = pd.read_csv(os.path.join(_stock_dir('prophet', ticker), 'data.csv'), parse_dates=['ds'])
+
+    forecasts = np.empty((len(points), horizon))
+    previous = None
+    for fold, origin in enumerate(points):
+        model = Prophet(interval_width=params.get('interval_width', 0.95), uncertainty_samples=0)
+        fit_kwargs = {'init': warm_start_params(previous)} if previous is not None else {}
+        model.fit(df.iloc[:origin], **fit_kwargs)
+        # Forecast the actual next trading days of the history
+        forecasts[fold] = model.predict(df[['ds']].iloc[origin:origin + horizon])['yhat'].to_numpy()
+        previous = model
+    return forecasts
+
+
+def _walk_lstm(ticker: str, points: np.ndarray, horizon: int, refit_every: int = 0) -> np.ndarray:
+    from Services import lstm_model_service
+
+    model, scaler, _ = lstm_model_service.load_state(ticker)
+    stored = pd.read_csv(os.path.join(_stock_dir('lstm', ticker), 'data.csv'), index_col=0, parse_dates=True)
+    sequence_length = _read_params('lstm', ticker).get('sequence_length', 60)
+    scaled = scaler.transform(stored)  # same input transform as predict_many
+
+    # Every origin is one row of the batch, stepped like predict_many
+    buffer = np.empty((len(points), sequence_length + horizon, scaled.shape[1]))
+    for row, origin in enumerate(points):
+        buffer[row, :sequence_length] = scaled[origin - sequence_length:origin]
+    for step in range(horizon):
+        window = buffer[:, step:step + sequence_length].astype(np.float32)
+        target = step + sequence_length
+        buffer[:, target, 0] = np.asarray(model(window, training=False))[:, 0]
+        buffer[:, target, 1:] = buffer[:, target - 1, 1:]
+
+    forecast = buffer[:, sequence_length:, 0].reshape(-1, 1)
+    padded = np.concatenate([forecast, np.zeros((len(forecast), scaled.shape[1] - 1))], axis=1)
+    return scaler.inverse_transform(padded)[:, 0].reshape(len(points), horizon)
+
+
+WALKERS = {'arima': _walk_arima, 'prophet': _walk_prophet, 'lstm': _walk_lstm}
+
+
+# ------------------------------------------------------------------
+# 3. Execute
+# ------------------------------------------------------------------
+def _run_chunk(algorithm: str, ticker: str, points: list, horizon: int, refit_every: int) -> dict:
+    """Runs in a pool worker: forecasts for one contiguous block of origins."""
+    started = time.perf_counter()
+    forecasts = WALKERS[algorithm](ticker, np.asarray(points, dtype=int), horizon, refit_every)
+    return {'forecasts': forecasts, 'seconds': time.perf_counter() - started}
+
+
+def run_backtest(algorithms: list, tickers: list = None, horizon: int = DEFAULT_HORIZON,
+                 folds: int = DEFAULT_FOLDS, chunks: dict = None, refit_every: int = 0,
+                 concurrency: dict = None, report_dir: str = REPORT_DIR, progress=None) -> dict:
+    """
+    Walk-forward test of every (algorithm, ticker) pair; *tickers* defaults to
+    all complete models of each algorithm. *chunks* and *concurrency* override
+    DEFAULT_CHUNKS / batch_training.CONCURRENCY per algorithm. Returns the
+    summary dict; the per-horizon table is written as CSV under *report_dir*.
+    """
+    for algorithm in algorithms:
+        if algorithm not in WALKERS:
+            raise ValueError(f"unknown algorithm '{algorithm}'")
+    chunks = {**DEFAULT_CHUNKS, **(chunks or {})}
+    limits = {**CONCURRENCY, **(concurrency or {})}
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+
+    # Folds are planned here; the pools only run the walkers
+    plans, failures, tasks = {}, [], []
+    for algorithm in algorithms:
+        names = tickers if tickers else catalog.tickers(algorithm)
+        for ticker in dict.fromkeys(names):
+            try:
+                actual, first = history(algorithm, ticker)
+            except Exception as e:
+                failures.append({'algorithm': algorithm, 'ticker': ticker,
+                                 'error': f'{type(e).__name__}: {e}'})
+                continue
+            points = origins(len(actual), first, horizon, folds)
+            if not len(points):
+                failures.append({'algorithm': algorithm, 'ticker': ticker,
+                                 'error': f'history too short for a {horizon}-step fold'})
+                continue
+            blocks = [b for b in np.array_split(points, max(1, chunks[algorithm])) if len(b)]
+            plans[(algorithm, ticker)] = {'actual': actual, 'origins': points,
+                                          'parts': [None] * len(blocks), 'seconds': 0.0}
+            tasks += [(algorithm, ticker, index, block.tolist()) for index, block in enumerate(blocks)]
+
+    ctx = multiprocessing.get_context('spawn')
+    pools = {algorithm: ProcessPoolExecutor(max_workers=max(1, limits[algorithm]), mp_context=ctx)
+             for algorithm in {task[0] for task in tasks}}
+    done_count = 0
+    if progress is not None:
+        progress({'phase': 'backtest', 'done': 0, 'total': len(tasks)})
+    try:
+        pending = {pools[a].submit(_run_chunk, a, t, block, horizon, refit_every): (a, t, i)
+                   for a, t, i, block in tasks}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                algorithm, ticker, index = pending.pop(future)
+                done_count += 1
+                plan = plans.get((algorithm, ticker))
+                try:
+                    result = future.result()
+                    if plan is not None:
+                        plan['parts'][index] = result['forecasts']
+                        plan['seconds'] += result['seconds']
+                except Exception as e:
+                    if plan is not None:  # first failed chunk drops the whole ticker
+                        failures.append({'algorithm': algorithm, 'ticker': ticker,
+                                         'error': f'{type(e).__name__}: {e}'})
+                        plans.pop((algorithm, ticker))
+                if progress is not None:
+                    progress({'phase': 'backtest', 'done': done_count, 'total': len(tasks),
+                              'last': f"{algorithm}:{ticker}"})
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    rows = []
+    for (algorithm, ticker), plan in sorted(plans.items()):
+        rows += fold_metrics(algorithm, ticker, plan['actual'], plan['origins'],
+                             np.concatenate(plan['parts']), plan['seconds'])
+    table = pd.DataFrame(rows, columns=TABLE_COLUMNS)
+    summary = _summarize(table, algorithms, failures, horizon, folds, started_at,
+                         time.perf_counter() - started)
+    summary['report_path'] = _write_table(table, started_at, report_dir)
+    return summary
+
+
+# ------------------------------------------------------------------
+# 4. Metrics & report
+# ------------------------------------------------------------------
+TABLE_COLUMNS = ['algorithm', 'ticker', 'horizon', 'folds', 'mae', 'mape', 'directional',
+                 'naive_mae', 'seconds']
+
+
+def fold_metrics(algorithm: str, ticker: str, actual: np.ndarray, points: np.ndarray,
+                 forecasts: np.ndarray, seconds: float) -> list:
+    """
+    One table row per horizon step. Direction is the sign of the move from
+    the last known price; naive_mae is the error of repeating that price.
+    """
+    horizon = forecasts.shape[1]
+    steps = points[:, None] + np.arange(horizon)
+    realized = actual[steps]
+    last = actual[points - 1][:, None]
+
+    error = np.abs(forecasts - realized)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(realized != 0, error / np.abs(realized), np.nan) * 100
+    direction = np.sign(forecasts - last) == np.sign(realized - last)
+    naive = np.abs(realized - last)
+
+    return [[algorithm, ticker, h + 1, len(points),
+             round(float(error[:, h].mean()), 6), round(float(np.nanmean(pct[:, h])), 4),
+             round(float(direction[:, h].mean()), 4), round(float(naive[:, h].mean()), 6),
+             round(seconds, 2)]
+            for h in range(horizon)]
+
+
+def _summarize(table, algorithms, failures, horizon, folds, started_at, seconds) -> dict:
+    by_algorithm = {}
+    for algorithm in algorithms:
+        rows = table[table['algorithm'] == algorithm]
+        if rows.empty:
+            by_algorithm[algorithm] = {'tickers': 0}
+            continue
+        per_ticker = rows.groupby('ticker')[['mae', 'naive_mae']].mean()
+        by_algorithm[algorithm] = {
+            'tickers': int(len(per_ticker)),
+            'mape': round(float(rows['mape'].mean()), 4),
+            'mape_first_step': round(float(rows.loc[rows['horizon'] == 1, 'mape'].mean()), 4),
+            'mape_last_step': round(float(rows.loc[rows['horizon'] == horizon, 'mape'].mean()), 4),
+            'directional': round(float(rows['directional'].mean()), 4),
+            'beats_naive': round(float((per_ticker['mae'] < per_ticker['naive_mae']).mean()), 4),
+        }
+    return {
+        'started_at': started_at.isoformat(),
+        'seconds': round(seconds, 2),
+        'horizon': horizon,
+        'folds': folds,
+        'algorithms': by_algorithm,
+        'failures': failures,
+    }
+
+
+def _write_table(table: pd.DataFrame, started_at: datetime, report_dir: str) -> str:
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"backtest_{started_at.isoformat()[:19].replace(':', '')}.csv")
+    table.to_csv(path, index=False)
+    return path
+
+
+def print_summary(summary: dict):
+    print(f"Backtest finished in {summary['seconds']}s "
+          f"({summary['folds']} folds, horizon {summary['horizon']})")
+    for algorithm, row in summary['algorithms'].items():
+        if not row['tickers']:
+            print(f"  {algorithm:<8} no tickers tested")
+            continue
+        print(f"  {algorithm:<8} tickers {row['tickers']:>4}  MAPE {row['mape']:>7}% "
+              f"(h1 {row['mape_first_step']}%, h{summary['horizon']} {row['mape_last_step']}%)  "
+              f"direction {row['directional']:.2%}  beats naive {row['beats_naive']:.0%}")
+    for failure in summary['failures']:
+        print(f"  ! {failure['algorithm']}:{failure['ticker']}: {failure['error']}")
+    print(f"Table: {summary['report_path']}")
+
+
+# ------------------------------------------------------------------
+# 5. CLI
+# ------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of trained models.')
+    parser.add_argument('--algorithms', default='lstm,arima,prophet')
+    parser.add_argument('--tickers', default='', help='comma-separated tickers (default: all trained)')
+    parser.add_argument('--tickers-file', help='file with one ticker per line')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON)
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--refit-every', type=int, default=0, help='ARIMA: refit every N folds (0: never)')
+    for algorithm in WALKERS:
+        parser.add_argument(f'--{algorithm}-chunks', type=int)
+        parser.add_argument(f'--{algorithm}-concurrency', type=int)
+    parser.add_argument('--report-dir', default=REPORT_DIR)
+    args = parser.parse_args(argv)
+
+    tickers = [t.strip() for t in args.tickers.split(',') if t.strip()]
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    algorithms = [a.strip() for a in args.algorithms.split(',') if a.strip()]
+    chunks = {a: getattr(args, f'{a}_chunks') for a in WALKERS if getattr(args, f'{a}_chunks')}
+    concurrency = {a: getattr(args, f'{a}_concurrency') for a in WALKERS
+                   if getattr(args, f'{a}_concurrency')}
+
+    summary = run_backtest(algorithms, tickers or None, args.horizon, args.folds, chunks,
+                           args.refit_every, concurrency, args.report_dir,
+                           progress=lambda info: print(info, flush=True))
+    print_summary(summary)
+    return 0 if not summary['failures'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
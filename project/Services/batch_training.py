@@ -0,0 +1,262 @@
+# Services/batch_training.py
+"""
+Train a universe of tickers with several algorithms in one run.
+
+    python -m Services.batch_training --tickers AAPL,MSFT --algorithms lstm,arima,prophet
+    python -m Services.batch_training --tickers-file universe.txt --algorithms arima --start 2020-01-01
+
+Run from the project directory. Every price series (targets and the shared
+ARIMA exogenous tickers) is fetched into the price store once up front; the
+fits then run on one long-lived process pool per algorithm, so each worker
+imports its ML stack once. A JSON summary report is written at the end.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from Services.market_data import store as price_store
+from Services.model_catalog import catalog
+
+# Same defaults as the /<algorithm>/train routes
+DEFAULT_PARAMS = {
+    'lstm': {'start': '2010-01-01', 'end': '2025-05-22', 'sequence_length': 60},
+    'arima': {'start': '2020-01-01', 'end': '2025-04-08', 'exog_tickers': ['GLD', 'QQQ', '^TNX']},
+    'prophet': {'start': '2015-01-01', 'end': '2025-05-22'},
+}
+
+_CPUS = os.cpu_count() or 1
+
+# Parallel fits per algorithm. TensorFlow already spreads one fit over all
+# cores, SARIMAX fits are single-threaded, and each Prophet fit runs one
+# cmdstan process. Override with BATCH_CONCURRENCY_<ALGORITHM>.
+CONCURRENCY = {
+    'lstm': int(os.environ.get('BATCH_CONCURRENCY_LSTM', 1)),
+    'arima': int(os.environ.get('BATCH_CONCURRENCY_ARIMA', max(1, _CPUS - 1))),
+    'prophet': int(os.environ.get('BATCH_CONCURRENCY_PROPHET', max(1, _CPUS // 2))),
+}
+
+PREFETCH_WORKERS = int(os.environ.get('BATCH_PREFETCH_WORKERS', 8))
+REPORT_DIR = os.environ.get('BATCH_REPORT_DIR', 'reports')
+
+
+# ------------------------------------------------------------------
+# 1. Plan
+# ------------------------------------------------------------------
+def plan(tickers: list, algorithms: list, params: dict = None) -> tuple:
+    """
+    Expand (tickers x algorithms) into tasks and work out which price series
+    are needed over which window.
+
+    *params* maps algorithm -> overrides of DEFAULT_PARAMS. Returns
+    (tasks [(algorithm, ticker, params)], series {ticker: (start, end)}).
+    """
+    params = params or {}
+    tasks, series = [], {}
+
+    def need(ticker, start, end):
+        lo, hi = series.get(ticker, (start, end))
+        series[ticker] = (min(lo, start), max(hi, end))
+
+    for algorithm in algorithms:
+        if algorithm not in DEFAULT_PARAMS:
+            raise ValueError(f"unknown algorithm '{algorithm}'")
+        algo_params = {**DEFAULT_PARAMS[algorithm], **params.get(algorithm, {})}
+        for ticker in dict.fromkeys(tickers):
+            tasks.append((algorithm, ticker, algo_params))
+            need(ticker, algo_params['start'], algo_params['end'])
+            for exog in algo_params.get('exog_tickers', []):
+                need(exog, algo_params['start'], algo_params['end'])
+    return tasks, series
+
+
+def prefetch(series: dict, workers: int = PREFETCH_WORKERS) -> dict:
+    """Fill the price store for every series once. Returns {ticker: error} for failures."""
+    def fetch(item):
+        ticker, (start, end) = item
+        price_store.ensure(ticker, start, end)
+
+    failed = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch') as pool:
+        futures = {pool.submit(fetch, item): item[0] for item in series.items()}
+        for future, ticker in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                failed[ticker] = str(e)
+    return failed
+
+
+# ------------------------------------------------------------------
+# 2. Execute
+# ------------------------------------------------------------------
+def _train_one(algorithm: str, ticker: str, params: dict) -> dict:
+    """Runs in a pool worker: train, then materialize the forecast."""
+    from Services import service_loader, forecast_cache
+
+    started = time.perf_counter()
+    try:
+        success = service_loader.load(algorithm).train_model(ticker=ticker, **params)
+        if success:
+            forecast_cache.materialize(algorithm, ticker)
+        status, error = ('succeeded' if success else 'failed'), None
+    except Exception as e:
+        status, error = 'failed', f'{type(e).__name__}: {e}'
+    return {'algorithm': algorithm, 'ticker': ticker, 'status': status, 'error': error,
+            'seconds': round(time.perf_counter() - started, 2)}
+
+
+def run_batch(tickers: list, algorithms: list, params: dict = None, concurrency: dict = None,
+              report_dir: str = REPORT_DIR, progress=None) -> dict:
+    """
+    Train every (ticker, algorithm) pair and write a summary report.
+
+    *concurrency* overrides CONCURRENCY per algorithm. *progress*, if given,
+    is called with a dict per phase and after each finished fit. Returns the
+    report dict (also saved as JSON under *report_dir*).
+    """
+    limits = {**CONCURRENCY, **(concurrency or {})}
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+
+    tasks, series = plan(tickers, algorithms, params)
+    if progress is not None:
+        progress({'phase': 'prefetch', 'series': len(series)})
+    prefetch_started = time.perf_counter()
+    prefetch_failed = prefetch(series)
+    prefetch_seconds = time.perf_counter() - prefetch_started
+
+    # Pairs whose data could not be fetched are reported, not attempted
+    results, runnable = [], []
+    for algorithm, ticker, algo_params in tasks:
+        missing = [t for t in [ticker] + algo_params.get('exog_tickers', []) if t in prefetch_failed]
+        if missing:
+            results.append({'algorithm': algorithm, 'ticker': ticker, 'status': 'skipped',
+                            'error': f'no price data for {", ".join(missing)}', 'seconds': 0.0})
+        else:
+            runnable.append((algorithm, ticker, algo_params))
+
+    # One pool per algorithm, all running at the same time
+    ctx = multiprocessing.get_context('spawn')
+    pools = {algorithm: ProcessPoolExecutor(max_workers=max(1, limits[algorithm]), mp_context=ctx)
+             for algorithm in {task[0] for task in runnable}}
+    if progress is not None:
+        progress({'phase': 'train', 'done': 0, 'total': len(tasks)})
+    try:
+        pending = {pools[a].submit(_train_one, a, t, p): (a, t) for a, t, p in runnable}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                algorithm, ticker = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # worker process died
+                    result = {'algorithm': algorithm, 'ticker': ticker, 'status': 'failed',
+                              'error': f'{type(e).__name__}: {e}', 'seconds': None}
+                results.append(result)
+                catalog.refresh(algorithm, ticker)
+                if progress is not None:
+                    progress({'phase': 'train', 'done': len(results), 'total': len(tasks),
+                              'last': f"{algorithm}:{ticker}", 'status': result['status']})
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    report = _summarize(results, algorithms, limits, series, prefetch_failed, prefetch_seconds,
+                        started_at, time.perf_counter() - started)
+    report['report_path'] = _write_report(report, report_dir)
+    return report
+
+
+# ------------------------------------------------------------------
+# 3. Report
+# ------------------------------------------------------------------
+def _summarize(results, algorithms, limits, series, prefetch_failed, prefetch_seconds,
+               started_at, seconds) -> dict:
+    by_algorithm = {}
+    for algorithm in algorithms:
+        rows = [r for r in results if r['algorithm'] == algorithm]
+        durations = sorted(r['seconds'] for r in rows if r['status'] == 'succeeded')
+        by_algorithm[algorithm] = {
+            'concurrency': limits[algorithm],
+            'succeeded': sum(r['status'] == 'succeeded' for r in rows),
+            'failed': sum(r['status'] == 'failed' for r in rows),
+            'skipped': sum(r['status'] == 'skipped' for r in rows),
+            'fit_seconds_total': round(sum(durations), 2),
+            'fit_seconds_median': durations[len(durations) // 2] if durations else None,
+        }
+    return {
+        'started_at': started_at.isoformat(),
+        'seconds': round(seconds, 2),
+        'tasks': len(results),
+        'prefetch': {'series': len(series), 'failed': prefetch_failed,
+                     'seconds': round(prefetch_seconds, 2)},
+        'algorithms': by_algorithm,
+        'failures': [r for r in results if r['status'] != 'succeeded'],
+        'results': sorted(results, key=lambda r: (r['algorithm'], r['ticker'])),
+    }
+
+
+def _write_report(report: dict, report_dir: str) -> str:
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"batch_{report['started_at'][:19].replace(':', '')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def print_summary(report: dict):
+    print(f"Batch finished in {report['seconds']}s; "
+          f"{report['prefetch']['series']} series prefetched in {report['prefetch']['seconds']}s")
+    for algorithm, row in report['algorithms'].items():
+        print(f"  {algorithm:<8} ok {row['succeeded']:>4}  failed {row['failed']:>4}  "
+              f"skipped {row['skipped']:>4}  (x{row['concurrency']}, median fit {row['fit_seconds_median']}s)")
+    for failure in report['failures']:
+        print(f"  ! {failure['algorithm']}:{failure['ticker']} {failure['status']}: {failure['error']}")
+    print(f"Report: {report['report_path']}")
+
+
+# ------------------------------------------------------------------
+# 4. CLI
+# ------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train many tickers with several algorithms.')
+    parser.add_argument('--tickers', default='', help='comma-separated tickers')
+    parser.add_argument('--tickers-file', help='file with one ticker per line')
+    parser.add_argument('--algorithms', default='lstm,arima,prophet')
+    parser.add_argument('--start', help='training start for every algorithm')
+    parser.add_argument('--end', help='training end for every algorithm')
+    parser.add_argument('--exog-tickers', help='comma-separated ARIMA exogenous tickers')
+    for algorithm in DEFAULT_PARAMS:
+        parser.add_argument(f'--{algorithm}-concurrency', type=int)
+    parser.add_argument('--report-dir', default=REPORT_DIR)
+    args = parser.parse_args(argv)
+
+    tickers = [t.strip() for t in args.tickers.split(',') if t.strip()]
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not tickers:
+        parser.error('no tickers given')
+    algorithms = [a.strip() for a in args.algorithms.split(',') if a.strip()]
+
+    overrides = {k: v for k, v in (('start', args.start), ('end', args.end)) if v}
+    params = {algorithm: dict(overrides) for algorithm in algorithms}
+    if args.exog_tickers and 'arima' in params:
+        params['arima']['exog_tickers'] = [t.strip() for t in args.exog_tickers.split(',')]
+    concurrency = {a: getattr(args, f'{a}_concurrency') for a in DEFAULT_PARAMS
+                   if getattr(args, f'{a}_concurrency')}
+
+    report = run_batch(tickers, algorithms, params, concurrency, args.report_dir,
+                       progress=lambda info: print(info, flush=True))
+    print_summary(report)
+    return 0 if not report['failures'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# Services/forecast_cache.py
+
+import os
+import json
+import threading
+import time
+from datetime import datetime
+
+from Services.model_registry import model_version
+
+MAX_HORIZON = int(os.environ.get('FORECAST_MAX_HORIZON', '60'))
+FORECAST_FILE = 'forecast.json'
+
+# algorithm -> (models_dir, predict_fn(ticker=..., days=..., **params), default params)
+_services = {}
+_memory = {}  # (algorithm, normalized ticker) -> (version, payload)
+_lock = threading.Lock()
+
+
+def register(algorithm: str, models_dir: str, predict_fn, **default_params):
+    """Called by each model service to make its forecasts materializable."""
+    _services[algorithm] = (models_dir, predict_fn, default_params)
+
+
+def _normalize(ticker: str) -> str:
+    return ticker.replace('^', '').replace('/', '_')
+
+
+def _stock_dir(algorithm: str, ticker: str) -> str:
+    return os.path.join(_services[algorithm][0], _normalize(ticker))
+
+
+# ------------------------------------------------------------------
+# 1. Materialize
+# ------------------------------------------------------------------
+def materialize(algorithm: str, ticker: str, max_horizon: int = MAX_HORIZON) -> dict:
+    """
+    Evaluate the model once for *max_horizon* days and store the result in
+    forecast.json next to the model, tagged with the model version.
+    """
+    models_dir, predict_fn, params = _services[algorithm]
+    stock_dir = _stock_dir(algorithm, ticker)
+    version = model_version(stock_dir)
+    forecast = predict_fn(ticker=ticker, days=max_horizon, **params)
+
+    payload = {
+        'algorithm': algorithm,
+        'ticker': ticker,
+        'version': version,
+        'params': params,
+        'max_horizon': max_horizon,
+        'created_at': datetime.utcnow().isoformat(),
+        'forecast': forecast,
+    }
+    path = os.path.join(stock_dir, FORECAST_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+    with _lock:
+        _memory[(algorithm, _normalize(ticker))] = (version, payload)
+    return payload
+
+
+def _load(algorithm: str, ticker: str, version: str):
+    with _lock:
+        cached = _memory.get((algorithm, _normalize(ticker)))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    path = os.path.join(_stock_dir(algorithm, ticker), FORECAST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        payload = json.load(f)
+    if payload.get('version') != version:
+        return None
+    with _lock:
+        _memory[(algorithm, _normalize(ticker))] = (version, payload)
+    return payload
+
+
+# ------------------------------------------------------------------
+# 2. Read
+# ------------------------------------------------------------------
+def get(algorithm: str, ticker: str, days: int, **params) -> dict | None:
+    """
+    Return the stored forecast sliced to *days*, or None when there is no
+    forecast for the current model version, *days* exceeds the stored
+    horizon, or *params* differ from the ones it was computed with.
+    """
+    if algorithm not in _services:
+        return None
+    stock_dir = _stock_dir(algorithm, ticker)
+    if not os.path.isdir(stock_dir):
+        return None
+
+    payload = _load(algorithm, ticker, model_version(stock_dir))
+    if payload is None or days > payload['max_horizon']:
+        return None
+    if any(payload['params'].get(k) != v for k, v in params.items()):
+        return None
+    return {key: values[:days] for key, values in payload['forecast'].items()}
+
+
+def is_fresh(algorithm: str, ticker: str) -> bool:
+    stock_dir = _stock_dir(algorithm, ticker)
+    return _load(algorithm, ticker, model_version(stock_dir)) is not None
+
+
+# ------------------------------------------------------------------
+# 3. Scheduled refresh
+# ------------------------------------------------------------------
+def refresh_stale():
+    """Materialize every trained model whose stored forecast is missing or outdated."""
+    refreshed = 0
+    for algorithm, (models_dir, _, _) in list(_services.items()):
+        if not os.path.isdir(models_dir):
+            continue
+        for name in os.listdir(models_dir):
+            if not os.path.isdir(os.path.join(models_dir, name)):
+                continue
+            try:
+                if not is_fresh(algorithm, name):
+                    materialize(algorithm, name)
+                    refreshed += 1
+            except Exception as e:
+                print(f"Forecast materialization failed for {algorithm}/{name}: {e}")
+    return refreshed
+
+
+def start_scheduler(interval_seconds: float):
+    """Run refresh_stale() every *interval_seconds* on a daemon thread."""
+    def loop():
+        while True:
+            refresh_stale()
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=loop, name='forecast-refresh', daemon=True)
+    thread.start()
+    return thread
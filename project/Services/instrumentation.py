@@ -0,0 +1,179 @@
+# Services/instrumentation.py
+
+import os
+import json
+import time
+import uuid
+import bisect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# Histogram bucket upper bounds in seconds (Prometheus 'le')
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# ?profile=1 (or an X-Profile: 1 header) dumps a request's spans, when enabled
+PROFILING = os.environ.get('REQUEST_PROFILING', '0') in ('1', 'true')
+PROFILE_DIR = os.environ.get('REQUEST_PROFILE_DIR', 'profiles')
+
+METRICS = {
+    'request': ('algotrade_request_duration_seconds', 'HTTP request latency by endpoint',
+                ('endpoint', 'method', 'status')),
+    'span': ('algotrade_span_duration_seconds', 'Time spent in model service stages',
+             ('span', 'algorithm', 'ticker')),
+}
+
+_histograms = {}  # (metric, label values) -> [bucket counts..., +Inf count, sum]
+_lock = threading.Lock()
+_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+# ------------------------------------------------------------------
+# 1. Recording
+# ------------------------------------------------------------------
+def observe(metric: str, seconds: float, *labels):
+    """Add one observation to the *metric* histogram with the given label values."""
+    index = bisect.bisect_left(BUCKETS, seconds)
+    key = (metric, labels)
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        row[index] += 1
+        row[-1] += seconds
+
+
+def _normalize_ticker(ticker) -> str:
+    return str(ticker).replace('^', '').replace('/', '_') if ticker else ''
+
+
+@contextmanager
+def span(name: str, algorithm: str = '', ticker: str = None):
+    """Time the block into the span histogram (and the request profile, if one is active)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        labels = (name, algorithm, _normalize_ticker(ticker))
+        observe('span', seconds, *labels)
+        profile = _profile.get()
+        if profile is not None:
+            profile['spans'].append({'span': name, 'algorithm': algorithm, 'ticker': labels[2],
+                                     'start_ms': round((started - profile['started']) * 1000, 3),
+                                     'ms': round(seconds * 1000, 3),
+                                     'thread': threading.current_thread().name})
+
+
+def timed(name: str, algorithm: str = ''):
+    """Decorator: span(*name*) around each call, labelled with its ticker argument (keyword or first)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            ticker = kwargs.get('ticker', args[0] if args and isinstance(args[0], str) else None)
+            with span(name, algorithm, ticker):
+                return fn(*args, **kwargs)
+        return call
+    return decorate
+
+
+def bind(fn):
+    """*fn* running in a copy of the caller's context, so thread-pool work lands in its request profile."""
+    context = contextvars.copy_context()
+    def call(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return call
+
+
+# ------------------------------------------------------------------
+# 2. Export
+# ------------------------------------------------------------------
+def snapshot() -> dict:
+    """Picklable copy of every histogram, for merging across processes."""
+    with _lock:
+        return {key: list(row) for key, row in _histograms.items()}
+
+
+def merge(*snapshots) -> dict:
+    merged = {}
+    for snap in snapshots:
+        for key, row in snap.items():
+            into = merged.get(key)
+            merged[key] = list(row) if into is None else [a + b for a, b in zip(into, row)]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(histograms: dict = None) -> str:
+    """Prometheus text exposition (format 0.0.4) of *histograms* (default: this process)."""
+    histograms = snapshot() if histograms is None else histograms
+    lines = []
+    for metric, (name, help_text, label_names) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (key_metric, labels), row in sorted(histograms.items()):
+            if key_metric != metric:
+                continue
+            base = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, row):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += row[len(BUCKETS)]
+            lines.append(f'{name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{{base}}} {row[-1]:.6f}')
+            lines.append(f'{name}_count{{{base}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# ------------------------------------------------------------------
+# 3. Flask hooks
+# ------------------------------------------------------------------
+def init_app(app):
+    """Time every request by route template; dump opted-in request profiles to PROFILE_DIR."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.instrumentation_started = time.perf_counter()
+        if PROFILING and (request.args.get('profile') in ('1', 'true') or request.headers.get('X-Profile') == '1'):
+            g.instrumentation_token = _profile.set({'started': g.instrumentation_started, 'spans': []})
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('instrumentation_started', None)
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe('request', seconds, endpoint, request.method, str(response.status_code))
+
+        token = g.pop('instrumentation_token', None)
+        if token is not None:
+            profile = _profile.get()
+            _profile.reset(token)
+            try:
+                response.headers['X-Profile-Path'] = _dump_profile(profile, endpoint, seconds,
+                                                                   response.status_code)
+            except OSError as e:
+                print(f"Writing request profile failed: {e}")
+        return response
+
+
+def _dump_profile(profile: dict, endpoint: str, seconds: float, status: int) -> str:
+    from flask import request
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    slug = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '').replace(':', '-') or 'root'
+    path = os.path.join(PROFILE_DIR, f'{stamp}_{slug}_{uuid.uuid4().hex[:8]}.json')
+    spans = sorted(profile['spans'], key=lambda s: s['start_ms'])
+    with open(path, 'w') as f:
+        json.dump({'endpoint': endpoint, 'path': request.path, 'method': request.method,
+                   'status': status, 'ms': round(seconds * 1000, 3),
+                   'spans': spans}, f, indent=1)
+    return path
@@ -0,0 +1,130 @@
+# Services/job_queue.py
+
+import hashlib
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import db, TrainingJob
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def dedup_key(algorithm: str, ticker: str, params: dict) -> str:
+    """Stable key for (algorithm, ticker, params); equal submissions share a job."""
+    payload = json.dumps([algorithm, ticker, params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """
+    Background training jobs persisted in the TrainingJob table.
+
+    Runners are registered per algorithm as ``runner(ticker, progress, **params)``
+    where *progress* is a callback taking a dict (phase, epoch, candidate, ...),
+    and return True/False or a summary dict.
+    At most *max_workers* jobs run at a time; the rest wait in FIFO order.
+    """
+
+    def __init__(self, app=None, max_workers: int = 2):
+        self.app = app
+        self.max_workers = max_workers
+        self._runners = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    def register(self, algorithm: str, runner):
+        self._runners[algorithm] = runner
+
+    def start(self):
+        """Start the worker pool and re-enqueue jobs left over from a previous run."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='train-job')
+        with self.app.app_context():
+            leftover = (TrainingJob.query
+                        .filter(TrainingJob.status.in_(ACTIVE_STATUSES))
+                        .order_by(TrainingJob.id)
+                        .all())
+            for job in leftover:
+                job.status = 'queued'
+                job.started_at = None
+            db.session.commit()
+            job_ids = [job.id for job in leftover]
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, algorithm: str, ticker: str, params: dict) -> TrainingJob:
+        """
+        Queue a training job, or return the queued/running job with the same
+        (algorithm, ticker, params). Must be called inside an app context.
+        """
+        if algorithm not in self._runners:
+            raise ValueError(f"unknown algorithm '{algorithm}'")
+        self.start()
+
+        key = dedup_key(algorithm, ticker, params)
+        with self._lock:
+            existing = (TrainingJob.query
+                        .filter_by(dedup_key=key)
+                        .filter(TrainingJob.status.in_(ACTIVE_STATUSES))
+                        .first())
+            if existing:
+                return existing
+
+            job = TrainingJob(
+                algorithm=algorithm,
+                ticker=ticker,
+                params=json.dumps(params, default=str),
+                dedup_key=key,
+                status='queued'
+            )
+            db.session.add(job)
+            db.session.commit()
+
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def _update(self, job_id: int, **fields):
+        job = db.session.get(TrainingJob, job_id)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        db.session.commit()
+        return job
+
+    def _run(self, job_id: int):
+        with self.app.app_context():
+            job = db.session.get(TrainingJob, job_id)
+            if job is None or job.status != 'queued':
+                return
+            runner = self._runners[job.algorithm]
+            ticker, params = job.ticker, json.loads(job.params)
+            self._update(job_id, status='running', started_at=datetime.utcnow(),
+                         progress=json.dumps({'phase': 'starting'}))
+
+            def progress(info: dict):
+                self._update(job_id, progress=json.dumps(info, default=str))
+
+            try:
+                success = runner(ticker, progress, **params)
+                # Runners may return a summary dict instead of True; it is kept on the job
+                done = {'phase': 'done', 'result': success} if isinstance(success, dict) else {'phase': 'done'}
+                self._update(job_id,
+                             status='succeeded' if success else 'failed',
+                             progress=json.dumps(done, default=str),
+                             finished_at=datetime.utcnow())
+            except Exception as e:
+                traceback.print_exc()
+                db.session.rollback()
+                self._update(job_id, status='failed', error=str(e),
+                             finished_at=datetime.utcnow())
+
+
+jobs = JobQueue()
@@ -0,0 +1,87 @@
+# Services/lstm_features.py
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOWS = (5, 10, 20, 30, 60)
+
+
+# ------------------------------------------------------------------
+# 1. Rolling statistics
+# ------------------------------------------------------------------
+def rolling_mean_std(values: np.ndarray, window: int):
+    """
+    Vectorized rolling mean and sample std (ddof=1) of a 1-D array, matching
+    pandas' ``rolling(window).mean()/.std()``: NaN until a full window of
+    non-NaN values is available. Only leading NaNs are supported.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return mean, std
+    offset = int(np.argmax(valid))
+    x = values[offset:]
+    if len(x) < window:
+        return mean, std
+
+    # Means from a cumulative sum; stds from the strided window view, which
+    # avoids the cancellation a sum-of-squares formula hits on price levels
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    mean[offset + window - 1:] = (csum[window:] - csum[:-window]) / window
+    if window > 1:
+        std[offset + window - 1:] = sliding_window_view(x, window).std(axis=-1, ddof=1)
+    return mean, std
+
+
+# ------------------------------------------------------------------
+# 2. Feature frame
+# ------------------------------------------------------------------
+def build_features(close: pd.Series) -> pd.DataFrame:
+    """
+    Build the LSTM feature frame from a close-price series in one pass.
+
+    Columns (in training order): Close, change, ma_change, std_change,
+    zscore_change (over the longest window), then ma_/std_/Sharp_ per window.
+    Leading gaps are back-filled as in the original per-column pipeline.
+    """
+    close_values = np.asarray(close, dtype=float).ravel()
+    change = np.full(len(close_values), np.nan)
+    change[1:] = close_values[1:] / close_values[:-1] - 1.0
+
+    ma_change, std_change = rolling_mean_std(change, WINDOWS[-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = {
+            'Close': close_values,
+            'change': change,
+            'ma_change': ma_change,
+            'std_change': std_change,
+            'zscore_change': (change - ma_change) / std_change,
+        }
+        for window in WINDOWS:
+            ma, std = rolling_mean_std(close_values, window)
+            columns[f'ma_{window}'] = ma
+            columns[f'std_{window}'] = std
+            columns[f'Sharp_{window}'] = ma / std
+
+    df = pd.DataFrame(columns, index=close.index)
+    return df.ffill().bfill().dropna()
+
+
+# ------------------------------------------------------------------
+# 3. Training windows
+# ------------------------------------------------------------------
+def make_windows(scaled: np.ndarray, sequence_length: int):
+    """
+    Return (X, y) where X[i] = scaled[i:i + sequence_length] and
+    y[i] = scaled[i + sequence_length, 0]. X is a read-only strided view
+    of *scaled*, so no window is copied.
+    """
+    windows = sliding_window_view(scaled, sequence_length, axis=0)  # (n, features, seq)
+    X = windows[:-1].transpose(0, 2, 1)
+    y = scaled[sequence_length:, 0]
+    return X, y
@@ -1,51 +1,107 @@
 # model_service.py
 import os
-import yfinance as yf
+import math
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense
 import joblib
+import json
+from datetime import date, timedelta
+
+from Services.model_registry import registry
+from Services import forecast_cache
+from Services.model_catalog import catalog
+from Services.market_data import store as price_store
+from Services.lstm_features import build_features, make_windows
+from Services import lstm_runtime, artifacts
+from Services.instrumentation import span, timed
+
+# TensorFlow is imported inside the training/legacy-loading functions only:
+# serving a model from its artifact runs on NumPy and never loads it.
 
 MODELS_DIR = "models/lstm_models"
 MODEL_PATH = os.path.join(MODELS_DIR, "model.h5")
 SCALER_PATH = os.path.join(MODELS_DIR, "scaler.pkl")
 DATA_PATH = os.path.join(MODELS_DIR, "data.csv")
-FORECAST_PATH = os.path.join(MODELS_DIR, "forecast.json")
 
 os.makedirs(MODELS_DIR, exist_ok=True)
 
-def train_model(ticker='^GSPC', start='2010-01-01', end='2025-05-22', sequence_length=60):
-    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
-    os.makedirs(stock_dir, exist_ok=True)
+def _report(progress, **info):
+    if progress is not None:
+        progress(info)
+
+def window_batches(X, y, batch_size=32):
+    """
+    Shuffled mini-batches gathered from the zero-copy window view, so only one
+    batch of windows is materialised at a time.
+    """
+    from tensorflow.keras.utils import Sequence
+
+    class WindowBatches(Sequence):
+        def __init__(self):
+            super().__init__()
+            self.order = np.random.permutation(len(X))
+
+        def __len__(self):
+            return math.ceil(len(X) / batch_size)
+
+        def __getitem__(self, index):
+            idx = np.sort(self.order[index * batch_size:(index + 1) * batch_size])
+            return X[idx], y[idx]
+
+        def on_epoch_end(self):
+            np.random.shuffle(self.order)
+
+    return WindowBatches()
+
+def _write_artifact(stock_dir, ticker, model, scaler, stored, params):
+    """
+    Artifact with what a forecast needs: the last *sequence_length* rows of
+    data.csv (*stored*), the scaler's min/scale and the NumPy runtime weights.
+    """
+    window = stored.iloc[-params['sequence_length']:]
+    arrays = {
+        'scaler_min': scaler.min_,
+        'scaler_scale': scaler.scale_,
+        'window': window.to_numpy(dtype=np.float64),
+        'window_dates': window.index.values.astype('datetime64[D]'),
+    }
+    meta = {'sequence_length': params['sequence_length'], 'runtime': 'keras', 'layers': None}
+    exported = lstm_runtime.to_arrays(model)
+    if exported is None:
+        print(f"LSTM in {stock_dir} has layers the NumPy runtime does not support; serving it with TensorFlow")
+    else:
+        meta['layers'], weights = exported
+        meta['runtime'] = 'numpy'
+        arrays.update(weights)
+    artifacts.write(stock_dir, 'lstm', ticker, arrays, meta,
+                    window={'start': params.get('start'), 'end': params.get('end')})
 
-    df = yf.download(ticker, start=start, end=end)[['Close']].dropna()
-    df['change'] = df['Close'].pct_change()
+def train_model(ticker='^GSPC', start='2010-01-01', end='2025-05-22', sequence_length=60,
+                progress=None):
+    """Train the LSTM; *progress*, if given, is called with a dict per phase/epoch."""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense
+    from tensorflow.keras.callbacks import LambdaCallback
 
-    for window in [5, 10, 20, 30, 60]:
-        df['ma_change'] = df['change'].rolling(window).mean()
-        df['std_change'] = df['change'].rolling(window).std()
-        df['zscore_change'] = (df['change'] - df['ma_change']) / df['std_change']
-        df[f'ma_{window}'] = df['Close'].rolling(window).mean()
-        df[f'std_{window}'] = df['Close'].rolling(window).std()
-        df[f'Sharp_{window}'] = df[f'ma_{window}'] / df[f'std_{window}']
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    os.makedirs(stock_dir, exist_ok=True)
 
-    df = df.ffill().bfill().dropna()
-    scaler = MinMaxScaler()
-    scaled = scaler.fit_transform(df)
+    _report(progress, phase='download')
+    with span('fetch', 'lstm', ticker):
+        df = price_store.get_close(ticker, start, end, adjusted=True).dropna()
+    _report(progress, phase='features')
+    with span('features', 'lstm', ticker):
+        df = build_features(df['Close'])
+        scaler = MinMaxScaler()
+        scaled = scaler.fit_transform(df.values)
 
     # Save data
     pd.DataFrame(scaled, index=df.index).to_csv(os.path.join(stock_dir, "data.csv"))
     joblib.dump(scaler, os.path.join(stock_dir, "scaler.pkl"))
 
-    # Build sequences
-    X, y = [], []
-    for i in range(sequence_length, len(scaled)):
-        X.append(scaled[i-sequence_length:i])
-        y.append(scaled[i, 0])
-
-    X, y = np.array(X), np.array(y)
+    # Build sequences (strided views over *scaled*, no per-window copies)
+    X, y = make_windows(scaled, sequence_length)
     split = int(0.9 * len(X))
     X_train, y_train = X[:split], y[:split]
 
@@ -57,49 +113,228 @@ def train_model(ticker='^GSPC', start='2010-01-01', end='2025-05-22', sequence_l
     ])
 
     model.compile(optimizer='adam', loss='mean_squared_error')
-    model.fit(X_train, y_train, epochs=20, batch_size=32, verbose=1)
+    epochs = 20
+    on_epoch = LambdaCallback(on_epoch_end=lambda epoch, logs: _report(
+        progress, phase='fit', epoch=epoch + 1, epochs=epochs, loss=(logs or {}).get('loss')))
+    with span('fit', 'lstm', ticker):
+        model.fit(window_batches(X_train, y_train, batch_size=32), epochs=epochs, verbose=1,
+                  callbacks=[on_epoch])
+
+    _report(progress, phase='save')
+    model.save(os.path.join(stock_dir, "model.h5"))
+    params = {'ticker': ticker, 'start': start, 'end': end, 'sequence_length': sequence_length}
+    with open(os.path.join(stock_dir, "lstm_params.json"), 'w') as f:
+        json.dump(params, f)
+    _write_artifact(stock_dir, ticker, model, scaler, pd.DataFrame(scaled, index=df.index), params)
+    catalog.refresh('lstm', ticker)
+    return True
+
+def update_model(ticker='^GSPC', end=None, epochs=3, progress=None):
+    """
+    Bring a trained LSTM up to *end* (default: today) without retraining:
+    features for the new bars are computed from the recent closes, scaled with
+    the saved scaler, appended to data.csv, and the model is fine-tuned for
+    *epochs* on the windows that end in the new bars only.
+    Returns True on success (also when there is nothing new).
+    """
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.callbacks import LambdaCallback
+
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    params_path = os.path.join(stock_dir, "lstm_params.json")
+    data_path = os.path.join(stock_dir, "data.csv")
+    params = {'ticker': ticker, 'sequence_length': 60}
+    if os.path.exists(params_path):
+        params = json.load(open(params_path))
+    sequence_length = params['sequence_length']
+    end = end or (date.today() + timedelta(days=1)).isoformat()
+
+    stored = pd.read_csv(data_path, index_col=0, parse_dates=True)
+    last_date = stored.index[-1]
+
+    # The longest rolling window needs ~60 trading days of history before the new bars
+    _report(progress, phase='download')
+    lookback = (last_date - pd.Timedelta(days=200)).date().isoformat()
+    with span('fetch', 'lstm', ticker):
+        close = price_store.get_close(ticker, lookback, end, adjusted=True).dropna()['Close']
+
+    _report(progress, phase='features')
+    with span('features', 'lstm', ticker):
+        features = build_features(close)
+    new_rows = features[features.index > last_date]
+    if new_rows.empty:
+        return True
+
+    scaler = joblib.load(os.path.join(stock_dir, "scaler.pkl"))
+    scaled_new = scaler.transform(new_rows.values)
+
+    # Fine-tune only on windows whose target is one of the new bars
+    history = np.vstack([stored.values[-sequence_length:], scaled_new])
+    X, y = make_windows(history, sequence_length)
+
+    model = load_model(os.path.join(stock_dir, "model.h5"))
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    on_epoch = LambdaCallback(on_epoch_end=lambda epoch, logs: _report(
+        progress, phase='fit', epoch=epoch + 1, epochs=epochs, loss=(logs or {}).get('loss')))
+    with span('fit', 'lstm', ticker):
+        model.fit(window_batches(X, y, batch_size=32), epochs=epochs, verbose=0, callbacks=[on_epoch])
 
+    _report(progress, phase='save')
     model.save(os.path.join(stock_dir, "model.h5"))
+    appended = pd.DataFrame(scaled_new, index=new_rows.index)
+    appended.to_csv(data_path, mode='a', header=False)
+    params['end'] = end
+    with open(params_path, 'w') as f:
+        json.dump(params, f)
+    recent = pd.concat([pd.DataFrame(stored.values[-sequence_length:], index=stored.index[-sequence_length:]),
+                        appended])
+    _write_artifact(stock_dir, ticker, model, scaler, recent, params)
+    catalog.refresh('lstm', ticker)
+    return True
+
+def export_model(ticker='^GSPC'):
+    """Write the artifact for a model trained before artifacts existed. Needs TensorFlow."""
+    from tensorflow.keras.models import load_model
+
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    params_path = os.path.join(stock_dir, "lstm_params.json")
+    params = {'ticker': ticker, 'sequence_length': 60}
+    if os.path.exists(params_path):
+        params = json.load(open(params_path))
+    model = load_model(os.path.join(stock_dir, "model.h5"))
+    scaler = joblib.load(os.path.join(stock_dir, "scaler.pkl"))
+    stored = pd.read_csv(os.path.join(stock_dir, "data.csv"), index_col=0, parse_dates=True)
+    _write_artifact(stock_dir, ticker, model, scaler, stored, params)
+    catalog.refresh('lstm', ticker)
     return True
 
-def load_state(ticker):
+@timed('load_state', 'lstm')
+def load_state(ticker, full=False):
+    """
+    (model, scaler, df) for *ticker*. From a current artifact only the last
+    sequence_length rows, the scaler arrays and (NumPy runtime) the weights
+    are memory-mapped; otherwise, or with *full*, the legacy files are read
+    and the Keras model loaded from model.h5.
+    """
     stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    if not full and artifacts.is_current(stock_dir, sources=("model.h5", "scaler.pkl", "data.csv")):
+        manifest, arrays = artifacts.load(stock_dir)
+        meta = manifest['meta']
+        df = pd.DataFrame(arrays['window'], index=pd.DatetimeIndex(arrays['window_dates']))
+        scaler = lstm_runtime.ExportedScaler(arrays['scaler_min'], arrays['scaler_scale'])
+        if meta['runtime'] == 'numpy':
+            return lstm_runtime.NumpyLSTM.from_arrays(meta['layers'], arrays), scaler, df
+        from tensorflow.keras.models import load_model
+        return load_model(os.path.join(stock_dir, "model.h5")), scaler, df
+
+    from tensorflow.keras.models import load_model
     model = load_model(os.path.join(stock_dir, "model.h5"))
     scaler = joblib.load(os.path.join(stock_dir, "scaler.pkl"))
     df = pd.read_csv(os.path.join(stock_dir, "data.csv"), index_col=0, parse_dates=True)
     return model, scaler, df
 
-def predict_next_days(ticker='^GSPC', days=20, sequence_length=60):
-    model, scaler, df = load_state(ticker)
-    scaled = scaler.transform(df)
+def load_scaler(ticker):
+    """Only the fitted scaler of *ticker*: the artifact's arrays when current, else scaler.pkl."""
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    if artifacts.is_current(stock_dir, sources=("model.h5", "scaler.pkl", "data.csv")):
+        _, arrays = artifacts.load(stock_dir, names=('scaler_min', 'scaler_scale'), mmap=False)
+        return lstm_runtime.ExportedScaler(arrays['scaler_min'], arrays['scaler_scale'])
+    return joblib.load(os.path.join(stock_dir, "scaler.pkl"))
 
-    forecast_input = scaled[-sequence_length:].copy()
-    forecast = []
+def _architecture(model, sequence_length, n_features):
+    """Models with the same signature can share one stepped forecast loop."""
+    layers = getattr(model, 'signature', None) or tuple(
+        (type(layer).__name__, getattr(layer, 'units', None)) for layer in model.layers)
+    return layers, sequence_length, n_features
 
-    for _ in range(days):
-        input_reshaped = forecast_input.reshape(1, sequence_length, scaled.shape[1])
-        pred = model.predict(input_reshaped, verbose=0)[0][0]
-        forecast.append(pred)
-        new_row = np.concatenate([[pred], forecast_input[-1, 1:]])
-        forecast_input = np.vstack([forecast_input[1:], new_row])
+def predict_many(requests, sequence_length=60):
+    """
+    Forecast several tickers in one pass.
 
-    forecast_prices = scaler.inverse_transform(
-        np.concatenate([np.array(forecast).reshape(-1, 1), np.zeros((days, scaled.shape[1] - 1))], axis=1)
-    )[:, 0]
+    *requests* is an iterable of (ticker, days) pairs. Tickers whose models share
+    an architecture are stepped together: every step writes the new prediction
+    into a preallocated window buffer instead of rebuilding it with np.vstack.
+    Exported models run as one StackedLSTM over the whole group; Keras models
+    are called directly rather than through model.predict.
+    Returns {ticker: {"dates": [...], "forecast": [...]}} for the longest
+    horizon requested per ticker; shorter horizons are prefixes of it.
+    """
+    horizons = {}
+    for ticker, days in requests:
+        horizons[ticker] = max(int(days), horizons.get(ticker, 0))
 
-    last_date = df.index[-1]
-    forecast_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=days, freq='B')
+    # 1. Load state (registry-cached) and group by architecture
+    groups = {}
+    states = {}
+    for ticker in horizons:
+        stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+        model, scaler, df = registry.get('lstm', ticker, stock_dir, lambda t=ticker: load_state(t))
+        if len(df) < sequence_length:  # artifact window shorter than requested
+            model, scaler, df = load_state(ticker, full=True)
+        with span('features', 'lstm', ticker):
+            scaled = scaler.transform(df)
+        states[ticker] = (model, scaler, df, scaled)
+        key = _architecture(model, sequence_length, scaled.shape[1])
+        groups.setdefault(key, []).append(ticker)
 
-    return {
-        "dates": forecast_dates.strftime('%Y-%m-%d').tolist(),
-        "forecast": forecast_prices.tolist()
-    }
+    # 2. Step each group; the window for step i is buffer[:, i:i + sequence_length]
+    results = {}
+    for (_, seq_len, n_features), tickers in groups.items():
+        steps = max(horizons[t] for t in tickers)
+        buffer = np.empty((len(tickers), seq_len + steps, n_features))
+        for row, ticker in enumerate(tickers):
+            buffer[row, :seq_len] = states[ticker][3][-seq_len:]
+
+        models = [states[ticker][0] for ticker in tickers]
+        if isinstance(models[0], lstm_runtime.NumpyLSTM):
+            # One row per ticker, each through its own stacked weights
+            stacked = lstm_runtime.StackedLSTM(models)
+            by_model = None
+        else:
+            # Rows sharing the same model object (same ticker twice) go in one call
+            by_model = {}
+            for row, model in enumerate(models):
+                by_model.setdefault(id(model), (model, []))[1].append(row)
+            by_model = [(model, np.array(rows)) for model, rows in by_model.values()]
+
+        # Ticker label only for single-ticker calls; batches are one span
+        with span('forecast', 'lstm', tickers[0] if len(tickers) == 1 else None):
+            for step in range(steps):
+                window = buffer[:, step:step + seq_len].astype(np.float32)
+                target = step + seq_len
+                if by_model is None:
+                    buffer[:, target, 0] = stacked(window)[:, 0]
+                else:
+                    for model, rows in by_model:
+                        preds = np.asarray(model(window[rows], training=False))[:, 0]
+                        buffer[rows, target, 0] = preds
+                buffer[:, target, 1:] = buffer[:, target - 1, 1:]
 
-def get_cached_forecast():
-    if os.path.exists(FORECAST_PATH):
-        return pd.read_json(FORECAST_PATH).to_dict(orient="list")
-    return None
+        for row, ticker in enumerate(tickers):
+            _, scaler, df, scaled = states[ticker]
+            days = horizons[ticker]
+            forecast = buffer[row, seq_len:seq_len + days, 0]
+            forecast_prices = scaler.inverse_transform(
+                np.concatenate([forecast.reshape(-1, 1), np.zeros((days, scaled.shape[1] - 1))], axis=1)
+            )[:, 0]
+
+            last_date = df.index[-1]
+            forecast_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=days, freq='B')
+            results[ticker] = {
+                "dates": forecast_dates.strftime('%Y-%m-%d').tolist(),
+                "forecast": forecast_prices.tolist()
+            }
+    return results
+
+def predict_next_days(ticker='^GSPC', days=20, sequence_length=60):
+    return predict_many([(ticker, days)], sequence_length=sequence_length)[ticker]
+
+def get_cached_forecast(ticker='^GSPC', days=20, sequence_length=60):
+    """Materialized forecast sliced to *days*, or None if missing or stale."""
+    return forecast_cache.get('lstm', ticker, days, sequence_length=sequence_length)
 
 def list_trained_models():
-    return [name for name in os.listdir(MODELS_DIR)
-            if os.path.isdir(os.path.join(MODELS_DIR, name))]
\ No newline at end of file
+    return catalog.tickers('lstm')
+
+
+forecast_cache.register('lstm', MODELS_DIR, predict_next_days, sequence_length=60)
@@ -0,0 +1,156 @@
+# Services/lstm_runtime.py
+
+import numpy as np
+
+# Activations of the Keras LSTM/Dense layers the runtime reproduces
+SUPPORTED = {'lstm': ('tanh', 'sigmoid'), 'dense': ('linear',)}
+
+
+# ------------------------------------------------------------------
+# 1. Export (needs the Keras model, runs after training)
+# ------------------------------------------------------------------
+def to_arrays(model):
+    """
+    (layers, {name: array}) for a Sequential LSTM/Dense model, ready to be
+    stored as artifact arrays, or None for layers or activations the NumPy
+    runtime cannot reproduce.
+    """
+    layers, arrays = [], {}
+    for i, layer in enumerate(model.layers):
+        kind = type(layer).__name__.lower()
+        config = layer.get_config()
+        if kind == 'lstm':
+            if (config.get('activation'), config.get('recurrent_activation')) != SUPPORTED['lstm'] \
+                    or not config.get('use_bias', True):
+                return None
+            kernel, recurrent, bias = layer.get_weights()
+            arrays[f'layer{i}_recurrent'] = recurrent.astype(np.float32)
+            layers.append({'kind': kind, 'units': int(layer.units),
+                           'return_sequences': bool(config.get('return_sequences'))})
+        elif kind == 'dense':
+            if config.get('activation') not in SUPPORTED['dense'] or not config.get('use_bias', True):
+                return None
+            kernel, bias = layer.get_weights()
+            layers.append({'kind': kind, 'units': int(layer.units)})
+        else:
+            return None
+        arrays[f'layer{i}_kernel'] = kernel.astype(np.float32)
+        arrays[f'layer{i}_bias'] = bias.astype(np.float32)
+    return layers, arrays
+
+
+def weight_names(layers) -> list:
+    """Artifact array names holding the weights of *layers*."""
+    names = []
+    for i, layer in enumerate(layers):
+        names += [f'layer{i}_kernel', f'layer{i}_bias']
+        if layer['kind'] == 'lstm':
+            names.append(f'layer{i}_recurrent')
+    return names
+
+
+# ------------------------------------------------------------------
+# 2. Runtime
+# ------------------------------------------------------------------
+def _sigmoid(x):
+    # 0.5 * (1 + tanh(x / 2)) is sigmoid without overflow warnings
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+class ExportedScaler:
+    """The transform/inverse_transform half of a fitted MinMaxScaler."""
+
+    def __init__(self, min_, scale_):
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+class NumpyLSTM:
+    """
+    Forward pass of an exported stacked-LSTM model in NumPy. Calling it with
+    a (batch, time, features) window returns (batch, units) like the Keras
+    model; models with the same *signature* can be stacked by StackedLSTM.
+    """
+
+    def __init__(self, layers, weights):
+        self.layers = layers
+        self.weights = weights  # per layer: (kernel, recurrent or None, bias)
+        self.signature = ('numpy',) + tuple((l['kind'], l['units']) for l in layers)
+        self._stacked = [(k[None], r if r is None else r[None], b[None]) for k, r, b in weights]
+
+    @classmethod
+    def from_arrays(cls, layers, arrays):
+        """Build from to_arrays() output (or the same arrays memory-mapped from an artifact)."""
+        weights = [(arrays[f'layer{i}_kernel'],
+                    arrays[f'layer{i}_recurrent'] if layer['kind'] == 'lstm' else None,
+                    arrays[f'layer{i}_bias']) for i, layer in enumerate(layers)]
+        return cls(layers, weights)
+
+    def __call__(self, x, training=False):
+        return forward(self.layers, self._stacked, np.asarray(x)[None])[0]
+
+
+class StackedLSTM:
+    """
+    Several NumpyLSTM models with one signature, evaluated in one batched
+    matmul per gate update: row g of the input goes through model g.
+    """
+
+    def __init__(self, models):
+        first = models[0]
+        self.layers = first.layers
+        self.weights = []
+        for i, layer in enumerate(first.layers):
+            kernel = np.stack([m.weights[i][0] for m in models])
+            recurrent = np.stack([m.weights[i][1] for m in models]) if layer['kind'] == 'lstm' else None
+            bias = np.stack([m.weights[i][2] for m in models])
+            self.weights.append((kernel, recurrent, bias))
+
+    def __call__(self, x):
+        """*x* is (models, time, features); returns (models, units)."""
+        return forward(self.layers, self.weights, np.asarray(x)[:, None])[:, 0]
+
+
+def _project(h, kernel, bias):
+    """h @ kernel + bias per model, for h of shape (models, ..., features)."""
+    lead = (1,) * (h.ndim - 3)
+    kernel = kernel.reshape(kernel.shape[:1] + lead + kernel.shape[1:])
+    return np.matmul(h, kernel) + bias.reshape(bias.shape[:1] + (1,) * (h.ndim - 2) + bias.shape[1:])
+
+
+def forward(layers, weights, x):
+    """
+    Run the layer stack on x of shape (models, batch, time, features) with
+    weights stacked along the first axis. Gate order is Keras's i, f, c, o.
+    """
+    h_seq = x.astype(np.float32)
+    for layer, (kernel, recurrent, bias) in zip(layers, weights):
+        if layer['kind'] == 'dense':
+            h_seq = _project(h_seq, kernel, bias)
+            continue
+        g_count, batch, steps, _ = h_seq.shape
+        units = layer['units']
+        # Input projections for every timestep at once; only h @ U is sequential
+        xw = _project(h_seq, kernel, bias)
+        h = np.zeros((g_count, batch, units), dtype=np.float32)
+        c = np.zeros_like(h)
+        outputs = np.empty((g_count, batch, steps, units), dtype=np.float32) \
+            if layer['return_sequences'] else None
+        for t in range(steps):
+            z = xw[:, :, t] + np.matmul(h, recurrent)
+            i = _sigmoid(z[..., :units])
+            f = _sigmoid(z[..., units:2 * units])
+            g = np.tanh(z[..., 2 * units:3 * units])
+            o = _sigmoid(z[..., 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if outputs is not None:
+                outputs[:, :, t] = h
+        h_seq = outputs if outputs is not None else h
+    return h_seq
@@ -0,0 +1,354 @@
+# Services/market_data.py
+
+import io
+import os
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from Services.market_fetcher import FETCH_WORKERS, MarketFetcher, TransientFetchError
+from Services.instrumentation import bind
+
+MARKET_DATA_DIR = os.environ.get('MARKET_DATA_DIR', 'market_data')
+# Serve prices from an HTTP CSV endpoint (e.g. a local stub) instead of Yahoo
+MARKET_DATA_URL = os.environ.get('MARKET_DATA_URL')
+
+ARRAY_FILES = ('dates.npy', 'close.npy', 'adj_close.npy')
+VERSION_PREFIX = 'v-'  # one subdirectory of arrays per stored version
+
+
+class NoDataError(RuntimeError):
+    """The requested range was fetched (or needed no fetch) but holds no bars."""
+
+
+# ------------------------------------------------------------------
+# 1. Providers
+# ------------------------------------------------------------------
+class PriceProvider:
+    """
+    Source of daily prices. ``fetch`` returns a DataFrame indexed by date
+    (tz-naive) with 'Close' and 'Adj Close' columns for [start, end).
+    """
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({'Close': [], 'Adj Close': []}, dtype=float,
+                        index=pd.DatetimeIndex([], name='Date'))
+
+
+def _has_business_days(start: str, end: str) -> bool:
+    return len(pd.bdate_range(start, end, inclusive='left')) > 0
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Flatten yfinance's (Price, Ticker) columns and drop timezones."""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    out = pd.DataFrame(index=pd.DatetimeIndex(df.index).tz_localize(None).normalize())
+    out['Close'] = np.asarray(df['Close'], dtype=float).ravel()
+    adj = df['Adj Close'] if 'Adj Close' in df.columns else df['Close']
+    out['Adj Close'] = np.asarray(adj, dtype=float).ravel()
+    out.index.name = 'Date'
+    return out.dropna()
+
+
+class YahooProvider(PriceProvider):
+    """
+    yfinance, one attempt per fetch (MarketFetcher retries), falling back to
+    stooq for most major symbols. yfinance keeps its own shared session; the
+    stooq fallback reuses one requests session.
+    """
+
+    def __init__(self):
+        self._session = None
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        import requests
+        import yfinance as yf
+
+        try:
+            df = yf.download(
+                ticker,
+                start=start,
+                end=end,
+                auto_adjust=False,
+                progress=False,
+                threads=False,
+                repair=True
+            )
+        except (json.JSONDecodeError, requests.exceptions.RequestException) as e:
+            raise TransientFetchError(f"yfinance download of {ticker} failed: {e}") from e
+        if df.empty:
+            if not _has_business_days(start, end):
+                return _empty_frame()  # e.g. only a weekend is missing
+            # otherwise yfinance is reporting throttling or an outage
+            raise TransientFetchError(f"yfinance returned no rows for {ticker}")
+        return _normalize_frame(df)
+
+    def fallback(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        import requests
+        try:
+            import pandas_datareader.data as web
+            if self._session is None:
+                self._session = requests.Session()
+            alt = web.DataReader(ticker.lstrip('^'), 'stooq', start, end, session=self._session)
+            return _normalize_frame(alt[::-1])
+        except Exception as e:
+            raise RuntimeError(f"cannot retrieve data for {ticker}") from e
+
+
+class HttpCsvProvider(PriceProvider):
+    """
+    Prices served over HTTP as <base_url>/<ticker>.csv (the layout of
+    CsvDirectoryProvider, so ``python -m http.server`` in such a directory is
+    a working stub). The start/end query parameters may be ignored by the
+    server; rows are filtered here. Connections are pooled in one session.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        import requests
+
+        url = f"{self.base_url}/{quote(_normalize_ticker(ticker))}.csv"
+        try:
+            response = self.session.get(url, params={'start': start, 'end': end}, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise TransientFetchError(f"{url}: {e}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientFetchError(f"{url}: HTTP {response.status_code}")
+        if response.status_code != 200:
+            raise RuntimeError(f"cannot retrieve data for {ticker}")
+        df = pd.read_csv(io.StringIO(response.text), index_col=0, parse_dates=True)
+        df = df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+        return _normalize_frame(df)
+
+
+class CsvDirectoryProvider(PriceProvider):
+    """
+    Offline stand-in reading <directory>/<ticker>.csv files with a Date column
+    and Close (and optionally 'Adj Close') columns.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        path = os.path.join(self.directory, f"{_normalize_ticker(ticker)}.csv")
+        if not os.path.exists(path):
+            raise RuntimeError(f"cannot retrieve data for {ticker}")
+        df = pd.read_csv(path, index_col=0, parse_dates=True)
+        df = df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+        return _normalize_frame(df)
+
+
+# ------------------------------------------------------------------
+# 2. On-disk store
+# ------------------------------------------------------------------
+def _normalize_ticker(ticker: str) -> str:
+    return ticker.replace('^', '').replace('/', '_')
+
+
+class PriceStore:
+    """
+    Per-ticker price cache shared by all model services.
+
+    Each ticker directory holds ``meta.json`` with the covered [start, end)
+    range and the current version: a v-<n> subdirectory with memory-mappable
+    ``dates.npy`` (datetime64[D]), ``close.npy`` and ``adj_close.npy``.
+    Updates write a new version and then replace meta.json, so readers in any
+    process see either the old or the new arrays, never a mix. Requests only
+    download the parts of the range that are not covered yet and merge them in.
+    """
+
+    def __init__(self, root: str = MARKET_DATA_DIR, provider: PriceProvider = None):
+        self.root = root
+        if provider is None:
+            provider = HttpCsvProvider(MARKET_DATA_URL) if MARKET_DATA_URL else YahooProvider()
+        self.provider = provider
+        self.fetcher = MarketFetcher(provider)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def set_provider(self, provider: PriceProvider, limiter=None):
+        """Download from *provider* from now on (e.g. offline data for benchmarks)."""
+        self.provider = provider
+        self.fetcher = MarketFetcher(provider, limiter)
+
+    def _lock(self, ticker: str):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _dir(self, ticker: str) -> str:
+        return os.path.join(self.root, _normalize_ticker(ticker))
+
+    def _read(self, ticker: str, mmap: bool = True):
+        """Return (meta, dates, close, adj_close), memory-mapped by default, or None."""
+        ticker_dir = self._dir(ticker)
+        meta_path = os.path.join(ticker_dir, 'meta.json')
+        for attempt in range(3):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                return None
+            # Stores written before versioning keep their arrays at the top level
+            version_dir = os.path.join(ticker_dir, meta.get('version', ''))
+            try:
+                arrays = [np.load(os.path.join(version_dir, name), mmap_mode='r' if mmap else None)
+                          for name in ARRAY_FILES]
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                continue  # pruned after two newer writes; meta.json has moved on
+            return (meta, *arrays)
+
+    def _write(self, ticker: str, meta: dict, frame: pd.DataFrame):
+        ticker_dir = self._dir(ticker)
+        version = f'{VERSION_PREFIX}{time.time_ns()}-{os.getpid()}'
+        os.makedirs(os.path.join(ticker_dir, version))
+        arrays = {
+            'dates.npy': frame.index.values.astype('datetime64[D]'),
+            'close.npy': frame['Close'].to_numpy(dtype=float),
+            'adj_close.npy': frame['Adj Close'].to_numpy(dtype=float),
+        }
+        for name, values in arrays.items():
+            with open(os.path.join(ticker_dir, version, name), 'wb') as f:
+                np.save(f, values)
+        previous = self._version(ticker_dir)
+        tmp = os.path.join(ticker_dir, f'meta.json.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({**meta, 'version': version}, f)
+        os.replace(tmp, os.path.join(ticker_dir, 'meta.json'))
+        # The previous version stays for readers that just read the old meta.json
+        self._prune(ticker_dir, keep={version, previous})
+
+    @staticmethod
+    def _version(ticker_dir: str):
+        try:
+            with open(os.path.join(ticker_dir, 'meta.json')) as f:
+                return json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _prune(ticker_dir: str, keep: set):
+        """Remove versions (and pre-versioning arrays) not in *keep*; mapped ones are left for later."""
+        with os.scandir(ticker_dir) as it:
+            stale = [entry.path for entry in it if entry.name not in keep and (
+                entry.name.startswith(VERSION_PREFIX) or entry.name in ARRAY_FILES)]
+        for path in stale:
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _frame(self, dates, close, adj_close) -> pd.DataFrame:
+        frame = pd.DataFrame({'Close': np.array(close), 'Adj Close': np.array(adj_close)},
+                             index=pd.DatetimeIndex(np.array(dates).astype('datetime64[ns]'), name='Date'))
+        return frame
+
+    def _missing_ranges(self, meta, start: date, end: date) -> list:
+        if meta is None:
+            return [(start, end)]
+        covered_start = date.fromisoformat(meta['start'])
+        covered_end = date.fromisoformat(meta['end'])
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start))
+        if end > covered_end:
+            ranges.append((covered_end, end))
+        return ranges
+
+    def ensure(self, ticker: str, start: str, end: str):
+        """Download whatever part of [start, end) is not stored yet."""
+        start = pd.Timestamp(start).date()
+        # Today's bar may still change, so coverage never extends past it
+        end = min(pd.Timestamp(end).date(), date.today())
+        if start >= end:
+            return
+
+        with self._lock(ticker):
+            # Not memory-mapped: this version may be pruned by the write below
+            stored = self._read(ticker, mmap=False)
+            meta = stored[0] if stored else None
+            # A missing weekend has nothing to download
+            ranges = [(lo, hi) for lo, hi in self._missing_ranges(meta, start, end)
+                      if _has_business_days(lo, hi)]
+            if not ranges:
+                return
+
+            parts = [self._frame(*stored[1:])] if stored else []
+            for lo, hi in ranges:
+                parts.append(self.fetcher.fetch(ticker, lo.isoformat(), hi.isoformat()))
+
+            merged = pd.concat(parts)
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            new_start = min(start, date.fromisoformat(meta['start'])) if meta else start
+            new_end = max(end, date.fromisoformat(meta['end'])) if meta else end
+            self._write(ticker, {'ticker': ticker,
+                                 'start': new_start.isoformat(),
+                                 'end': new_end.isoformat()}, merged)
+
+    def ensure_many(self, tickers, start: str, end: str) -> dict:
+        """ensure() for several tickers concurrently. Returns {ticker: error} for failures."""
+        tickers = list(dict.fromkeys(tickers))
+        failed = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(tickers))),
+                                thread_name_prefix='price-store') as pool:
+            futures = {pool.submit(bind(self.ensure), ticker, start, end): ticker for ticker in tickers}
+            for future, ticker in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failed[ticker] = e
+        return failed
+
+    def get_close(self, ticker: str, start: str, end: str, adjusted: bool = False) -> pd.DataFrame:
+        """
+        Return a DataFrame with a single 'Close' column for [start, end).
+        *adjusted* selects dividend/split-adjusted closes. Raises NoDataError
+        when the range holds no bars, RuntimeError when it cannot be fetched.
+        """
+        self.ensure(ticker, start, end)
+        # All three arrays come from the one version meta.json named; the slices
+        # are copies, so the mappings are released when this returns
+        stored = self._read(ticker)
+        if stored is None:
+            raise NoDataError(f"no data for {ticker} in [{start}, {end})")
+        _, dates, close, adj_close = stored
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date(), 'D'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date(), 'D'), side='left')
+        values = np.array((adj_close if adjusted else close)[lo:hi])
+        index = np.array(dates[lo:hi]).astype('datetime64[ns]')
+        del stored, dates, close, adj_close
+        frame = pd.DataFrame({'Close': values}, index=pd.DatetimeIndex(index, name='Date'))
+        if frame.empty:
+            raise NoDataError(f"no data for {ticker} in [{start}, {end})")
+        return frame
+
+
+store = PriceStore()
@@ -0,0 +1,150 @@
+# Services/market_fetcher.py
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Services.instrumentation import span
+
+# Provider traffic limits (per process)
+RATE_PER_SECOND = float(os.environ.get('MARKET_DATA_RATE', 2))
+BURST = int(os.environ.get('MARKET_DATA_BURST', 4))
+RETRIES = int(os.environ.get('MARKET_DATA_RETRIES', 4))
+BACKOFF_BASE = float(os.environ.get('MARKET_DATA_BACKOFF', 0.5))
+BACKOFF_MAX = 30.0
+FETCH_WORKERS = int(os.environ.get('MARKET_DATA_WORKERS', 4))
+
+
+class TransientFetchError(RuntimeError):
+    """A download failed in a way that is worth retrying (throttling, 5xx, empty reply)."""
+
+
+# ------------------------------------------------------------------
+# 1. Building blocks
+# ------------------------------------------------------------------
+class TokenBucket:
+    """*rate* tokens per second, at most *burst* saved up; acquire() blocks until one is free."""
+
+    def __init__(self, rate: float = RATE_PER_SECOND, burst: int = BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return  # unlimited
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """Concurrent do() calls with the same key share one execution and its result or error."""
+
+    def __init__(self):
+        self._calls = {}  # key -> [event, result, error]
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+        if not leader:
+            call[0].wait()
+        else:
+            try:
+                call[1] = fn()
+            except BaseException as e:
+                call[2] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call[0].set()
+        if call[2] is not None:
+            raise call[2]
+        return call[1]
+
+
+def backoff(attempt, retries: int = RETRIES, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX,
+            retry_on=(TransientFetchError,)):
+    """
+    Call *attempt* until it succeeds, sleeping base * 2**n (with full jitter,
+    capped at *cap*) between tries; the last error is re-raised after
+    *retries* retries.
+    """
+    for n in range(retries + 1):
+        try:
+            return attempt()
+        except retry_on:
+            if n == retries:
+                raise
+            time.sleep(random.uniform(0, min(cap, base * 2 ** n)))
+
+
+# ------------------------------------------------------------------
+# 2. Fetcher
+# ------------------------------------------------------------------
+class MarketFetcher:
+    """
+    Rate-limited, deduplicated front of a PriceProvider. Concurrent fetches
+    of the same (ticker, start, end) share one download; each provider call
+    takes a token from the bucket and transient failures back off
+    exponentially. Providers may define ``fallback(ticker, start, end)``,
+    used once the retries are exhausted.
+    """
+
+    def __init__(self, provider, limiter: TokenBucket = None, retries: int = RETRIES,
+                 workers: int = FETCH_WORKERS):
+        self.provider = provider
+        self.limiter = limiter or TokenBucket()
+        self.retries = retries
+        self.workers = workers
+        self._flight = SingleFlight()
+
+    def _attempt(self, ticker: str, start: str, end: str):
+        self.limiter.acquire()
+        with span('download', 'market', ticker):
+            return self.provider.fetch(ticker, start, end)
+
+    def _fetch(self, ticker: str, start: str, end: str):
+        try:
+            return backoff(lambda: self._attempt(ticker, start, end), retries=self.retries)
+        except TransientFetchError as e:
+            fallback = getattr(self.provider, 'fallback', None)
+            if fallback is None:
+                raise RuntimeError(f"cannot retrieve data for {ticker}") from e
+            self.limiter.acquire()
+            return fallback(ticker, start, end)
+
+    def fetch(self, ticker: str, start: str, end: str):
+        return self._flight.do((ticker, start, end), lambda: self._fetch(ticker, start, end))
+
+    def fetch_many(self, requests) -> dict:
+        """
+        {(ticker, start, end): frame or exception} for an iterable of
+        (ticker, start, end); independent tickers are fetched concurrently.
+        """
+        requests = list(dict.fromkeys(requests))
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(requests))),
+                                thread_name_prefix='market-fetch') as pool:
+            futures = {pool.submit(self.fetch, *request): request for request in requests}
+            for future, request in futures.items():
+                try:
+                    results[request] = future.result()
+                except Exception as e:
+                    results[request] = e
+        return results
@@ -0,0 +1,205 @@
+# Services/model_catalog.py
+
+import os
+import json
+import threading
+import time
+from datetime import datetime
+
+from Services.model_registry import model_files, model_version
+from Services.artifacts import MANIFEST_FILE, read_manifest
+
+# Where each algorithm keeps its models and which files make a model usable
+ALGORITHMS = {
+    'lstm': {
+        'dir': 'models/lstm_models',
+        'required': ('model.h5', 'scaler.pkl', 'data.csv'),
+        'params': 'lstm_params.json',
+    },
+    'arima': {
+        'dir': 'models/arima_models',
+        'required': ('arima_params.json', 'data.csv'),
+        # Slim models keep their state in the artifact, legacy ones in pickles
+        'one_of': (('manifest.json', 'arima_model.pkl'),),
+        'params': 'arima_params.json',
+    },
+    'prophet': {
+        'dir': 'models/prophet_models',
+        'required': ('model.pkl', 'data.csv'),
+        'params': 'prophet_params.json',
+    },
+}
+
+
+def normalize_ticker(ticker: str) -> str:
+    return ticker.replace('^', '').replace('/', '_')
+
+
+def _looks_like_date(field: str) -> bool:
+    return len(field) >= 10 and field[4] == '-' and field[7] == '-' and field[:4].isdigit()
+
+
+def _csv_date_range(path: str):
+    """First and last date of a data.csv without parsing it (header rows are skipped)."""
+    first = None
+    with open(path, 'rb') as f:
+        for _ in range(5):
+            line = f.readline().decode('utf-8', 'replace')
+            if _looks_like_date(line):
+                first = line[:10]
+                break
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().decode('utf-8', 'replace').strip().splitlines()
+    last = lines[-1][:10] if lines and _looks_like_date(lines[-1]) else None
+    return first, last
+
+
+def describe(algorithm: str, name: str) -> dict | None:
+    """Scan one model directory and return its catalog entry, or None if it is gone."""
+    spec = ALGORITHMS[algorithm]
+    stock_dir = os.path.join(spec['dir'], name)
+    if not os.path.isdir(stock_dir):
+        return None
+
+    artifacts = {}
+    mtime = 0.0
+    for name, st in model_files(stock_dir):
+        artifacts[name] = st.st_size
+        mtime = max(mtime, st.st_mtime)
+    missing = [f for f in spec['required'] if f not in artifacts]
+    missing += [' or '.join(group) for group in spec.get('one_of', ())
+                if not any(f in artifacts for f in group)]
+
+    window = {'start': None, 'end': None}
+    params_path = os.path.join(stock_dir, spec['params'])
+    manifest = read_manifest(stock_dir) if MANIFEST_FILE in artifacts else None
+    if manifest is not None:
+        window = {'start': manifest['training_window'].get('start'),
+                  'end': manifest['training_window'].get('end')}
+    elif os.path.exists(params_path):
+        try:
+            with open(params_path) as f:
+                params = json.load(f)
+            window = {'start': params.get('start'), 'end': params.get('end')}
+        except (OSError, ValueError):
+            pass
+    if 'data.csv' in artifacts:
+        try:
+            window['data_start'], window['data_end'] = _csv_date_range(os.path.join(stock_dir, 'data.csv'))
+        except OSError:
+            pass
+
+    return {
+        'algorithm': algorithm,
+        'ticker': name,
+        'complete': not missing,
+        'missing': missing,
+        'artifacts': artifacts,
+        'size_bytes': sum(artifacts.values()),
+        'version': model_version(stock_dir),
+        'trained_at': datetime.utcfromtimestamp(mtime).isoformat() if mtime else None,
+        'training_window': window,
+    }
+
+
+class ModelCatalog:
+    """
+    In-memory index of trained models, built with one directory scan per
+    algorithm and kept current by refresh() calls from the training code
+    (or by the optional polling watcher).
+    """
+
+    def __init__(self):
+        self._entries = {}  # (algorithm, normalized ticker) -> entry
+        self._lock = threading.Lock()
+        self._built = False
+        self.generation = 0
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """
+        Call fn(algorithm, ticker) after a model entry was refreshed, and
+        fn(None, None) after a full rebuild changed anything.
+        """
+        self._listeners.append(fn)
+
+    def _notify(self, algorithm, ticker):
+        for fn in self._listeners:
+            try:
+                fn(algorithm, ticker)
+            except Exception as e:
+                print(f"Model catalog listener failed: {e}")
+
+    def build(self):
+        entries = {}
+        for algorithm, spec in ALGORITHMS.items():
+            if not os.path.isdir(spec['dir']):
+                continue
+            for name in os.listdir(spec['dir']):
+                entry = describe(algorithm, name)
+                if entry is not None:
+                    entries[(algorithm, name)] = entry
+        with self._lock:
+            changed = entries != self._entries
+            self._entries = entries
+            self._built = True
+            if changed:
+                self.generation += 1
+        if changed:
+            self._notify(None, None)
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def refresh(self, algorithm: str, ticker: str):
+        """Re-scan the model directory of (*algorithm*, *ticker*) after it changed."""
+        self._ensure_built()
+        key = (algorithm, normalize_ticker(ticker))
+        entry = describe(*key)
+        with self._lock:
+            if entry is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = entry
+            self.generation += 1
+        self._notify(*key)
+
+    def get(self, algorithm: str, ticker: str) -> dict | None:
+        self._ensure_built()
+        with self._lock:
+            return self._entries.get((algorithm, normalize_ticker(ticker)))
+
+    def exists(self, algorithm: str, ticker: str) -> bool:
+        """True when every required artifact of the model is present."""
+        entry = self.get(algorithm, ticker)
+        return entry is not None and entry['complete']
+
+    def tickers(self, algorithm: str) -> list[str]:
+        """Names of the complete models of *algorithm*."""
+        return [entry['ticker'] for entry in self.entries(algorithm) if entry['complete']]
+
+    def entries(self, algorithm: str = None) -> list[dict]:
+        self._ensure_built()
+        with self._lock:
+            return sorted((e for (algo, _), e in self._entries.items()
+                           if algorithm is None or algo == algorithm),
+                          key=lambda e: (e['algorithm'], e['ticker']))
+
+    def start_watcher(self, interval_seconds: float = 30.0):
+        """Rebuild the catalog periodically to pick up models copied in by hand."""
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.build()
+                except OSError as e:
+                    print(f"Model catalog rebuild failed: {e}")
+
+        thread = threading.Thread(target=loop, name='model-catalog', daemon=True)
+        thread.start()
+        return thread
+
+
+catalog = ModelCatalog()
@@ -0,0 +1,188 @@
+# Services/model_registry.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from Services.artifacts import MANIFEST_FILE, read_manifest, prune
+
+# Files derived from the model rather than part of it
+DERIVED_FILES = {'forecast.json'}
+TEMP_SUFFIX = '.tmp'  # half-written files, renamed into place when complete
+
+# ------------------------------------------------------------------
+# 1. Model directory fingerprint
+# ------------------------------------------------------------------
+def model_files(stock_dir: str):
+    """
+    Yield (name, stat) for the model files in *stock_dir*, skipping derived
+    and temporary files and files removed while the directory is scanned.
+    Array files in the artifact's version directory are included (as
+    'arrays-<n>/<name>.npy'); superseded versions are not.
+    """
+    has_manifest = False
+    with os.scandir(stock_dir) as it:
+        for entry in it:
+            if entry.name in DERIVED_FILES or entry.name.endswith(TEMP_SUFFIX):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue  # renamed or removed since scandir listed it
+            has_manifest |= entry.name == MANIFEST_FILE
+            yield entry.name, st
+
+    manifest = read_manifest(stock_dir) if has_manifest else None
+    for array in (manifest['arrays'].values() if manifest else ()):
+        if '/' not in array['file']:
+            continue  # top-level files were listed above
+        try:
+            yield array['file'], os.stat(os.path.join(stock_dir, array['file']))
+        except FileNotFoundError:
+            continue
+
+
+def fingerprint(stock_dir: str) -> tuple:
+    """
+    Return a hashable snapshot of the files in *stock_dir* as
+    (name, size, mtime_ns) triples. Any retrain or manual copy changes it.
+    """
+    return tuple(sorted((name, st.st_size, st.st_mtime_ns) for name, st in model_files(stock_dir)))
+
+
+def model_version(stock_dir: str) -> str:
+    """Short version id of the model artifacts in *stock_dir*, from their fingerprint."""
+    return hashlib.sha1(repr(fingerprint(stock_dir)).encode('utf-8')).hexdigest()[:16]
+
+
+def _footprint(fp: tuple) -> int:
+    """On-disk size of the artifacts, used as a proxy for in-memory size."""
+    return sum(size for _, size, _ in fp)
+
+
+# ------------------------------------------------------------------
+# 2. LRU registry with memory budget
+# ------------------------------------------------------------------
+class ModelRegistry:
+    """
+    Process-wide cache of loaded model state keyed by (algorithm, ticker).
+
+    Entries are evicted least-recently-used first once the summed footprint
+    exceeds *max_bytes*, and are reloaded when the model directory changes.
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (fingerprint, footprint, state, stock_dir)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, algorithm: str, ticker: str, stock_dir: str, loader):
+        """
+        Return the cached state for (*algorithm*, *ticker*), calling
+        *loader()* when it is missing or the files in *stock_dir* changed.
+        """
+        key = (algorithm, ticker)
+        fp = fingerprint(stock_dir)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == fp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[2]
+
+        # Serialise loads per key so concurrent misses deserialize only once
+        with self._key_lock(key):
+            with self._lock:
+                cached = self._entries.get(key)
+                if cached is not None and cached[0] == fp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return cached[2]
+                self.misses += 1
+
+            state = loader()
+            size = _footprint(fp)
+
+            with self._lock:
+                old = self._entries.pop(key, None)
+                dropped = []
+                if old is not None:
+                    self._bytes -= old[1]
+                    self.invalidations += 1
+                    dropped.append(old[3])
+                self._entries[key] = (fp, size, state, stock_dir)
+                self._bytes += size
+                dropped += self._evict()
+            del old
+            self._release(dropped)
+            return state
+
+    def _evict(self) -> list:
+        """Evict down to the budget; returns the model directories of the evicted entries."""
+        dropped = []
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, size, _, stock_dir) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            dropped.append(stock_dir)
+        return dropped
+
+    @staticmethod
+    def _release(stock_dirs):
+        """Remove superseded artifact versions that dropped entries may have kept mapped."""
+        for stock_dir in stock_dirs:
+            try:
+                prune(stock_dir)
+            except OSError:
+                pass
+
+    def invalidate(self, algorithm: str, ticker: str = None):
+        """Drop one entry, or every entry of *algorithm* when ticker is None."""
+        with self._lock:
+            keys = [k for k in self._entries
+                    if k[0] == algorithm and (ticker is None or k[1] == ticker)]
+            dropped = []
+            for key in keys:
+                _, size, _, stock_dir = self._entries.pop(key)
+                self._bytes -= size
+                self.invalidations += 1
+                dropped.append(stock_dir)
+        self._release(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'keys': [f"{a}:{t}" for a, t in self._entries],
+            }
+
+
+registry = ModelRegistry(
+    max_bytes=int(os.environ.get('MODEL_REGISTRY_MAX_MB', '1024')) * 1024 * 1024
+)
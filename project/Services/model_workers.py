@@ -0,0 +1,324 @@
+# Services/model_workers.py
+
+import os
+import time
+import atexit
+import zlib
+import queue
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+
+from Services import service_loader, instrumentation
+
+# Calls whose first argument is a list of (ticker, ...) pairs; they are split
+# per owning worker and the {ticker: result} dicts merged back together.
+BATCHED = {'predict_many'}
+
+DEFAULT_TIMEOUT = float(os.environ.get('MODEL_WORKER_TIMEOUT', 120))
+# How often each worker publishes its instrumentation histograms
+METRICS_SECONDS = float(os.environ.get('MODEL_WORKER_METRICS_SECONDS', 5))
+
+
+def normalize_ticker(ticker: str) -> str:
+    return ticker.replace('^', '').replace('/', '_')
+
+
+def shard(algorithm: str, ticker: str, size: int) -> int:
+    """Index of the worker that owns (*algorithm*, *ticker*)."""
+    return zlib.crc32(f'{algorithm}:{normalize_ticker(ticker)}'.encode('utf-8')) % size
+
+
+# ------------------------------------------------------------------
+# 1. Worker process
+# ------------------------------------------------------------------
+def _worker_main(index: int, inbox, outbox):
+    """
+    Serve calls for one shard: messages are (request_id, algorithm, name,
+    args, kwargs, wants_progress); replies go to the shared *outbox*.
+    The service modules and their model registry live in this process.
+    A background thread publishes the instrumentation histograms every
+    METRICS_SECONDS, also while a call is running.
+    """
+    def publish_metrics():
+        while True:
+            outbox.put((index, None, 'metrics', instrumentation.snapshot(), None))
+            time.sleep(METRICS_SECONDS)
+
+    threading.Thread(target=publish_metrics, name='metrics-publisher', daemon=True).start()
+    while True:
+        message = inbox.get()
+        if message is None:
+            return
+        request_id, algorithm, name, args, kwargs, wants_progress = message
+        if wants_progress:
+            kwargs['progress'] = lambda info, rid=request_id: outbox.put((index, rid, 'progress', info, None))
+        started = time.perf_counter()
+        try:
+            if algorithm is None:
+                result = _worker_stats()
+            else:
+                result = getattr(service_loader.load(algorithm), name)(*args, **kwargs)
+            outbox.put((index, request_id, 'ok', result, time.perf_counter() - started))
+        except Exception as e:
+            outbox.put((index, request_id, 'error', f'{type(e).__name__}: {e}', time.perf_counter() - started))
+
+
+def _worker_stats() -> dict:
+    from Services.model_registry import registry
+    return {'pid': os.getpid(), 'registry': registry.stats(), 'services': service_loader.report()}
+
+
+# ------------------------------------------------------------------
+# 2. Router in the front process
+# ------------------------------------------------------------------
+class _Pending:
+    """A call in flight; messages for it arrive on its own queue."""
+
+    def __init__(self, worker: int, abandon=None):
+        self.worker = worker
+        self.messages = queue.Queue()
+        self.submitted = time.perf_counter()
+        self._abandon = abandon  # called when the caller stops waiting
+
+    def result(self, timeout: float = None, progress=None):
+        """
+        Wait for the reply, passing progress messages to *progress* on the
+        calling thread (so it can use that thread's app context).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, value = self.messages.get(timeout=remaining)
+            except queue.Empty:
+                if self._abandon is not None:
+                    self._abandon()
+                raise TimeoutError(f'model worker {self.worker} did not answer within {timeout}s')
+            if kind == 'progress':
+                if progress is not None:
+                    progress(value)
+            elif kind == 'ok':
+                return value
+            else:
+                raise RuntimeError(value)
+
+
+class ModelWorkerPool:
+    """
+    *size* worker processes, each owning the (algorithm, ticker) models that
+    shard() assigns to it, so every model is loaded (and kept hot) in exactly
+    one process. Calls travel over multiprocessing queues. Workers are not
+    daemonic (model code may start process pools of its own), so stop()
+    must run before the interpreter exits; start() registers it.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._ctx = multiprocessing.get_context('spawn')
+        self._outbox = self._ctx.Queue()
+        self._workers = [None] * size  # (process, inbox)
+        self._pending = {}  # request_id -> _Pending
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = [self._empty_stats() for _ in range(size)]
+        self._metrics = [None] * size  # last histograms each worker published
+        self._listener = None
+        self._stopping = False
+
+    @staticmethod
+    def _empty_stats():
+        return {'depth': 0, 'completed': 0, 'errors': 0, 'timeouts': 0, 'restarts': 0,
+                'latency': deque(maxlen=1000), 'service': deque(maxlen=1000)}
+
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index)
+        self._listener = threading.Thread(target=self._listen, name='model-worker-listener', daemon=True)
+        self._listener.start()
+
+    def _spawn(self, index: int):
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(target=_worker_main, args=(index, inbox, self._outbox),
+                                    name=f'model-worker-{index}', daemon=False)
+        process.start()
+        self._workers[index] = (process, inbox)
+
+    def stop(self, timeout: float = 5):
+        """Ask every worker to exit, terminating the ones still running after *timeout* seconds."""
+        if self._stopping:
+            return
+        self._stopping = True
+        for process, inbox in self._workers:
+            if process.is_alive():
+                inbox.put(None)
+        deadline = time.monotonic() + timeout
+        for process, _ in self._workers:
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+
+    # -------------------- replies --------------------
+    def _listen(self):
+        # Liveness is checked on a timer: with metrics and replies arriving the
+        # outbox is rarely idle for a whole second
+        last_check = time.monotonic()
+        while not self._stopping:
+            if time.monotonic() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                index, request_id, kind, value, service_seconds = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if kind == 'metrics':
+                self._metrics[index] = value
+                continue
+            with self._lock:
+                pending = self._pending.get(request_id)
+                if pending is not None and kind != 'progress':
+                    del self._pending[request_id]
+                    stats = self._stats[index]
+                    stats['depth'] -= 1
+                    stats['completed'] += 1
+                    stats['errors'] += kind == 'error'
+                    stats['latency'].append(time.perf_counter() - pending.submitted)
+                    stats['service'].append(service_seconds)
+            if pending is not None:
+                pending.messages.put((kind, value))
+
+    def _check_workers(self):
+        """Restart dead workers and fail the calls they were holding."""
+        for index, (process, _) in enumerate(self._workers):
+            if process.is_alive() or self._stopping:
+                continue
+            print(f"Model worker {index} exited with code {process.exitcode}; restarting")
+            with self._lock:
+                lost = [(rid, p) for rid, p in self._pending.items() if p.worker == index]
+                for rid, _ in lost:
+                    del self._pending[rid]
+                stats = self._stats[index]
+                stats['depth'] = 0
+                stats['errors'] += len(lost)
+                stats['restarts'] += 1
+                self._metrics[index] = None  # the new process starts from zero (a counter reset)
+            for _, pending in lost:
+                pending.messages.put(('error', f'model worker {index} died'))
+            self._spawn(index)
+
+    def _abandon(self, request_id: int):
+        """Forget a call whose caller timed out; a late reply is then dropped."""
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+            if pending is not None:
+                stats = self._stats[pending.worker]
+                stats['depth'] -= 1
+                stats['errors'] += 1
+                stats['timeouts'] += 1
+
+    # -------------------- calls --------------------
+    def submit(self, worker: int, algorithm, name, args=(), kwargs=None, wants_progress=False) -> _Pending:
+        request_id = next(self._ids)
+        pending = _Pending(worker, lambda: self._abandon(request_id))
+        with self._lock:
+            self._pending[request_id] = pending
+            self._stats[worker]['depth'] += 1
+        self._workers[worker][1].put((request_id, algorithm, name, tuple(args), dict(kwargs or {}),
+                                      wants_progress))
+        return pending
+
+    def dispatch(self, algorithm: str, name: str, args: tuple, kwargs: dict):
+        """Run service function *name* of *algorithm* on the owning worker(s)."""
+        kwargs = dict(kwargs)
+        progress = kwargs.pop('progress', None)
+        # Calls reporting progress have no deadline; everything else uses MODEL_WORKER_TIMEOUT
+        timeout = None if progress is not None else DEFAULT_TIMEOUT
+
+        if name in BATCHED:
+            requests, rest = list(args[0] if args else kwargs.pop('requests')), args[1:]
+            by_worker = {}
+            for request in requests:
+                by_worker.setdefault(shard(algorithm, request[0], self.size), []).append(request)
+            calls = [self.submit(worker, algorithm, name, (batch,) + tuple(rest), kwargs)
+                     for worker, batch in by_worker.items()]
+            merged = {}
+            for call in calls:
+                merged.update(call.result(timeout))
+            return merged
+
+        ticker = kwargs.get('ticker', args[0] if args else '^GSPC')
+        call = self.submit(shard(algorithm, ticker, self.size), algorithm, name, args, kwargs,
+                           wants_progress=progress is not None)
+        return call.result(timeout, progress)
+
+    # -------------------- stats --------------------
+    def stats(self, detail: bool = False) -> dict:
+        workers = []
+        with self._lock:
+            for index, (process, _) in enumerate(self._workers):
+                stats = self._stats[index]
+                workers.append({
+                    'worker': index,
+                    'pid': process.pid,
+                    'alive': process.is_alive(),
+                    'queue_depth': stats['depth'],
+                    'completed': stats['completed'],
+                    'errors': stats['errors'],
+                    'timeouts': stats['timeouts'],
+                    'restarts': stats['restarts'],
+                    'latency_ms': _percentiles(stats['latency']),
+                    'service_ms': _percentiles(stats['service']),
+                })
+        if detail:
+            calls = [self.submit(index, None, None) for index in range(self.size)]
+            for entry, call in zip(workers, calls):
+                try:
+                    entry.update(call.result(timeout=5))
+                except (TimeoutError, RuntimeError) as e:
+                    entry['detail_error'] = str(e)
+        return {'mode': 'workers', 'size': self.size, 'workers': workers}
+
+    def metric_snapshots(self) -> list:
+        """
+        The histograms each worker last published (at most METRICS_SECONDS
+        old). Never waits on a worker, and a busy worker keeps its last
+        counts, so the merged counters only drop when a worker restarts.
+        """
+        return [snapshot for snapshot in self._metrics if snapshot is not None]
+
+
+def _percentiles(samples) -> dict:
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[int(q * (len(ordered) - 1))] * 1000, 2)
+    return {'count': len(ordered), 'mean': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p50': pick(0.5), 'p95': pick(0.95), 'max': round(ordered[-1] * 1000, 2)}
+
+
+pool = None
+
+
+def start(size: int = None) -> ModelWorkerPool:
+    """Start the worker pool and route every lazy service call through it."""
+    global pool
+    pool = ModelWorkerPool(size or os.cpu_count() or 1)
+    pool.start()
+    atexit.register(pool.stop)
+    service_loader.set_router(pool.dispatch)
+    return pool
+
+
+def stats(detail: bool = False) -> dict:
+    if pool is None:
+        return {'mode': 'in-process', 'size': 0, 'workers': []}
+    return pool.stats(detail)
+
+
+def metric_snapshots() -> list:
+    return [] if pool is None else pool.metric_snapshots()
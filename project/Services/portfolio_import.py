@@ -0,0 +1,144 @@
+# Services/portfolio_import.py
+
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MAX_ROWS = int(os.environ.get('PORTFOLIO_IMPORT_MAX_ROWS', 10000))
+COLUMNS = ('id', 'ticker', 'quantity', 'purchase_price', 'purchase_date', 'notes')
+TICKER_LENGTH = 10  # PortfolioItem.ticker is String(10)
+
+
+# ------------------------------------------------------------------
+# 1. Input
+# ------------------------------------------------------------------
+def read_json(records) -> pd.DataFrame:
+    """Frame from a JSON array of item objects (or {'items': [...]})."""
+    if isinstance(records, dict):
+        records = records.get('items')
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError('Expected a JSON array of items')
+    return _prepare(pd.DataFrame.from_records(records))
+
+
+def read_csv(text: str) -> pd.DataFrame:
+    """Frame from CSV text with a header row naming (some of) COLUMNS."""
+    # Everything as text so tickers such as "NA" survive; numbers are parsed in validate()
+    frame = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False, skipinitialspace=True)
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    return _prepare(frame)
+
+
+def _prepare(frame: pd.DataFrame) -> pd.DataFrame:
+    if len(frame) > MAX_ROWS:
+        raise ValueError(f'At most {MAX_ROWS} items per import')
+    frame = frame.reindex(columns=list(COLUMNS)).astype(object)
+    # Empty cells and nulls both mean "not given"
+    blank = frame.apply(lambda column: column.map(lambda v: v is None or (isinstance(v, str) and not v.strip())
+                                                  or (isinstance(v, float) and np.isnan(v))))
+    return frame.mask(blank, None).reset_index(drop=True)
+
+
+# ------------------------------------------------------------------
+# 2. Validation
+# ------------------------------------------------------------------
+def validate(frame: pd.DataFrame):
+    """
+    Check every row at once. Rows with an id update that item (only the
+    given fields change); rows without one are new items and need ticker,
+    quantity and purchase_price.
+
+    Returns (inserts, updates, errors): inserts and updates are lists of
+    {'row': n, field: value, ...} with only the given fields, errors is a
+    list of {'row': n, 'error': message}; n is the 0-based input row.
+    """
+    errors = pd.Series(None, index=frame.index, dtype=object)
+
+    def fail(mask, message):
+        errors[mask & errors.isna()] = message
+
+    has_id = frame['id'].notna()
+    item_id = pd.to_numeric(frame['id'], errors='coerce')
+    fail(has_id & (item_id.isna() | (item_id % 1 != 0)), 'id must be an integer')
+    fail(has_id & item_id.duplicated(keep='first') & item_id.notna(), 'id appears more than once')
+
+    ticker = frame['ticker'].map(lambda v: str(v).strip().upper() if v is not None else None)
+    has_ticker = ticker.notna()
+    fail(~has_id & ~has_ticker, 'ticker is required')
+    fail(has_ticker & (ticker.str.len() > TICKER_LENGTH), f'ticker is longer than {TICKER_LENGTH} characters')
+
+    numbers = {}
+    for column in ('quantity', 'purchase_price'):
+        given = frame[column].notna()
+        values = pd.to_numeric(frame[column], errors='coerce').astype(float)
+        fail(~has_id & ~given, f'{column} is required')
+        fail(given & ~np.isfinite(values), f'{column} must be a number')
+        numbers[column] = values
+    fail(numbers['purchase_price'] < 0, 'purchase_price must not be negative')
+
+    dates = pd.to_datetime(frame['purchase_date'], errors='coerce', utc=True, format='mixed').dt.tz_localize(None)
+    fail(frame['purchase_date'].notna() & dates.isna(), 'purchase_date must be a date')
+
+    values = pd.DataFrame({
+        'id': item_id,
+        'ticker': ticker,
+        'quantity': numbers['quantity'],
+        'purchase_price': numbers['purchase_price'],
+        'purchase_date': dates,
+        'notes': frame['notes'].map(lambda v: str(v) if v is not None else None),
+    })
+
+    inserts, updates = [], []
+    for row, record in zip(frame.index[errors.isna()], values[errors.isna()].to_dict('records')):
+        fields = {'row': int(row)}
+        for column, value in record.items():
+            if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+                continue
+            if column == 'id':
+                value = int(value)
+            elif column == 'purchase_date':
+                value = value.to_pydatetime()
+            fields[column] = value
+        (updates if 'id' in fields else inserts).append(fields)
+    failed = [{'row': int(row), 'error': message} for row, message in errors.dropna().items()]
+    return inserts, updates, failed
+
+
+# ------------------------------------------------------------------
+# 3. Rows for executemany
+# ------------------------------------------------------------------
+def insert_params(portfolio_id: int, inserts: list) -> list:
+    """Parameter sets for one INSERT executemany (every set has the same keys)."""
+    now = datetime.utcnow()
+    return [{
+        'portfolio_id': portfolio_id,
+        'ticker': fields['ticker'],
+        'quantity': fields['quantity'],
+        'purchase_price': fields['purchase_price'],
+        'purchase_date': fields.get('purchase_date', now),
+        'notes': fields.get('notes', ''),
+    } for fields in inserts]
+
+
+def update_params(updates: list, existing: dict) -> tuple:
+    """
+    Parameter sets for one UPDATE executemany, the given fields laid over
+    the stored item (*existing*: id -> column mapping of this portfolio's
+    items). Returns (params, updated, errors); errors are the rows whose
+    id is not in the portfolio.
+    """
+    params, updated, errors = [], [], []
+    for fields in updates:
+        current = existing.get(fields['id'])
+        if current is None:
+            errors.append({'row': fields['row'], 'error': 'Portfolio item not found'})
+            continue
+        merged = {column: fields.get(column, current[column])
+                  for column in ('ticker', 'quantity', 'purchase_price', 'purchase_date', 'notes')}
+        merged['item_id'] = fields['id']
+        params.append(merged)
+        updated.append({'row': fields['row'], 'item_id': fields['id']})
+    return params, updated, errors
@@ -1,27 +1,28 @@
 import os
+import time
 from typing import Dict, List, Tuple, Optional
 import statistics
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
 
-from Services.lstm_model_service import predict_next_days as lstm_predict, list_trained_models as lstm_models
-from Services.arima_model_service import predict_next_days as arima_predict, list_trained_models as arima_models  
-from Services.prophet_model_service import predict_next_days as prophet_predict, list_trained_models as prophet_models
+from Services.service_loader import lazy, is_routed
+from Services.instrumentation import bind
+from Services import forecast_cache
+from Services.model_catalog import catalog
+from Services.scenario_engine import portfolio_scenarios
+
+# Model services (and their ML libraries) are imported on the first forecast
+lstm_predict = lazy('lstm', 'predict_next_days')
+lstm_predict_many = lazy('lstm', 'predict_many')
+arima_predict = lazy('arima', 'predict_next_days')
+prophet_predict = lazy('prophet', 'predict_next_days')
 
 def normalize_ticker(ticker: str) -> str:
     """Normalize ticker name to match model directory naming"""
     return ticker.replace("^", "").replace("/", "_")
 
 def check_model_exists(ticker: str, algorithm: str) -> bool:
-    """Check if a trained model exists for a specific ticker and algorithm"""
-    normalized_ticker = normalize_ticker(ticker)
-    
-    if algorithm == 'lstm':
-        return normalized_ticker in lstm_models()
-    elif algorithm == 'arima':
-        return normalized_ticker in arima_models()
-    elif algorithm == 'prophet':
-        return normalized_ticker in prophet_models()
-    else:
-        return False
+    """Check if a complete trained model exists for a specific ticker and algorithm"""
+    return catalog.exists(algorithm, ticker)
 
 def get_missing_models(tickers: List[str], algorithms: List[str]) -> Dict[str, List[str]]:
     """
@@ -41,37 +42,143 @@ def get_missing_models(tickers: List[str], algorithms: List[str]) -> Dict[str, L
     
     return missing
 
-def predict_stock_price(ticker: str, algorithm: str, days: int = 30) -> Optional[float]:
+# Forecast values per algorithm: which key of the service result holds the price path
+FORECAST_KEYS = {'lstm': 'forecast', 'arima': 'forecast_mean', 'prophet': 'forecast'}
+
+# Executors shared across requests: threads for TF/statsmodels (they release
+# the GIL), processes for Prophet. Sizes come from the environment.
+EXECUTOR_KINDS = {'lstm': 'thread', 'arima': 'thread', 'prophet': 'process'}
+_thread_pool = None
+_process_pool = None
+
+def _executor(kind: str):
+    global _thread_pool, _process_pool
+    # With model workers the work happens there; threads only wait for replies
+    if kind == 'process' and not is_routed():
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=int(os.environ.get('PREDICT_PROCESSES', 2)))
+        return _process_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('PREDICT_THREADS', 8)),
+                                          thread_name_prefix='predict')
+    return _thread_pool
+
+def forecast_stock(ticker: str, algorithm: str, days: int = 30) -> Optional[Dict]:
     """
-    Get price prediction for a specific stock using the specified algorithm.
-    Returns the predicted price after 'days' or None if model doesn't exist.
+    Full forecast dict for a stock from the given algorithm (served from the
+    materialized forecast when it covers the horizon), or None on failure.
     """
-    if not check_model_exists(ticker, algorithm):
-        return None
+    cached = forecast_cache.get(algorithm, ticker, days)
+    if cached is not None:
+        return cached
     
     try:
         if algorithm == 'lstm':
-            result = lstm_predict(ticker=ticker, days=days)
-            # Return the last predicted price
-            return result['forecast'][-1] if result['forecast'] else None
-            
+            return lstm_predict(ticker=ticker, days=days)
         elif algorithm == 'arima':
-            result = arima_predict(ticker=ticker, days=days)
-            # Return the last predicted price
-            return result['forecast_mean'][-1] if result['forecast_mean'] else None
-            
+            return arima_predict(ticker=ticker, days=days)
         elif algorithm == 'prophet':
-            result = prophet_predict(ticker=ticker, days=days)
-            # Return the last predicted price
-            return result['forecast'][-1] if result['forecast'] else None
-            
+            return prophet_predict(ticker=ticker, days=days)
     except Exception as e:
         print(f"Error predicting {ticker} with {algorithm}: {e}")
         return None
     
     return None
 
-def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: int = 30) -> Dict:
+def forecast_lstm_batch(tickers: List[str], days: int = 30) -> Dict[str, Dict]:
+    """
+    Batched LSTM forecast for all *tickers* at once, falling back to
+    per-ticker forecasts if the batch fails. Returns {ticker: forecast dict}.
+    """
+    try:
+        return lstm_predict_many([(ticker, days) for ticker in tickers])
+    except Exception as e:
+        print(f"Error in batched LSTM prediction: {e}")
+    results = {}
+    for ticker in tickers:
+        result = forecast_stock(ticker, 'lstm', days)
+        if result is not None:
+            results[ticker] = result
+    return results
+
+def final_price(result: Optional[Dict], algorithm: str) -> Optional[float]:
+    """The predicted price at the end of the horizon from a forecast dict"""
+    if not result:
+        return None
+    values = result[FORECAST_KEYS[algorithm]]
+    return values[-1] if values else None
+
+def predict_stock_price(ticker: str, algorithm: str, days: int = 30) -> Optional[float]:
+    """
+    Get price prediction for a specific stock using the specified algorithm.
+    Returns the predicted price after 'days' or None if model doesn't exist.
+    """
+    if not check_model_exists(ticker, algorithm):
+        return None
+    return final_price(forecast_stock(ticker, algorithm, days), algorithm)
+
+def collect_forecasts(tickers: List[str], algorithms: List[str], days: int = 30,
+                      timeout: Optional[float] = None) -> Tuple[Dict, Dict]:
+    """
+    Run every (ticker, algorithm) forecast concurrently, each ticker once.
+
+    Materialized forecasts are read inline; LSTM misses go to one batched task
+    on the thread pool, ARIMA per ticker on the thread pool and Prophet per
+    ticker on the process pool. Returns ({(ticker, algo): forecast dict},
+    {ticker: [algos not finished within *timeout* seconds]}).
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    forecasts = {}
+    futures = {}
+    
+    for algo in algorithms:
+        pending = []
+        for ticker in tickers:
+            cached = forecast_cache.get(algo, ticker, days)
+            if cached is not None:
+                forecasts[(ticker, algo)] = cached
+            else:
+                pending.append(ticker)
+        if not pending:
+            continue
+        
+        pool = _executor(EXECUTOR_KINDS[algo])
+        # Thread-pool work keeps the request context (for its profile)
+        wrap = bind if isinstance(pool, ThreadPoolExecutor) else (lambda fn: fn)
+        if algo == 'lstm':
+            futures[pool.submit(wrap(forecast_lstm_batch), pending, days)] = ('lstm', pending)
+        else:
+            for ticker in pending:
+                futures[pool.submit(wrap(forecast_stock), ticker, algo, days)] = (algo, [ticker])
+    
+    remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+    done, not_done = wait(futures, timeout=remaining)
+    
+    for future in done:
+        algo, batch = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error predicting {batch} with {algo}: {e}")
+            continue
+        if algo == 'lstm':
+            for ticker, forecast in result.items():
+                forecasts[(ticker, algo)] = forecast
+        elif result is not None:
+            forecasts[(batch[0], algo)] = result
+    
+    timed_out = {}
+    for future in not_done:
+        future.cancel()
+        algo, batch = futures[future]
+        for ticker in batch:
+            timed_out.setdefault(ticker, []).append(algo)
+    
+    return forecasts, timed_out
+
+def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: int = 30,
+                               timeout: Optional[float] = None, scenarios: int = 0,
+                               path_metrics: bool = False) -> Dict:
     """
     Predict portfolio earnings based on trained models.
     
@@ -79,6 +186,11 @@ def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: i
         portfolio_items: List of portfolio items with ticker, quantity, purchase_price
         method: 'lstm', 'arima', 'prophet', or 'average'
         days: Number of days to predict
+        timeout: Per-request deadline in seconds; forecasts that miss it are
+            reported under 'timed_out' and the result covers the rest
+        scenarios: Number of Monte Carlo paths for the 'risk' section
+            (P&L percentiles, VaR/CVaR, probability of loss); 0 skips it
+        path_metrics: Also simulate intermediate days and report drawdowns
     
     Returns:
         Dict with success status, predictions, and missing models if any
@@ -103,6 +215,12 @@ def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: i
             'required_algorithms': algorithms
         }
     
+    # Each ticker is forecast once per algorithm, concurrently
+    forecasts, timed_out = collect_forecasts(tickers, algorithms, days, timeout)
+
+    def price_for(ticker: str, algo: str) -> Optional[float]:
+        return final_price(forecasts.get((ticker, algo)), algo)
+
     # Calculate predictions for each stock
     predictions = {}
     portfolio_predictions = []
@@ -117,7 +235,7 @@ def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: i
             predicted_prices = []
             
             for algo in algorithms:
-                price = predict_stock_price(ticker, algo, days)
+                price = price_for(ticker, algo)
                 if price is not None:
                     predicted_prices.append(price)
             
@@ -128,7 +246,7 @@ def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: i
                 
         else:
             # Use specific algorithm
-            predicted_price = predict_stock_price(ticker, method, days)
+            predicted_price = price_for(ticker, method)
             if predicted_price is None:
                 continue  # Skip this stock if prediction failed
         
@@ -158,15 +276,27 @@ def predict_portfolio_earnings(portfolio_items: List[Dict], method: str, days: i
     total_profit_loss = total_predicted_value - total_current_value
     total_profit_loss_percent = (total_profit_loss / total_current_value) * 100 if total_current_value > 0 else 0
     
-    return {
+    result = {
         'success': True,
         'method': method,
         'days': days,
         'stock_predictions': portfolio_predictions,
+        'partial': bool(timed_out),
+        'timed_out': timed_out,
         'total_metrics': {
             'current_value': total_current_value,
             'predicted_value': total_predicted_value,
             'profit_loss': total_profit_loss,
             'profit_loss_percent': total_profit_loss_percent
         }
-    } 
\ No newline at end of file
+    }
+    
+    if scenarios:
+        try:
+            result['risk'] = portfolio_scenarios(portfolio_items, forecasts, days,
+                                                 paths=int(scenarios), path_metrics=path_metrics)
+        except Exception as e:
+            print(f"Scenario analysis failed: {e}")
+            result['risk'] = {'success': False, 'error': str(e)}
+    
+    return result
@@ -1,88 +1,235 @@
 # prophet_model_service.py
 import os
-import yfinance as yf
+import copy
+import weakref
+import numpy as np
 import pandas as pd
 from prophet import Prophet
 import joblib
 import json
+from datetime import date, timedelta
+from statistics import NormalDist
+
+from Services.model_registry import registry
+from Services import forecast_cache
+from Services.model_catalog import catalog
+from Services.market_data import NoDataError, store as price_store
+from Services import artifacts
+from Services.instrumentation import span, timed
 
 MODELS_DIR = "models/prophet_models"
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# How prediction intervals are produced: 'sample' (Prophet's simulation),
+# 'analytic' (closed form, see interval_constants) or 'none'
+INTERVAL_MODES = ('sample', 'analytic', 'none')
+DEFAULT_INTERVAL_MODE = os.environ.get('PROPHET_INTERVAL_MODE', 'sample')
+_interval_cache = weakref.WeakKeyDictionary()  # model -> interval_constants()
 
-def train_model(ticker='^GSPC', start='2020-01-01', end='2024-12-31', interval_width=0.95):
-    """Train Prophet model"""
-    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
-    os.makedirs(stock_dir, exist_ok=True)
 
-    # Download data
-    data = yf.download(ticker, start=start, end=end)
+def _report(progress, **info):
+    if progress is not None:
+        progress(info)
+
 
-    # Get close price - handle different data formats
-    if 'Close' in data.columns:
-        close_price = data['Close']
-    else:
-        # Handle MultiIndex or other formats
-        close_price = data.iloc[:, -1]  # Last column is usually close price
+def train_model(ticker='^GSPC', start='2020-01-01', end='2024-12-31', interval_width=0.95,
+                progress=None):
+    """Train Prophet model; *progress*, if given, is called with a dict per phase"""
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    os.makedirs(stock_dir, exist_ok=True)
 
-    # Make sure it's a Series
-    if hasattr(close_price, 'iloc'):
-        close_price = close_price.squeeze()  # Convert to Series if DataFrame
+    # Download data (adjusted closes from the shared price store)
+    _report(progress, phase='download')
+    with span('fetch', 'prophet', ticker):
+        close_price = price_store.get_close(ticker, start, end, adjusted=True)['Close']
 
     # Prepare for Prophet
-    df = pd.DataFrame({
-        'ds': close_price.index,
-        'y': close_price.values
-    }).dropna().reset_index(drop=True)
+    with span('features', 'prophet', ticker):
+        df = pd.DataFrame({
+            'ds': close_price.index,
+            'y': close_price.values
+        }).dropna().reset_index(drop=True)
 
-    # Remove timezone
-    if df['ds'].dt.tz is not None:
-        df['ds'] = df['ds'].dt.tz_localize(None)
+        # Remove timezone
+        if df['ds'].dt.tz is not None:
+            df['ds'] = df['ds'].dt.tz_localize(None)
 
     # Train model
+    _report(progress, phase='fit')
     model = Prophet(interval_width=interval_width)
-    model.fit(df)
+    with span('fit', 'prophet', ticker):
+        model.fit(df)
 
     # Save
+    _report(progress, phase='save')
     joblib.dump(model, os.path.join(stock_dir, "model.pkl"))
     df.to_csv(os.path.join(stock_dir, "data.csv"), index=False)
+    params = {'ticker': ticker, 'start': start, 'end': end, 'interval_width': interval_width}
+    with open(os.path.join(stock_dir, "prophet_params.json"), 'w') as f:
+        json.dump(params, f)
+    # The fitted state lives in model.pkl; drop artifacts older versions wrote
+    artifacts.remove(stock_dir)
 
+    catalog.refresh('prophet', ticker)
     return True
 
 
-def predict_next_days(ticker='^GSPC', days=20):
-    """Predict next days"""
+def warm_start_params(model):
+    """Fitted parameters of *model* in the form Prophet.fit(init=...) expects"""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0][0]
+        else:
+            params[name] = model.params[name].mean()
+    for name in ['delta', 'beta']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0]
+        else:
+            params[name] = model.params[name].mean(axis=0)
+    return params
+
+
+def update_model(ticker='^GSPC', end=None, progress=None):
+    """
+    Append the bars after the stored history up to *end* (default: today) and
+    refit warm-started from the saved parameters, which converges in a
+    fraction of a cold fit. Returns True on success (also when nothing is new).
+    """
     stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
+    params_path = os.path.join(stock_dir, "prophet_params.json")
+    old_model, df = load_state(ticker, full=True)
+    end = end or (date.today() + timedelta(days=1)).isoformat()
+    last = df['ds'].iloc[-1]
+
+    _report(progress, phase='download')
+    start = (last + pd.Timedelta(days=1)).date().isoformat()
+    if start >= end:
+        return True
+    try:
+        with span('fetch', 'prophet', ticker):
+            close_price = price_store.get_close(ticker, start, end, adjusted=True)['Close']
+    except NoDataError:
+        return True  # no new bars yet; failed fetches propagate
+    new = pd.DataFrame({'ds': close_price.index, 'y': close_price.values}).dropna()
+    if new.empty:
+        return True
+    df = pd.concat([df, new], ignore_index=True)
+
+    _report(progress, phase='fit')
+    model = Prophet(interval_width=old_model.interval_width)
+    with span('fit', 'prophet', ticker):
+        model.fit(df, init=warm_start_params(old_model))
+
+    _report(progress, phase='save')
+    joblib.dump(model, os.path.join(stock_dir, "model.pkl"))
+    new.to_csv(os.path.join(stock_dir, "data.csv"), mode='a', header=False, index=False)
+    params = {'ticker': ticker, 'interval_width': old_model.interval_width}
+    if os.path.exists(params_path):
+        params = json.load(open(params_path))
+    params['end'] = end
+    with open(params_path, 'w') as f:
+        json.dump(params, f)
+    artifacts.remove(stock_dir)
+    catalog.refresh('prophet', ticker)
+    return True
 
-    # Load model
-    model = joblib.load(os.path.join(stock_dir, "model.pkl"))
 
-    # Create future dates
-    future = model.make_future_dataframe(periods=days)
+def interval_constants(model):
+    """
+    Closed-form interval inputs for a MAP-fitted linear/additive model, cached
+    per model object: (changepoint rate, Laplace scale of the deltas, sigma_obs,
+    z for interval_width). Prophet's trend simulation adds changepoints at the
+    historical rate S with Laplace(0, lambda) slopes, so at scaled time t > 1
+    the trend variance is 2 * S * lambda^2 * (t - 1)^3 / 3; observation noise
+    adds sigma_obs^2. Returns None when the closed form does not apply.
+    """
+    if model in _interval_cache:
+        return _interval_cache[model]
+    constants = None
+    if model.mcmc_samples == 0 and model.growth == 'linear' and model.seasonality_mode == 'additive':
+        deltas = np.asarray(model.params['delta'][0])
+        constants = (
+            len(model.changepoints_t),
+            float(np.mean(np.abs(deltas))) + 1e-8,
+            float(np.ravel(model.params['sigma_obs'])[0]),
+            NormalDist().inv_cdf((1 + model.interval_width) / 2),
+        )
+    _interval_cache[model] = constants
+    return constants
+
+
+def _analytic_interval(model, ds, yhat):
+    rate, scale, sigma_obs, z = interval_constants(model)
+    t = ((ds - model.start) / model.t_scale).to_numpy(dtype=float)
+    horizon = np.maximum(t - 1.0, 0.0)
+    std = np.sqrt(sigma_obs ** 2 + 2.0 * rate * scale ** 2 * horizon ** 3 / 3.0) * model.y_scale
+    return yhat - z * std, yhat + z * std
+
+
+def predict_next_days(ticker='^GSPC', days=20, interval=None, uncertainty_samples=None):
+    """
+    Predict next days. Only the *days* future rows are evaluated (no history
+    rows), so the cost grows with the horizon, not with the training length.
+
+    *interval* is one of INTERVAL_MODES (default PROPHET_INTERVAL_MODE);
+    *uncertainty_samples* overrides the model's sample count in 'sample' mode.
+    """
+    interval = interval or DEFAULT_INTERVAL_MODE
+    if interval not in INTERVAL_MODES:
+        raise ValueError(f"interval must be one of {', '.join(INTERVAL_MODES)}")
+    stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
 
-    # Predict
-    forecast = model.predict(future)
+    # Load model (cached across calls)
+    model, _ = registry.get('prophet', ticker, stock_dir, lambda: load_state(ticker))
 
-    # Get last 'days' predictions
-    future_forecast = forecast.tail(days)
+    # Future dates only
+    future = model.make_future_dataframe(periods=days, include_history=False)
 
-    return {
-        "dates": future_forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
-        "forecast": future_forecast['yhat'].tolist(),
-        "forecast_upper": future_forecast['yhat_upper'].tolist(),
-        "forecast_lower": future_forecast['yhat_lower'].tolist()
-    }
+    # The cached model is shared, so per-call settings go on a shallow copy
+    if interval == 'analytic' and interval_constants(model) is None:
+        interval = 'sample'  # MCMC, logistic growth or multiplicative seasonality
+    samples = 0 if interval != 'sample' else uncertainty_samples
+    predictor = model
+    if samples is not None and samples != model.uncertainty_samples:
+        predictor = copy.copy(model)
+        predictor.uncertainty_samples = int(samples)
 
+    with span('forecast', 'prophet', ticker):
+        forecast = predictor.predict(future)
 
-def load_state(ticker):
-    """Load model and data"""
+    result = {
+        "dates": forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
+        "forecast": forecast['yhat'].tolist(),
+    }
+    if interval == 'analytic':
+        lower, upper = _analytic_interval(model, forecast['ds'], forecast['yhat'].to_numpy())
+        result["forecast_upper"], result["forecast_lower"] = upper.tolist(), lower.tolist()
+    elif 'yhat_upper' in forecast:
+        result["forecast_upper"] = forecast['yhat_upper'].tolist()
+        result["forecast_lower"] = forecast['yhat_lower'].tolist()
+    return result
+
+
+@timed('load_state', 'prophet')
+def load_state(ticker, full=False):
+    """Load model and data (data only with *full*; forecasting needs only model.pkl)"""
     stock_dir = os.path.join(MODELS_DIR, ticker.replace("^", "").replace("/", "_"))
     model = joblib.load(os.path.join(stock_dir, "model.pkl"))
+    if not full:
+        return model, None
     df = pd.read_csv(os.path.join(stock_dir, "data.csv"), parse_dates=['ds'])
     return model, df
 
 
+def get_cached_forecast(ticker='^GSPC', days=20):
+    """Materialized forecast sliced to *days*, or None if missing or stale"""
+    return forecast_cache.get('prophet', ticker, days)
+
+
 def list_trained_models():
     """List trained models"""
-    return [name for name in os.listdir(MODELS_DIR)
-            if os.path.isdir(os.path.join(MODELS_DIR, name))]
\ No newline at end of file
+    return catalog.tickers('prophet')
+
+
+forecast_cache.register('prophet', MODELS_DIR, predict_next_days)
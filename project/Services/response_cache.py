@@ -0,0 +1,158 @@
+# Services/response_cache.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from Services.model_catalog import catalog, normalize_ticker
+
+MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_ENTRIES', 2048))
+# Authenticated responses: browsers may keep them but must revalidate (cheap 304s)
+CACHE_CONTROL = 'private, no-cache'
+
+
+class ResponseCache:
+    """
+    Serialized JSON bodies of GET responses keyed by (route key, validator),
+    where the validator is the model version (predictions) or the catalog
+    generation (listings). Entries are dropped when the catalog reports
+    that their model changed; the LRU bound catches the rest.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (version, owner, body, etag, last_modified)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, owner, body: bytes, etag: str, last_modified):
+        entry = (version, owner, body, etag, last_modified)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, algorithm: str = None, ticker: str = None):
+        """
+        Drop the entries of one model and every listing; with no arguments
+        drop the entries whose model version is no longer current.
+        """
+        with self._lock:
+            stale = []
+            for key, (version, owner, *_) in self._entries.items():
+                if owner is None:  # listings follow every catalog change
+                    stale.append(key)
+                elif algorithm is not None:
+                    if owner == (algorithm, ticker):
+                        stale.append(key)
+                else:
+                    entry = catalog.get(*owner)
+                    if entry is None or entry['version'] != version:
+                        stale.append(key)
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'not_modified': self.not_modified, 'invalidations': self.invalidations}
+
+
+cache = ResponseCache()
+catalog.add_listener(cache.invalidate)
+
+
+# ------------------------------------------------------------------
+# Validators
+# ------------------------------------------------------------------
+def model_validator(algorithm: str, ticker: str):
+    """(version, last modified, owner) of a trained model, or None when it is not in the catalog."""
+    entry = catalog.get(algorithm, ticker)
+    if entry is None or not entry['complete']:
+        return None
+    trained = datetime.fromisoformat(entry['trained_at']).replace(tzinfo=timezone.utc) \
+        if entry['trained_at'] else None
+    return entry['version'], trained, (algorithm, normalize_ticker(ticker))
+
+
+def listing_validator(algorithm: str = None):
+    """(catalog generation, newest model time, None) for a model listing."""
+    times = [e['trained_at'] for e in catalog.entries(algorithm) if e['trained_at']]
+    newest = datetime.fromisoformat(max(times)).replace(tzinfo=timezone.utc) if times else None
+    return f'g{catalog.generation}', newest, None
+
+
+# ------------------------------------------------------------------
+# Flask glue
+# ------------------------------------------------------------------
+def _not_modified(request, etag: str, last_modified) -> bool:
+    if request.headers.get('If-None-Match'):
+        tags = [t.strip() for t in request.headers['If-None-Match'].split(',')]
+        return '*' in tags or etag in tags
+    since = request.headers.get('If-Modified-Since')
+    if since and last_modified is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(key: tuple, validator, compute):
+    """
+    JSON response for GET *key*: served from the cache (or as 304 Not
+    Modified) while *validator* (see model_validator/listing_validator) is
+    unchanged, otherwise built from *compute()*. Only {'success': True, ...}
+    results are cached; without a validator the result is never cached.
+    """
+    from flask import Response, current_app, request, jsonify
+
+    if validator is None:
+        return jsonify(compute())
+    version, last_modified, owner = validator
+
+    entry = cache.get(key, version)
+    if entry is None:
+        result = compute()
+        if not result.get('success'):
+            return jsonify(result)
+        body = current_app.json.dumps(result).encode('utf-8')
+        digest = hashlib.sha1(repr((key, version)).encode('utf-8')).hexdigest()[:20]
+        entry = cache.put(key, version, owner, body, f'W/"{digest}"', last_modified)
+    _, _, body, etag, last_modified = entry
+
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified.replace(microsecond=0), usegmt=True)
+    if _not_modified(request, etag, last_modified):
+        cache.count_not_modified()
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
@@ -0,0 +1,216 @@
+# Services/scenario_engine.py
+
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from Services.market_data import store as price_store
+
+Z_95 = 1.959963984540054  # two-sided 95% normal quantile (ARIMA alpha=0.05, Prophet default)
+HISTORY_DAYS = 504        # ~2 years of daily returns for the correlation estimate
+CHUNK_BYTES = 64 * 1024 * 1024
+MAX_PATHS = int(os.environ.get('SCENARIO_MAX_PATHS', 200000))  # per request
+
+
+# ------------------------------------------------------------------
+# 1. Inputs: stored histories and forecast uncertainty
+# ------------------------------------------------------------------
+def load_history(ticker: str) -> pd.Series:
+    """
+    Recent closes for *ticker* from a stored model history (Prophet/ARIMA
+    data.csv hold raw prices), falling back to the shared price store.
+    """
+    name = ticker.replace('^', '').replace('/', '_')
+    prophet_csv = os.path.join('models/prophet_models', name, 'data.csv')
+    if os.path.exists(prophet_csv):
+        df = pd.read_csv(prophet_csv, parse_dates=['ds'])
+        return pd.Series(df['y'].values, index=df['ds']).tail(HISTORY_DAYS + 1)
+
+    arima_csv = os.path.join('models/arima_models', name, 'data.csv')
+    if os.path.exists(arima_csv):
+        df = pd.read_csv(arima_csv, index_col=0)
+        df = df[pd.to_datetime(df.index, errors='coerce').notna()]  # skip extra header rows
+        return pd.Series(df.iloc[:, 0].astype(float).values,
+                         index=pd.to_datetime(df.index)).tail(HISTORY_DAYS + 1)
+
+    end = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    start = end - pd.Timedelta(days=int(HISTORY_DAYS * 1.5))
+    close = price_store.get_close(ticker, start.date().isoformat(), end.date().isoformat(), adjusted=True)
+    return close['Close'].tail(HISTORY_DAYS + 1)
+
+
+def forecast_moments(results: Dict[str, dict]) -> tuple:
+    """
+    Terminal mean price and standard deviation from one ticker's model results
+    ({algorithm: forecast dict}). The mean averages the algorithms like
+    predict_portfolio_earnings; the std comes from the ARIMA confidence band
+    and/or the Prophet uncertainty interval, or None if no model provides one.
+    """
+    means, sigmas = [], []
+    for algo, result in results.items():
+        if algo == 'arima':
+            means.append(result['forecast_mean'][-1])
+            sigmas.append((result['forecast_ci_upper'][-1] - result['forecast_ci_lower'][-1]) / (2 * Z_95))
+        else:
+            means.append(result['forecast'][-1])
+            if 'forecast_upper' in result:
+                sigmas.append((result['forecast_upper'][-1] - result['forecast_lower'][-1]) / (2 * Z_95))
+    sigma = float(np.mean(sigmas)) if sigmas else None
+    return float(np.mean(means)), sigma
+
+
+def _correlation_factor(histories: List[pd.Series]) -> tuple:
+    """
+    Cholesky factor of the return correlation matrix on common dates, and
+    each ticker's historical daily log-return volatility.
+    """
+    returns = pd.concat([np.log(h).diff() for h in histories], axis=1, join='inner').dropna()
+    values = returns.to_numpy()
+    vol = values.std(axis=0, ddof=1) if len(values) > 1 else np.full(len(histories), 0.01)
+    n = len(histories)
+    if len(values) > n:
+        corr = np.corrcoef(values, rowvar=False)
+        corr = np.nan_to_num(corr, nan=0.0)
+        np.fill_diagonal(corr, 1.0)
+    else:
+        corr = np.eye(n)
+    # Clip to the nearest positive semi-definite matrix before factorizing
+    eigval, eigvec = np.linalg.eigh(corr)
+    corr = (eigvec * np.maximum(eigval, 1e-10)) @ eigvec.T
+    d = np.sqrt(np.diag(corr))
+    corr = corr / np.outer(d, d)
+    return np.linalg.cholesky(corr + 1e-12 * np.eye(n)), np.nan_to_num(vol, nan=0.01)
+
+
+# ------------------------------------------------------------------
+# 2. Simulation
+# ------------------------------------------------------------------
+def simulate(spot: np.ndarray, quantity: np.ndarray, cost: float, target: np.ndarray,
+             daily_vol: np.ndarray, chol: np.ndarray, days: int, paths: int = 10000,
+             path_metrics: bool = False, steps: Optional[int] = None,
+             seed: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES) -> dict:
+    """
+    Draw correlated log-normal price paths and summarize portfolio P&L.
+
+    Drifts are set so the expected terminal price of each ticker equals
+    *target*. Without *path_metrics* only the terminal distribution is drawn
+    (a sum of i.i.d. correlated daily normals is one correlated normal scaled
+    by sqrt(days)), in chunks of at most *chunk_bytes*. With it, (paths,
+    steps, tickers) paths are generated in such chunks and the max drawdown
+    is reported too;
+    *steps* defaults to min(days, 20) grid points, and steps=days gives daily
+    paths. The terminal distribution is exact for any grid.
+    """
+    rng = np.random.default_rng(seed)
+    spot = np.asarray(spot, dtype=np.float64)
+    quantity = np.asarray(quantity, dtype=np.float64)
+    daily_vol = np.asarray(daily_vol, dtype=np.float64)
+    n = len(spot)
+    days = max(int(days), 1)
+    drift = (np.log(np.asarray(target) / spot) - 0.5 * daily_vol ** 2 * days) / days
+    chol_t = chol.T.astype(np.float32)
+
+    pnl = np.empty(paths)
+    drawdown = np.empty(paths) if path_metrics else None
+
+    if not path_metrics:
+        # float32 normals plus the float64 log-prices derived from them
+        chunk = max(1, chunk_bytes // (n * 12))
+        for lo in range(0, paths, chunk):
+            hi = min(paths, lo + chunk)
+            z = rng.standard_normal((hi - lo, n), dtype=np.float32) @ chol_t
+            log_terminal = drift * days + daily_vol * np.sqrt(days) * z
+            pnl[lo:hi] = (spot * np.exp(log_terminal)) @ quantity - cost
+    else:
+        steps = min(int(steps or min(days, 20)), days)
+        dt = days / steps
+        scale = (daily_vol * np.sqrt(dt)).astype(np.float32)
+        step_drift = (drift * dt).astype(np.float32)
+        chunk = max(1, chunk_bytes // (steps * n * 4))
+        for lo in range(0, paths, chunk):
+            hi = min(paths, lo + chunk)
+            z = rng.standard_normal(((hi - lo) * steps, n), dtype=np.float32) @ chol_t
+            z = z.reshape(hi - lo, steps, n)
+            z *= scale
+            z += step_drift
+            np.cumsum(z, axis=1, out=z)
+            np.exp(z, out=z)
+            values = z @ (spot * quantity).astype(np.float32)  # portfolio value, (chunk, steps)
+            pnl[lo:hi] = values[:, -1] - cost
+            peak = np.maximum.accumulate(np.concatenate(
+                [np.full((hi - lo, 1), spot @ quantity, dtype=np.float32), values], axis=1), axis=1)[:, 1:]
+            drawdown[lo:hi] = ((peak - values) / peak).max(axis=1)
+
+    return summarize(pnl, cost, drawdown)
+
+
+def summarize(pnl: np.ndarray, cost: float, drawdown: Optional[np.ndarray] = None) -> dict:
+    """Percentiles, VaR/CVaR (as positive losses) and probability of loss."""
+    pct = np.percentile(pnl, [1, 5, 25, 50, 75, 95, 99])
+    result = {
+        'paths': int(len(pnl)),
+        'expected_profit_loss': float(pnl.mean()),
+        'profit_loss_percentiles': {str(p): float(v) for p, v in zip([1, 5, 25, 50, 75, 95, 99], pct)},
+        'probability_of_loss': float((pnl < 0).mean()),
+    }
+    for level, q in (('95', pct[1]), ('99', pct[0])):
+        tail = pnl[pnl <= q]
+        result[f'var_{level}'] = float(-q)
+        result[f'cvar_{level}'] = float(-tail.mean()) if len(tail) else float(-q)
+    if cost > 0:
+        result['expected_profit_loss_percent'] = result['expected_profit_loss'] / cost * 100
+    if drawdown is not None:
+        result['max_drawdown_percentiles'] = {
+            str(p): float(v) for p, v in zip([50, 95, 99], np.percentile(drawdown, [50, 95, 99]))}
+    return result
+
+
+# ------------------------------------------------------------------
+# 3. Portfolio entry point
+# ------------------------------------------------------------------
+def portfolio_scenarios(portfolio_items: List[Dict], forecasts: Dict, days: int,
+                        paths: int = 10000, path_metrics: bool = False,
+                        steps: Optional[int] = None, seed: Optional[int] = None) -> dict:
+    """
+    Scenario analysis for a portfolio given the model forecasts collected by
+    the predictor ({(ticker, algorithm): forecast dict}). Positions without
+    any forecast are left out and listed under 'excluded'.
+    """
+    by_ticker = {}
+    for (ticker, algo), result in forecasts.items():
+        by_ticker.setdefault(ticker, {})[algo] = result
+
+    quantity, cost = {}, 0.0
+    excluded = set()
+    for item in portfolio_items:
+        if item['ticker'] not in by_ticker:
+            excluded.add(item['ticker'])
+            continue
+        quantity[item['ticker']] = quantity.get(item['ticker'], 0.0) + item['quantity']
+        cost += item['quantity'] * item['purchase_price']
+
+    tickers = sorted(quantity)
+    if not tickers:
+        return {'success': False, 'error': 'No forecasts available for scenario analysis'}
+
+    histories = [load_history(t) for t in tickers]
+    chol, hist_vol = _correlation_factor(histories)
+    spot = np.array([float(h.iloc[-1]) for h in histories])
+
+    target = np.empty(len(tickers))
+    daily_vol = np.empty(len(tickers))
+    for i, ticker in enumerate(tickers):
+        mean, sigma = forecast_moments(by_ticker[ticker])
+        target[i] = mean
+        # Model band -> log-space terminal std -> per-day vol; else historical vol
+        daily_vol[i] = (sigma / mean) / np.sqrt(max(days, 1)) if sigma and mean > 0 else hist_vol[i]
+
+    result = simulate(spot, np.array([quantity[t] for t in tickers]), cost, target,
+                      daily_vol, chol, days, paths=paths, path_metrics=path_metrics,
+                      steps=steps, seed=seed)
+    result['success'] = True
+    result['tickers'] = tickers
+    result['excluded'] = sorted(excluded)
+    return result
@@ -0,0 +1,126 @@
+# Services/service_loader.py
+
+import os
+import time
+import socket
+import importlib
+import threading
+
+from Services import forecast_cache
+from Services.instrumentation import span
+from Services.model_catalog import ALGORITHMS
+
+# Each model service pulls in its ML stack (TensorFlow, statsmodels, prophet)
+# on import, so they are imported on first use instead of at server start.
+SERVICES = {
+    'lstm': 'Services.lstm_model_service',
+    'arima': 'Services.arima_model_service',
+    'prophet': 'Services.prophet_model_service',
+}
+
+# Forecast parameters each service registers with forecast_cache on import
+FORECAST_DEFAULTS = {'lstm': {'sequence_length': 60}, 'arima': {}, 'prophet': {}}
+
+_modules = {}
+_timings = {}  # label -> seconds
+_lock = threading.Lock()
+_router = None  # router(algorithm, name, args, kwargs) when model workers serve the calls
+
+
+def record(label: str, seconds: float):
+    """Add a startup stage to the import-time report."""
+    _timings[label] = seconds
+
+
+def load(algorithm: str):
+    """Import (once) and return the service module of *algorithm*."""
+    module = _modules.get(algorithm)
+    if module is not None:
+        return module
+    with _lock:
+        if algorithm not in _modules:
+            started = time.perf_counter()
+            _modules[algorithm] = importlib.import_module(SERVICES[algorithm])
+            record(f'service:{algorithm}', time.perf_counter() - started)
+        return _modules[algorithm]
+
+
+def set_router(router):
+    """Send lazy calls to *router* instead of the local service (None restores local calls)."""
+    global _router
+    _router = router
+
+
+def is_routed() -> bool:
+    return _router is not None
+
+
+def lazy(algorithm: str, name: str, routed: bool = True):
+    """
+    A stand-in for *name* of the *algorithm* service that imports it on the
+    first call, or forwards the call to the model workers when routed.
+    With *routed* False the call always runs in this process.
+    """
+    def call(*args, **kwargs):
+        if routed and _router is not None:
+            ticker = kwargs.get('ticker', args[0] if args and isinstance(args[0], str) else None)
+            with span(f'worker:{name}', algorithm, ticker):
+                return _router(algorithm, name, args, kwargs)
+        return getattr(load(algorithm), name)(*args, **kwargs)
+    call.__name__ = name
+    call.__qualname__ = f'{algorithm}.{name}'
+    return call
+
+
+def is_loaded(algorithm: str) -> bool:
+    return algorithm in _modules
+
+
+def report() -> dict:
+    return {
+        'loaded': sorted(_modules),
+        'timings': {label: round(seconds, 3) for label, seconds in _timings.items()},
+    }
+
+
+def print_report():
+    print("Import times:")
+    for label, seconds in _timings.items():
+        print(f"  {label:<20} {seconds:7.3f}s")
+
+
+def _wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def prewarm(algorithms, port: int = None):
+    """
+    Import the given services on a daemon thread, after the server accepts
+    connections on *port* when one is given, so start-up is not delayed.
+    """
+    def run():
+        if port is not None:
+            _wait_for_port(port)
+        for algorithm in algorithms:
+            try:
+                load(algorithm)
+            except Exception as e:
+                print(f"Prewarming {algorithm} failed: {e}")
+        print_report()
+
+    thread = threading.Thread(target=run, name='service-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+# Stored forecasts can be read (and refreshed) before a service is imported
+for _algorithm in SERVICES:
+    forecast_cache.register(_algorithm, ALGORITHMS[_algorithm]['dir'],
+                            lazy(_algorithm, 'predict_next_days'), **FORECAST_DEFAULTS[_algorithm])
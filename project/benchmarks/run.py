@@ -0,0 +1,312 @@
+# benchmarks/run.py
+"""
+Benchmarks of the training and prediction hot paths on synthetic prices.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --suites features,portfolio --positions 1,10,100 --length 1500
+    python -m benchmarks.run --compare benchmarks/results/<earlier>.json
+
+Run from the project directory. Everything happens in a scratch working
+directory (models, price store) with prices from SyntheticProvider, so no
+network access is needed and trained models are not touched. Suites whose
+ML library is not installed are reported as skipped. Results are written as
+JSON to --out (default benchmarks/results/) for comparison across releases.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+SUITES = ('features', 'arima', 'prophet', 'lstm', 'predict', 'portfolio')
+END = '2025-01-01'
+EXOG = ['GLD', 'QQQ', '^TNX']
+
+
+# ------------------------------------------------------------------
+# 1. Measuring
+# ------------------------------------------------------------------
+def measure(fn, repeat: int = 3, warmup: int = 0) -> dict:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return {'runs': repeat, 'min_s': round(min(times), 6), 'median_s': round(statistics.median(times), 6),
+            'mean_s': round(statistics.mean(times), 6), 'max_s': round(max(times), 6)}
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def run(self, name: str, fn, repeat: int = 3, warmup: int = 0, **params):
+        """Measure *fn*; failures (and missing ML libraries) are recorded instead of raised."""
+        entry = {'name': name, 'params': params}
+        try:
+            entry.update(measure(fn, repeat, warmup))
+        except ImportError as e:
+            entry['skipped'] = f'{type(e).__name__}: {e}'
+        except Exception as e:
+            entry['error'] = f'{type(e).__name__}: {e}'
+        self.results.append(entry)
+        status = entry.get('skipped') or entry.get('error') or f"median {entry['median_s'] * 1000:.2f} ms"
+        print(f"  {name:<40} {status}", flush=True)
+        return entry
+
+    def ok(self, name: str) -> bool:
+        return any(r['name'] == name and 'median_s' in r for r in self.results)
+
+
+def start_for(length: int) -> str:
+    import pandas as pd
+    return (pd.Timestamp(END) - pd.tseries.offsets.BDay(length)).date().isoformat()
+
+
+# ------------------------------------------------------------------
+# 2. Suites
+# ------------------------------------------------------------------
+def bench_features(rec: Recorder, args):
+    from Services.market_data import store
+    from Services.lstm_features import build_features, make_windows
+
+    close = store.get_close('SYN0000', start_for(args.length), END, adjusted=True)['Close']
+    rec.run('lstm.build_features', lambda: build_features(close), repeat=args.repeat, rows=len(close))
+    scaled = build_features(close).to_numpy()
+    rec.run('lstm.make_windows', lambda: make_windows(scaled, 60), repeat=args.repeat,
+            rows=len(scaled), sequence_length=60)
+
+
+def bench_training(rec: Recorder, args, algorithm: str, tickers: list):
+    """Train the base models; the first fit is the benchmark, the rest are setup."""
+    from Services import service_loader
+
+    start = start_for(args.length)
+    params = {'lstm': {'sequence_length': 60}, 'arima': {'exog_tickers': EXOG}, 'prophet': {}}[algorithm]
+    name = {'lstm': 'lstm.train_model', 'arima': 'arima.train_model (grid search + fit)',
+            'prophet': 'prophet.train_model'}[algorithm]
+
+    def train(ticker, **extra):
+        # Imported here, so a missing ML library is recorded as skipped
+        service_loader.load(algorithm).train_model(ticker=ticker, start=start, end=END, **params, **extra)
+
+    rec.run(name, lambda: train(tickers[0]), repeat=1, rows=args.length)
+    if algorithm == 'arima' and rec.ok(name) and (os.cpu_count() or 1) > 1:
+        rec.run('arima.train_model (parallel grid search)',
+                lambda: train(tickers[0], workers=os.cpu_count()),
+                repeat=1, rows=args.length, workers=os.cpu_count())
+    if rec.ok(name):
+        for ticker in tickers[1:]:
+            train(ticker)
+    return rec.ok(name)
+
+
+def bench_predict(rec: Recorder, args, algorithms: list, ticker: str):
+    from Services import service_loader
+    from Services.model_registry import registry
+
+    for algorithm in algorithms:
+        service = service_loader.load(algorithm)
+
+        def cold():
+            registry.clear()
+            service.predict_next_days(ticker=ticker, days=30)
+
+        rec.run(f'{algorithm}.predict_next_days (cold)', cold, repeat=args.repeat, days=30)
+        rec.run(f'{algorithm}.predict_next_days (warm)',
+                lambda: service.predict_next_days(ticker=ticker, days=30),
+                repeat=args.repeat, warmup=1, days=30)
+        if algorithm == 'prophet':
+            rec.run('prophet.predict_next_days (analytic interval)',
+                    lambda: service.predict_next_days(ticker=ticker, days=30, interval='analytic'),
+                    repeat=args.repeat, warmup=1, days=30)
+
+
+def clone_models(algorithms: list, bases: list, names: list):
+    """Point *names* at the base models (symlinks, copies where links are unavailable)."""
+    from Services.model_catalog import ALGORITHMS, catalog, normalize_ticker
+
+    for algorithm in algorithms:
+        models_dir = ALGORITHMS[algorithm]['dir']
+        for index, name in enumerate(names):
+            target = os.path.join(models_dir, normalize_ticker(name))
+            source = os.path.abspath(os.path.join(models_dir, normalize_ticker(bases[index % len(bases)])))
+            if os.path.exists(target):
+                continue
+            try:
+                os.symlink(source, target, target_is_directory=True)
+            except OSError:
+                shutil.copytree(source, target)
+    catalog.build()
+
+
+def bench_portfolio(rec: Recorder, args, algorithms: list, bases: list):
+    from Services import forecast_cache
+    from Services.model_registry import registry
+    from Services.portfolio_prediction_service import predict_portfolio_earnings
+    from benchmarks.synthetic import tickers as synthetic_tickers
+
+    positions = max(args.positions)
+    names = synthetic_tickers(positions, prefix='POS')
+    clone_models(algorithms, bases, names)
+    methods = algorithms + (['average'] if len(algorithms) > 1 else [])
+
+    for count in args.positions:
+        items = [{'ticker': name, 'quantity': 10, 'purchase_price': 100.0} for name in names[:count]]
+        for method in methods:
+            def cold():
+                registry.clear()
+                result = predict_portfolio_earnings(items, method, days=30)
+                if not result.get('success'):
+                    raise RuntimeError(result.get('error'))
+
+            rec.run(f'portfolio.{method} (uncached)', cold, repeat=1 if count >= 100 else args.repeat,
+                    positions=count)
+            rec.run(f'portfolio.{method} (models loaded)',
+                    lambda: predict_portfolio_earnings(items, method, days=30),
+                    repeat=args.repeat, warmup=1, positions=count)
+
+    # Clones share the base directories, so materializing the bases covers them
+    for algorithm in algorithms:
+        for base in bases:
+            forecast_cache.materialize(algorithm, base)
+    for count in args.positions:
+        items = [{'ticker': name, 'quantity': 10, 'purchase_price': 100.0} for name in names[:count]]
+        for method in methods:
+            rec.run(f'portfolio.{method} (materialized)',
+                    lambda: predict_portfolio_earnings(items, method, days=30),
+                    repeat=args.repeat, warmup=1, positions=count)
+
+
+# ------------------------------------------------------------------
+# 3. Run & report
+# ------------------------------------------------------------------
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    versions = {}
+    for module in ('numpy', 'pandas', 'sklearn', 'statsmodels', 'prophet', 'tensorflow'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {'commit': commit or None, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'versions': versions}
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix='algotrade-bench-')
+    os.environ['MARKET_DATA_DIR'] = os.path.join(workdir, 'market_data')
+    os.environ['FORECAST_REFRESH_SECONDS'] = '0'
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # model services keep their models relative to the working directory
+    started_at = datetime.utcnow()
+    rec = Recorder()
+    try:
+        from Services.market_data import store
+        from Services.market_fetcher import TokenBucket
+        from benchmarks.synthetic import SyntheticProvider, tickers as synthetic_tickers
+
+        store.set_provider(SyntheticProvider(seed=args.seed), TokenBucket(rate=0))
+        bases = synthetic_tickers(args.tickers)
+
+        print(f"Benchmarks in {workdir} ({args.length} rows, {args.tickers} base tickers)")
+        if 'features' in args.suites:
+            bench_features(rec, args)
+
+        trained = []
+        for algorithm in ('arima', 'prophet', 'lstm'):
+            if algorithm in args.suites or (algorithm in args.algorithms and
+                                            {'predict', 'portfolio'} & set(args.suites)):
+                if bench_training(rec, args, algorithm, bases):
+                    trained.append(algorithm)
+        trained = [a for a in args.algorithms if a in trained]
+
+        if 'predict' in args.suites and trained:
+            bench_predict(rec, args, trained, bases[0])
+        if 'portfolio' in args.suites and trained:
+            bench_portfolio(rec, args, trained, bases)
+    finally:
+        os.chdir(previous_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'started_at': started_at.isoformat(),
+        'environment': environment(),
+        'config': {'length': args.length, 'tickers': args.tickers, 'positions': args.positions,
+                   'repeat': args.repeat, 'seed': args.seed, 'suites': args.suites,
+                   'algorithms': args.algorithms},
+        'results': rec.results,
+    }
+
+
+def write(report: dict, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = report['started_at'][:19].replace(':', '')
+    path = os.path.join(out_dir, f"bench_{stamp}_{report['environment']['commit'] or 'nogit'}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(report: dict, baseline_path: str):
+    """Print median time ratios against an earlier results file (> 1 is slower)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r['name'], json.dumps(r['params'], sort_keys=True))
+    before = {key(r): r for r in baseline['results'] if 'median_s' in r}
+    print(f"Compared with {baseline_path} (commit {baseline['environment'].get('commit')}):")
+    for result in report['results']:
+        old = before.get(key(result))
+        if old is None or 'median_s' not in result or not old['median_s']:
+            continue
+        ratio = result['median_s'] / old['median_s']
+        flag = '  <-- slower' if ratio > 1.2 else ''
+        print(f"  {result['name']:<40} {result['params']}  {ratio:5.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark training and prediction on synthetic data.')
+    parser.add_argument('--suites', default=','.join(SUITES), help=f'comma-separated, from {", ".join(SUITES)}')
+    parser.add_argument('--algorithms', default='lstm,arima,prophet',
+                        help='algorithms for the predict/portfolio suites')
+    parser.add_argument('--length', type=int, default=1500, help='business days of history per ticker')
+    parser.add_argument('--tickers', type=int, default=3, help='base models trained per algorithm')
+    parser.add_argument('--positions', default='1,10,100,1000', help='portfolio sizes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=RESULTS_DIR)
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directory')
+    args = parser.parse_args(argv)
+    args.suites = [s.strip() for s in args.suites.split(',') if s.strip()]
+    args.algorithms = [a.strip() for a in args.algorithms.split(',') if a.strip()]
+    args.positions = [int(p) for p in args.positions.split(',') if p.strip()]
+    unknown = [s for s in args.suites if s not in SUITES]
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(unknown)}")
+
+    report = run(args)
+    path = write(report, args.out)
+    print(f"Results: {path}")
+    if args.compare:
+        compare(report, args.compare)
+    return 0 if not any('error' in r for r in report['results']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
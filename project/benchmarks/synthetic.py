@@ -0,0 +1,47 @@
+# benchmarks/synthetic.py
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from Services.market_data import PriceProvider, _normalize_frame
+
+# Every series starts here, so any [start, end) request sees the same prices
+ORIGIN = pd.Timestamp('1990-01-01')
+
+
+class SyntheticProvider(PriceProvider):
+    """
+    Deterministic geometric random walks on business days, one per ticker
+    (seeded from the ticker name and *seed*), with yearly drift *mu* and
+    volatility *sigma* drawn per ticker. No network access.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self._cache = {}  # ticker -> Close series from ORIGIN to the furthest end asked for
+
+    def _series(self, ticker: str, end: pd.Timestamp) -> pd.Series:
+        cached = self._cache.get(ticker)
+        if cached is not None and cached.index[-1] >= end - pd.tseries.offsets.BDay():
+            return cached
+        dates = pd.bdate_range(ORIGIN, max(end, pd.Timestamp('2026-01-01')))
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode('utf-8'))])
+        # Parameters first, then the walk: a longer walk only appends days
+        mu, sigma, base = rng.uniform(0.02, 0.12), rng.uniform(0.12, 0.45), rng.uniform(20, 400)
+        daily = rng.normal((mu - sigma ** 2 / 2) / 252, sigma / np.sqrt(252), size=len(dates))
+        close = base * np.exp(np.cumsum(daily))
+        series = pd.Series(close, index=dates, name='Close')
+        self._cache[ticker] = series
+        return series
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        series = self._series(ticker, end)
+        window = series[(series.index >= start) & (series.index < end)]
+        return _normalize_frame(pd.DataFrame({'Close': window, 'Adj Close': window}))
+
+
+def tickers(count: int, prefix: str = 'SYN') -> list[str]:
+    return [f'{prefix}{index:04d}' for index in range(count)]
@@ -32,24 +32,26 @@ class User(db.Model):
 
 class Portfolio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship to portfolio items
     items = db.relationship('PortfolioItem', backref='portfolio', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_items=True):
+        data = {
             'id': self.id,
             'name': self.name,
-            'created_at': self.created_at.isoformat(),
-            'items': [item.to_dict() for item in self.items]
+            'created_at': self.created_at.isoformat()
         }
+        if include_items:
+            data['items'] = [item.to_dict() for item in self.items]
+        return data
 
 class PortfolioItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False, index=True)
     ticker = db.Column(db.String(10), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
     purchase_price = db.Column(db.Float, nullable=False)
@@ -64,4 +66,31 @@ class PortfolioItem(db.Model):
             'purchase_price': self.purchase_price,
             'purchase_date': self.purchase_date.isoformat(),
             'notes': self.notes
-        } 
\ No newline at end of file
+        } 
+
+class TrainingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    algorithm = db.Column(db.String(20), nullable=False)
+    ticker = db.Column(db.String(20), nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    dedup_key = db.Column(db.String(40), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    progress = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'algorithm': self.algorithm,
+            'ticker': self.ticker,
+            'params': json.loads(self.params),
+            'status': self.status,
+            'progress': json.loads(self.progress) if self.progress else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,84 @@
+# tests/test_arima_runtime.py
+#
+# The slim ARIMA runtime must reproduce statsmodels exactly.
+# Run from project/: python -m pytest tests
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sarimax = pytest.importorskip('statsmodels.tsa.statespace.sarimax')
+
+from Services import arima_runtime
+
+N = 260        # observations generated
+HOLDOUT = 20   # the last rows: HOLDOUT/2 appended, HOLDOUT/2 forecast
+STEPS = HOLDOUT // 2
+
+
+def _series():
+    """Trending, weekly-seasonal prices driven by two exogenous series."""
+    rng = np.random.default_rng(7)
+    index = pd.bdate_range('2022-01-03', periods=N)
+    exog = pd.DataFrame({'a': np.cumsum(rng.normal(size=N)), 'b': rng.normal(size=N)}, index=index)
+    y = pd.Series(50 + np.cumsum(rng.normal(0.1, 1.0, size=N))
+                  + 0.5 * exog['a'] - 0.3 * exog['b']
+                  + 2 * np.sin(np.arange(N) * 2 * np.pi / 7), index=index)
+    return y, exog
+
+
+@pytest.fixture(scope='module', params=[
+    ((1, 1, 1), (1, 0, 1, 7)),
+    ((0, 1, 1), (0, 1, 1, 7)),
+], ids=['d1-seasonal-arma', 'd1-seasonal-diff'])
+def fitted(request):
+    order, seasonal_order = request.param
+    y, exog = _series()
+    results = sarimax.SARIMAX(
+        y[:-HOLDOUT],
+        exog=exog[:-HOLDOUT],
+        order=order,
+        seasonal_order=seasonal_order,
+        enforce_stationarity=False,
+        enforce_invertibility=False
+    ).fit(disp=False, maxiter=200)
+    return results, y, exog
+
+
+def _assert_forecasts_match(forecaster, results, exog):
+    mean, lower, upper = forecaster.forecast(len(exog), exog.to_numpy(), alpha=0.05)
+    expected = results.get_forecast(steps=len(exog), exog=exog)
+    ci = expected.conf_int(alpha=0.05)
+    np.testing.assert_allclose(mean, expected.predicted_mean.to_numpy(), rtol=1e-7, atol=1e-7)
+    np.testing.assert_allclose(lower, ci.iloc[:, 0].to_numpy(), rtol=1e-7, atol=1e-7)
+    np.testing.assert_allclose(upper, ci.iloc[:, 1].to_numpy(), rtol=1e-7, atol=1e-7)
+
+
+def test_forecast_matches_get_forecast(fitted):
+    results, _, exog = fitted
+    state = arima_runtime.from_results(results)
+    assert state is not None
+    forecaster = arima_runtime.StateSpaceForecaster(state)
+    _assert_forecasts_match(forecaster, results, exog[-HOLDOUT:-HOLDOUT + STEPS])
+
+
+def test_append_matches_statsmodels_append(fitted):
+    results, y, exog = fitted
+    new_y, new_exog = y[-HOLDOUT:-STEPS], exog[-HOLDOUT:-STEPS]
+    appended = results.append(new_y, exog=new_exog, refit=False)
+
+    forecaster = arima_runtime.StateSpaceForecaster(arima_runtime.from_results(results))
+    forecaster = forecaster.append(new_y, new_exog)
+
+    np.testing.assert_allclose(forecaster.a, np.asarray(appended.predicted_state)[:, -1],
+                               rtol=1e-7, atol=1e-7)
+    np.testing.assert_allclose(forecaster.P, np.asarray(appended.predicted_state_cov)[:, :, -1],
+                               rtol=1e-6, atol=1e-6)
+    _assert_forecasts_match(forecaster, appended, exog[-STEPS:])
+
+
+def test_round_trip_through_arrays(fitted):
+    results, _, exog = fitted
+    forecaster = arima_runtime.StateSpaceForecaster(arima_runtime.from_results(results))
+    restored = arima_runtime.StateSpaceForecaster(forecaster.to_arrays())
+    _assert_forecasts_match(restored, results, exog[-HOLDOUT:-HOLDOUT + STEPS])
@@ -0,0 +1,88 @@
+# tests/test_market_data.py
+#
+# The price store downloads only the missing parts of a range and appends them.
+# Run from project/: python -m pytest tests
+
+import json
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import SyntheticProvider
+from Services.market_data import NoDataError, PriceStore
+from Services.market_fetcher import TokenBucket
+
+
+class CountingProvider(SyntheticProvider):
+    """Synthetic prices that remember every range asked for."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((start, end))
+        return super().fetch(ticker, start, end)
+
+
+@pytest.fixture
+def store(tmp_path):
+    provider = CountingProvider()
+    store = PriceStore(str(tmp_path), provider)
+    store.set_provider(provider, TokenBucket(rate=0))
+    return store, provider
+
+
+def _meta(store, ticker):
+    with open(os.path.join(store._dir(ticker), 'meta.json')) as f:
+        return json.load(f)
+
+
+def test_missing_ranges(store):
+    store, _ = store
+    meta = {'start': '2024-02-01', 'end': '2024-03-01'}
+    missing = store._missing_ranges(meta, date(2024, 1, 1), date(2024, 4, 1))
+    assert missing == [(date(2024, 1, 1), date(2024, 2, 1)), (date(2024, 3, 1), date(2024, 4, 1))]
+    assert store._missing_ranges(meta, date(2024, 2, 5), date(2024, 2, 20)) == []
+    assert store._missing_ranges(None, date(2024, 1, 1), date(2024, 2, 1)) == [(date(2024, 1, 1), date(2024, 2, 1))]
+
+
+def test_only_gaps_are_downloaded_and_appended(store):
+    store, provider = store
+    first = store.get_close('AAA', '2024-02-01', '2024-03-01')
+    assert provider.calls == [('2024-02-01', '2024-03-01')]
+
+    both = store.get_close('AAA', '2024-01-01', '2024-04-01')
+    assert provider.calls[1:] == [('2024-01-01', '2024-02-01'), ('2024-03-01', '2024-04-01')]
+    assert _meta(store, 'AAA')['start'] == '2024-01-01' and _meta(store, 'AAA')['end'] == '2024-04-01'
+    assert both.index.is_monotonic_increasing and not both.index.duplicated().any()
+    assert len(both) == len(pd.bdate_range('2024-01-01', '2024-04-01', inclusive='left'))
+    pd.testing.assert_frame_equal(both.loc[first.index], first)
+
+    store.get_close('AAA', '2024-01-15', '2024-03-15')
+    assert len(provider.calls) == 3  # covered: nothing to download
+
+
+def test_weekend_gap_is_not_downloaded(store):
+    store, provider = store
+    store.get_close('AAA', '2024-01-01', '2024-01-06')  # Monday to Saturday
+    store.ensure('AAA', '2024-01-01', '2024-01-08')     # adds only Saturday and Sunday
+    assert len(provider.calls) == 1
+    with pytest.raises(NoDataError):
+        store.get_close('AAA', '2024-01-06', '2024-01-08')
+
+
+def test_updates_publish_a_new_version(store):
+    store, _ = store
+    store.get_close('AAA', '2024-01-01', '2024-02-01')
+    for end in ('2024-03-01', '2024-04-01', '2024-05-01'):
+        store.ensure('AAA', '2024-01-01', end)
+    versions = [name for name in os.listdir(store._dir('AAA')) if name.startswith('v-')]
+    assert _meta(store, 'AAA')['version'] in versions
+    assert len(versions) == 2  # the current one and the one it replaced
+
+    _, dates, close, adj_close = store._read('AAA')
+    assert len(dates) == len(close) == len(adj_close) == \
+        len(pd.bdate_range('2024-01-01', '2024-05-01', inclusive='left'))
@@ -0,0 +1,104 @@
+# tests/test_portfolio_import.py
+#
+# Bulk portfolio import: row validation and the executemany parameter sets.
+# Run from project/: python -m pytest tests
+
+from datetime import datetime
+
+import pytest
+
+from Services import portfolio_import
+
+
+def _errors(failed):
+    return {error['row']: error['error'] for error in failed}
+
+
+def test_valid_rows_split_into_inserts_and_updates():
+    frame = portfolio_import.read_json([
+        {'ticker': ' aapl ', 'quantity': 3, 'purchase_price': '150.5', 'purchase_date': '2024-03-01'},
+        {'id': 7, 'quantity': 5},
+    ])
+    inserts, updates, failed = portfolio_import.validate(frame)
+
+    assert failed == []
+    assert inserts == [{'row': 0, 'ticker': 'AAPL', 'quantity': 3.0, 'purchase_price': 150.5,
+                        'purchase_date': datetime(2024, 3, 1)}]
+    assert updates == [{'row': 1, 'id': 7, 'quantity': 5.0}]
+
+
+def test_bad_rows_are_reported_per_row():
+    frame = portfolio_import.read_json([
+        {'ticker': 'MSFT', 'quantity': 1, 'purchase_price': 10},
+        {'quantity': 1, 'purchase_price': 10},
+        {'ticker': 'ABCDEFGHIJK', 'quantity': 1, 'purchase_price': 10},
+        {'ticker': 'MSFT', 'purchase_price': 10},
+        {'ticker': 'MSFT', 'quantity': 'many', 'purchase_price': 10},
+        {'ticker': 'MSFT', 'quantity': 1, 'purchase_price': -1},
+        {'ticker': 'MSFT', 'quantity': 1, 'purchase_price': 10, 'purchase_date': 'someday'},
+        {'id': '1.5', 'quantity': 1},
+    ])
+    inserts, updates, failed = portfolio_import.validate(frame)
+
+    assert [fields['row'] for fields in inserts] == [0]
+    assert updates == []
+    assert _errors(failed) == {
+        1: 'ticker is required',
+        2: 'ticker is longer than 10 characters',
+        3: 'quantity is required',
+        4: 'quantity must be a number',
+        5: 'purchase_price must not be negative',
+        6: 'purchase_date must be a date',
+        7: 'id must be an integer',
+    }
+
+
+def test_duplicate_ids_keep_the_first_row():
+    frame = portfolio_import.read_json({'items': [
+        {'id': 4, 'quantity': 1},
+        {'id': 4, 'quantity': 2},
+        {'id': 5, 'notes': 'x'},
+    ]})
+    _, updates, failed = portfolio_import.validate(frame)
+
+    assert [fields['row'] for fields in updates] == [0, 2]
+    assert _errors(failed) == {1: 'id appears more than once'}
+
+
+def test_csv_keeps_na_ticker_and_treats_blanks_as_missing():
+    frame = portfolio_import.read_csv('Ticker, Quantity, Purchase_Price, Notes\n'
+                                      'NA, 2, 3.5,\n'
+                                      ', 1, 1, lost\n')
+    inserts, _, failed = portfolio_import.validate(frame)
+
+    assert [(fields['ticker'], 'notes' in fields) for fields in inserts] == [('NA', False)]
+    assert _errors(failed) == {1: 'ticker is required'}
+
+
+def test_rejects_non_list_json_and_too_many_rows(monkeypatch):
+    with pytest.raises(ValueError):
+        portfolio_import.read_json({'ticker': 'AAPL'})
+    monkeypatch.setattr(portfolio_import, 'MAX_ROWS', 1)
+    with pytest.raises(ValueError, match='At most 1 items'):
+        portfolio_import.read_json([{'ticker': 'A'}, {'ticker': 'B'}])
+
+
+def test_update_params_merge_over_existing_and_report_unknown_ids():
+    existing = {7: {'ticker': 'AAPL', 'quantity': 1.0, 'purchase_price': 10.0,
+                    'purchase_date': datetime(2024, 1, 2), 'notes': 'old'}}
+    params, updated, failed = portfolio_import.update_params(
+        [{'row': 0, 'id': 7, 'quantity': 4.0}, {'row': 1, 'id': 8, 'quantity': 1.0}], existing)
+
+    assert params == [{'ticker': 'AAPL', 'quantity': 4.0, 'purchase_price': 10.0,
+                       'purchase_date': datetime(2024, 1, 2), 'notes': 'old', 'item_id': 7}]
+    assert updated == [{'row': 0, 'item_id': 7}]
+    assert failed == [{'row': 1, 'error': 'Portfolio item not found'}]
+
+
+def test_insert_params_fill_defaults():
+    params = portfolio_import.insert_params(3, [{'row': 0, 'ticker': 'AAPL', 'quantity': 1.0,
+                                                 'purchase_price': 2.0}])
+
+    assert len(params) == 1
+    assert params[0]['portfolio_id'] == 3 and params[0]['notes'] == ''
+    assert isinstance(params[0]['purchase_date'], datetime)